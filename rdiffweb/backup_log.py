@@ -0,0 +1,138 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Backup log service.
+
+Keep a log of every backup session (date, size, errors) in database. The log
+is updated incrementally: only repositories modified since the last update
+are read and only the new sessions are appended. Status pages query the log
+by date range instead of reading every repository.
+
+Error logs are summarized when recorded: only the number of lines, the first
+lines and the error classes are kept.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from future.utils.surrogateescape import encodefilename
+import logging
+import threading
+
+from rdiffweb import librdiff
+from rdiffweb.core import Component
+from rdiffweb.rdw_helpers import rdwTime
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+class BackupLogManager(Component):
+    """
+    Record the backup sessions of the users repositories in database.
+    """
+
+    def __init__(self, app):
+        Component.__init__(self, app)
+        self._lock = threading.RLock()
+        # Modification time of repositories when last recorded.
+        self._mtimes = {}
+
+    def supports(self, user):
+        """
+        Check if the user database can store the backup log.
+        """
+        return self.app.userdb.supports('get_sessions', user.username)
+
+    def _update_repo(self, user_root, repo_obj):
+        """
+        Append the new sessions of the given repository to the log.
+        """
+        repo = librdiff.RdiffRepo(user_root, repo_obj.name)
+        backup_dates = repo.backup_dates
+        if not backup_dates:
+            return 0
+        # Forget the sessions removed from the repository.
+        repo_obj.delete_sessions(backup_dates[0].getSeconds())
+        last = repo_obj.last_session_date
+        entries = [
+            librdiff.HistoryEntry(repo, d)
+            for d in backup_dates
+            if last is None or d.getSeconds() > last]
+        sessions = []
+        for e in entries:
+            errors = e.error_summary or librdiff.ErrorLogSummary()
+            sessions.append((
+                e.date.getSeconds(), e.date.tzOffset, e.size, e.increment_size,
+                errors.text, errors.lines, ",".join(errors.classes)))
+        if sessions:
+            repo_obj.add_sessions(sessions)
+        return len(sessions)
+
+    def update(self, user, repos=None):
+        """
+        Record the new sessions of every modified repositories of the given
+        user. Return the list of summaries of the repositories.
+        """
+        user_root = user.user_root
+        if repos is None:
+            repos = user.repo_list
+        summaries = self.app.summaries.get_summaries(user, repos=repos)
+        for repo_obj, summary in zip(repos, summaries):
+            # A backup in progress will be recorded once completed.
+            if summary.failed or summary.pending or summary.in_progress:
+                continue
+            key = (user_root, repo_obj.name)
+            if summary.mtime is None or self._mtimes.get(key) == summary.mtime:
+                continue
+            try:
+                count = self._update_repo(user_root, repo_obj)
+                logger.debug("%s new sessions recorded for %s", count, repo_obj.name)
+            except librdiff.FileError:
+                logger.exception("invalid user path %s", repo_obj.name)
+                continue
+            with self._lock:
+                self._mtimes[key] = summary.mtime
+        return summaries
+
+    def get_sessions(self, user, repos=None, start=None, end=None):
+        """
+        Return the list of backup sessions of the given user, ordered by date.
+
+        `repos` is an optional list of repository name to filter the
+        sessions. `start` and `end` are optional dates (inclusive).
+        """
+        repo_list = user.repo_list
+        if repos is not None:
+            repo_list = [r for r in repo_list if r.name in repos]
+        summaries = self.update(user, repo_list)
+        names = dict((r.name, s.name) for r, s in zip(repo_list, summaries))
+
+        rows = user.get_sessions(
+            start=None if start is None else start.getSeconds(),
+            end=None if end is None else end.getSeconds(),
+            repos=repos)
+        return [{"repo_path": encodefilename(row[0]).strip(b"/"),
+                 "repo_name": names.get(row[0], row[0].strip("/")),
+                 "date": rdwTime(row[1] + row[2], row[2]),
+                 "size": row[3],
+                 "increment_size": row[4],
+                 "errors": row[5],
+                 "error_count": row[6],
+                 "error_classes": [c for c in row[7].split(",") if c]} for row in rows]
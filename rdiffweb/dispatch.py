@@ -24,14 +24,40 @@ Default page handler
 
 from __future__ import unicode_literals
 
+from builtins import object
 import cherrypy
+from cherrypy.lib import httputil
+from cherrypy.lib.cptools import validate_etags
 from cherrypy.lib.static import serve_file, mimetypes
 from future.builtins import str
+import gzip
+import hashlib
+import io
+import logging
 import os
 
 from rdiffweb.rdw_helpers import unquote_url
 
 
+# Define the logger
+logger = logging.getLogger(__name__)
+
+# Content types worth compressing.
+COMPRESSIBLE_TYPES = [
+    'application/javascript',
+    'application/json',
+    'application/x-javascript',
+    'image/svg+xml',
+    'text/css',
+    'text/html',
+    'text/javascript',
+    'text/plain',
+]
+
+# Number of seconds a fingerprinted static file is cached by the browser.
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+
 def poppath(*args, **kwargs):
     """
     A decorator for _cp_dispatch
@@ -102,28 +128,141 @@ def poppath(*args, **kwargs):
     return decorated
 
 
+class _StaticFile(object):
+    """
+    Information about a static file kept in memory: entity tag and gzip
+    compressed content.
+    """
+
+    def __init__(self, filename, content_type):
+        st = os.stat(filename)
+        self.mtime = st.st_mtime
+        self.size = st.st_size
+        self.content_type = content_type
+        with open(filename, 'rb') as f:
+            data = f.read()
+        self.etag = hashlib.md5(data).hexdigest()
+        self.gzip = None
+        if content_type not in COMPRESSIBLE_TYPES:
+            return
+        # Use the file compressed at build time when available.
+        if os.path.isfile(filename + '.gz') and os.path.getmtime(filename + '.gz') >= self.mtime:
+            with open(filename + '.gz', 'rb') as f:
+                self.gzip = f.read()
+        else:
+            buf = io.BytesIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as f:
+                f.write(data)
+            self.gzip = buf.getvalue()
+        if len(self.gzip) >= self.size:
+            self.gzip = None
+
+    @property
+    def fingerprint(self):
+        return self.etag[:12]
+
+    def is_stale(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return True
+        return st.st_mtime != self.mtime or st.st_size != self.size
+
+
+def _content_type(filename):
+    # Set content-type based on filename extension
+    ext = ""
+    i = filename.rfind('.')
+    if i != -1:
+        ext = filename[i:].lower()
+    return mimetypes.types_map.get(ext, None)  # @UndefinedVariable
+
+
+def _accept_gzip():
+    for value in cherrypy.request.headers.elements('Accept-Encoding'):
+        if value.value in ('gzip', 'x-gzip', '*') and value.qvalue > 0:
+            return True
+    return False
+
+
 def static(path):
     """
-    Create a page handler to serve static files. Disable authentication.
+    Create a page handler to serve static files. Disable authentication,
+    sessions and i18n since static files doesn't depend on the user.
+
+    Files are loaded at startup to compute their entity tag and to compress
+    them. The handler provide a `fingerprint` function used to generate
+    URL. When the request contains the right fingerprint (`?v=...`), the
+    file is cached by the browser for a long time.
     """
     assert isinstance(path, str)
     assert os.path.exists(path), "%r doesn't exists" % path
-    content_type = None
-    if os.path.isfile(path):
-        # Set content-type based on filename extension
-        ext = ""
-        i = path.rfind('.')
-        if i != -1:
-            ext = path[i:].lower()
-        content_type = mimetypes.types_map.get(ext, None)  # @UndefinedVariable
+    files = {}
+
+    def _load(filename):
+        entry = files.get(filename)
+        if entry is not None and not entry.is_stale(filename):
+            return entry
+        if not os.path.isfile(filename):
+            files.pop(filename, None)
+            return None
+        try:
+            entry = _StaticFile(filename, _content_type(filename))
+        except (IOError, OSError):
+            logger.warning("fail to read static file %s", filename, exc_info=1)
+            return None
+        files[filename] = entry
+        return entry
+
+    # Load every files at startup.
+    if os.path.isdir(path):
+        for dirpath, unused, filenames in os.walk(path):
+            for name in filenames:
+                if not name.endswith('.gz'):
+                    _load(os.path.join(dirpath, name))
+    else:
+        _load(path)
+
+    def fingerprint(*args):
+        """Return the fingerprint of the given static file or None."""
+        entry = _load(os.path.join(path, *args))
+        return entry.fingerprint if entry else None
 
     @cherrypy.expose
-    @cherrypy.config(**{'tools.authform.on': False})
+    @cherrypy.config(**{
+        'tools.authform.on': False,
+        'tools.sessions.on': False,
+        'tools.i18n.on': False,
+        'tools.encode.on': False,
+        'tools.gzip.on': False,
+    })
     def handler(*args, **kwargs):
         if cherrypy.request.method not in ('GET', 'HEAD'):
             return None
         filename = os.path.join(path, *args)
         assert filename.startswith(path)
-        return serve_file(filename, content_type)
+        entry = _load(filename)
+        if entry is None:
+            return serve_file(filename, _content_type(filename))
+
+        response = cherrypy.response
+        response.headers['ETag'] = '"%s"' % entry.etag
+        if kwargs.get('v') == entry.fingerprint:
+            response.headers['Cache-Control'] = 'public, max-age=%d' % CACHE_MAX_AGE
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        if entry.content_type in COMPRESSIBLE_TYPES:
+            response.headers['Vary'] = 'Accept-Encoding'
+        # Raise 304 Not Modified if the browser has the same version.
+        validate_etags()
+
+        if entry.gzip is None or not _accept_gzip():
+            return serve_file(filename, entry.content_type)
+        response.headers['Last-Modified'] = httputil.HTTPDate(entry.mtime)
+        response.headers['Content-Type'] = entry.content_type
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Content-Length'] = len(entry.gzip)
+        return entry.gzip
 
+    handler.fingerprint = fingerprint
     return handler
@@ -43,6 +43,9 @@ class AuthFormTool(HandlerTool):
     """
     session_key = 'user'
 
+    # Attributes of the user kept in session.
+    session_user_key = 'user_record'
+
     def __init__(self):
         HandlerTool.__init__(self, self.run, name='authform')
         # Make sure to run after session tool (priority 50)
@@ -85,10 +88,20 @@ class AuthFormTool(HandlerTool):
             return True
 
         # Define the value of request.login to later in code we can reuse it.
-        username = cherrypy.session[self.session_key]  # @UndefinedVariable
-        userobj = cherrypy.request.app.userdb.get_user(username)  # @UndefinedVariable
+        # The user is read from the session unless modified since.
+        sess = cherrypy.session  # @UndefinedVariable
+        username = sess[self.session_key]
+        userdb = cherrypy.request.app.userdb  # @UndefinedVariable
+        userobj = userdb.load_user(username, sess.get(self.session_user_key))
         if not userobj:
-            raise cherrypy.HTTPError(403)
+            try:
+                userobj = userdb.get_user(username)
+            except RdiffError:
+                logger.info("user [%s] doesn't exists anymore", username)
+                sess[self.session_key] = None
+                sess[self.session_user_key] = None
+                raise cherrypy.HTTPError(403)
+            sess[self.session_user_key] = userdb.dump_user(userobj)
         logger.debug('Setting request.login to %r', userobj)
         cherrypy.serving.request.login = userobj
 
@@ -108,6 +121,7 @@ class AuthFormTool(HandlerTool):
         logger.debug('Setting request.login to %r', userobj)
         cherrypy.serving.request.login = userobj
         cherrypy.session[self.session_key] = userobj.username  # @UndefinedVariable
+        cherrypy.session[self.session_user_key] = None  # @UndefinedVariable
         self.on_login(userobj.username)
         logger.debug('Redirect user to %r', redirect or b"/")
         raise cherrypy.HTTPRedirect(redirect or b"/")
@@ -117,6 +131,7 @@ class AuthFormTool(HandlerTool):
         sess = cherrypy.session  # @UndefinedVariable
         username = sess.get(self.session_key)
         sess[self.session_key] = None
+        sess[self.session_user_key] = None
         cherrypy.serving.request.login = None
         if username:
             self.on_logout(username)
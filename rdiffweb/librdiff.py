@@ -23,7 +23,7 @@ import bisect
 from builtins import bytes
 from builtins import object
 from builtins import str
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 import encodings
 import errno
 from future.utils import iteritems
@@ -32,6 +32,7 @@ from future.utils.surrogateescape import encodefilename
 import gzip
 import io
 import logging
+from multiprocessing.pool import ThreadPool
 import os
 import re
 from shutil import copyfileobj
@@ -57,6 +58,15 @@ PY3 = sys.version_info[0] == 3
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# List of attributes available in session statistics.
+SESSION_STATISTICS_FIELDS = [
+    'starttime', 'endtime', 'elapsedtime', 'sourcefiles', 'sourcefilesize',
+    'mirrorfiles', 'mirrorfilesize', 'newfiles', 'newfilesize', 'deletedfiles',
+    'deletedfilesize', 'changedfiles', 'changedsourcesize', 'changedmirrorsize',
+    'incrementfiles', 'incrementfilesize', 'totaldestinationsizechange', 'errors']
+
+_SESSION_STATISTICS_KEYS = frozenset(SESSION_STATISTICS_FIELDS)
+
 # Constant for the rdiff-backup-data folder name.
 RDIFF_BACKUP_DATA = b"rdiff-backup-data"
 
@@ -74,6 +84,15 @@ TARGZ_SUFFIX = b".tar.gz"
 
 FS_ENCODING = (sys.getfilesystemencoding() or 'utf-8').lower()
 
+# Number of lines kept from an error log.
+ERROR_LOG_HEAD_LINES = 20
+
+# Maximum length of each lines kept from an error log.
+ERROR_LOG_LINE_LENGTH = 1024
+
+# Match the error class written at the beginning of each error log line.
+ERROR_CLASS_RE = re.compile(b"^([A-Za-z]{1,64}Error) ")
+
 
 @python_2_unicode_compatible
 class ExecuteError(Exception):
@@ -260,12 +279,20 @@ class HistoryEntry(object):
 
     @property
     def errors(self):
-        """Return error messages."""
+        """Return the first lines of the error log."""
         try:
-            self._repo._error_logs[self.date].read()
+            return self._repo._error_logs[self.date].head()
         except KeyError:
             return ""
 
+    @property
+    def error_summary(self):
+        """Return a summary of the error log or None."""
+        try:
+            return self._repo._error_logs[self.date].summary()
+        except KeyError:
+            return None
+
     @property
     def increment_size(self):
         try:
@@ -373,6 +400,75 @@ class IncrementEntry(object):
         return self.name
 
 
+class ErrorLogSummary(object):
+    """Summary of an error log: number of lines, first lines and error
+    classes."""
+
+    def __init__(self, lines=0, head=None, classes=None):
+        self.lines = lines
+        self.head = head or []
+        self.classes = classes or []
+
+    @property
+    def text(self):
+        return "\n".join(self.head)
+
+    @property
+    def truncated(self):
+        return self.lines > len(self.head)
+
+
+class ErrorLogEntry(IncrementEntry):
+
+    """Represent a single error_log. Error logs may be very large, so they are
+    read line by line and never loaded completely in memory."""
+
+    def __init__(self, repo_path, name):
+        # check to ensure we have an error_log entry
+        assert name.startswith(b"error_log.")
+        IncrementEntry.__init__(self, repo_path, name)
+
+    def open(self):
+        """Open the error log for reading. Return a file object."""
+        return self._open('rb')
+
+    def _lines(self):
+        """Generate each non-empty line of the error log."""
+        with self.open() as f:
+            for line in f:
+                line = line.rstrip(b"\r\n")
+                if line:
+                    yield line
+
+    def _decode_line(self, line):
+        return self.repo._decode(line[:ERROR_LOG_LINE_LENGTH])
+
+    def head(self, max_lines=ERROR_LOG_HEAD_LINES):
+        """Return the first lines of the error log. Stop reading the file once
+        enough lines are read."""
+        head = []
+        for line in self._lines():
+            if len(head) >= max_lines:
+                break
+            head.append(self._decode_line(line))
+        return "\n".join(head)
+
+    def summary(self, max_lines=ERROR_LOG_HEAD_LINES):
+        """Read the complete error log to count the lines and identify the
+        error classes. Return an `ErrorLogSummary`."""
+        summary = ErrorLogSummary()
+        classes = set()
+        for line in self._lines():
+            summary.lines += 1
+            if len(summary.head) < max_lines:
+                summary.head.append(self._decode_line(line))
+            m = ERROR_CLASS_RE.match(line)
+            if m:
+                classes.add(m.group(1).decode('ascii'))
+        summary.classes = sorted(classes)
+        return summary
+
+
 class FileStatisticsEntry(IncrementEntry):
 
     """
@@ -460,6 +556,34 @@ class FileStatisticsEntry(IncrementEntry):
             'increment_size': data[4]}
 
 
+class SessionStatistics(namedtuple('SessionStatistics', SESSION_STATISTICS_FIELDS)):
+
+    """Immutable record of the statistics of a backup session. Values
+    missing from the file are 0."""
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, data):
+        """Create a new record from the content of a session_statistics
+        file. e.g.: `SourceFileSize 3666973 (3.50 MB)`"""
+        values = {}
+        for line in data.splitlines():
+            # Skip comments
+            if not line or line.startswith("#"):
+                continue
+            key, unused, value = line.partition(" ")
+            key = key.lower()
+            if key not in _SESSION_STATISTICS_KEYS:
+                continue
+            value = value.split(" ", 1)[0]
+            try:
+                values[key] = float(value) if '.' in value else int(value)
+            except ValueError:
+                logger.warning("invalid session statistics %s: %s", key, value)
+        return cls(*[values.get(f, 0) for f in SESSION_STATISTICS_FIELDS])
+
+
 class SessionStatisticsEntry(IncrementEntry):
 
     """Represent a single session_statistics."""
@@ -469,41 +593,48 @@ class SessionStatisticsEntry(IncrementEntry):
         assert name.startswith(b"session_statistics")
         assert name.endswith(b".data") or name.endswith(b".data.gz")
         IncrementEntry.__init__(self, repo_path, name)
+        self._stats = None
 
-    def _load(self):
-        """This method is used to read the session_statistics and create the
-        appropriate structure to quickly get the data.
-
-        File Statistics contains different information related to each file of
-        the backup. This class provide a simple and easy way to access this
-        data."""
-
-        with self._open('r') as f:
-            for line in f.readlines():
-                # Skip comments
-                if line.startswith("#"):
-                    continue
-                # Read the line into array
-                line = line.rstrip('\r\n')
-                data_line = line.split(" ", 2)
-                # Read line into tuple
-                (key, value) = tuple(data_line)[0:2]
-                if '.' in value:
-                    value = float(value)
-                else:
-                    value = int(value)
-                setattr(self, key.lower(), value)
+    @property
+    def stats(self):
+        """Return the `SessionStatistics` of this session. The file is only
+        read once."""
+        if self._stats is None:
+            with self._open('rb') as f:
+                data = f.read().decode('ascii', 'replace')
+            self._stats = SessionStatistics.parse(data)
+        return self._stats
 
     def __getattr__(self, name):
         """
         Intercept attribute getter to load the file.
         """
-        if name in ['starttime', 'endtime', 'elapsedtime', 'sourcefiles', 'sourcefilesize',
-                    'mirrorfiles', 'mirrorfilesize', 'newfiles', 'newfilesize', 'deletedfiles',
-                    'deletedfilesize', 'changedfiles', 'changedsourcesize', 'changedmirrorsize',
-                    'incrementfiles', 'incrementfilesize', 'totaldestinationsizechange', 'errors']:
-            self._load()
-        return self.__dict__[name]
+        if name in _SESSION_STATISTICS_KEYS:
+            return getattr(self.stats, name)
+        raise AttributeError(name)
+
+
+def load_session_statistics(entries, threads=4):
+    """
+    Read many `SessionStatisticsEntry` concurrently. Return the list of
+    `SessionStatistics`, None for files that can't be read.
+    """
+    def load(entry):
+        try:
+            return entry.stats
+        except Exception:
+            logger.warning("fail to read session statistics %r", entry.name)
+            return None
+
+    entries = list(entries)
+    if len(entries) <= 1 or threads <= 1:
+        return [load(e) for e in entries]
+    pool = ThreadPool(min(threads, len(entries)))
+    try:
+        return pool.map(load, entries)
+    finally:
+        pool.close()
+        pool.join()
 
 
 @python_2_unicode_compatible
@@ -548,6 +679,17 @@ class RdiffRepo(object):
                 if x.startswith(b"mirror_metadata")])
         return self._backup_dates
 
+    @property
+    def _backup_seconds(self):
+        """Return the backup dates as a sorted list of seconds since epoch
+        (UTC) to be searched by bisection."""
+        backup_dates = self.backup_dates
+        cache = getattr(self, '_backup_seconds_cache', None)
+        if cache is None or cache[0] is not backup_dates:
+            cache = (backup_dates, [d.getSeconds() for d in backup_dates])
+            self._backup_seconds_cache = cache
+        return cache[1]
+
     def _check(self):
         """Check if the repository exists."""
         # Make sure repoRoot is a valid rdiff-backup repository
@@ -588,7 +730,7 @@ class RdiffRepo(object):
         """Return dict of {date: IncrementEntry} to represent each file statistics."""
         if not hasattr(self, '_error_logs_data'):
             self._error_logs_data = {
-                IncrementEntry.extract_date(x): IncrementEntry(self.root_path, x)
+                IncrementEntry.extract_date(x): ErrorLogEntry(self.root_path, x)
                 for x in self.data_entries
                 if x.startswith(b"error_log.")}
         return self._error_logs_data
@@ -649,6 +791,10 @@ class RdiffRepo(object):
         except KeyError:
             return None
 
+    def get_error_log(self, date):
+        """Return the `ErrorLogEntry` of the given backup date or None."""
+        return self._error_logs.get(date)
+
     def get_history_entries(self,
                             numLatestEntries=-1,
                             earliestDate=None,
@@ -665,25 +811,26 @@ class RdiffRepo(object):
 
         logger.debug("get history entries for [%r]", self.repo_root)
 
-        entries = []
-        # Take care of reverse
-        backup_dates = reversed(self.backup_dates) if reverse else self.backup_dates
-        # Loop to dates
-        for backup_date in backup_dates:
-            # compare local times because of discrepancy between client/server
-            # time zones
-            if earliestDate and backup_date < earliestDate:
-                continue
-
-            if latestDate and backup_date > latestDate:
-                continue
-
-            entries.append(HistoryEntry(self, backup_date))
-
-            if numLatestEntries != -1 and len(entries) == numLatestEntries:
-                return entries
-
-        return entries
+        # Find the range of dates by bisection. Compare UTC times because of
+        # discrepancy between client/server time zones.
+        seconds = self._backup_seconds
+        start = 0
+        end = len(seconds)
+        if earliestDate:
+            start = bisect.bisect_left(seconds, earliestDate.getSeconds())
+        if latestDate:
+            end = bisect.bisect_right(seconds, latestDate.getSeconds(), start)
+
+        # Only create entries for the requested slice.
+        if numLatestEntries != -1:
+            if reverse:
+                start = max(start, end - numLatestEntries)
+            else:
+                end = min(end, start + numLatestEntries)
+        backup_dates = self.backup_dates[start:end]
+        if reverse:
+            backup_dates.reverse()
+        return [HistoryEntry(self, d) for d in backup_dates]
 
     def get_path(self, path):
         """Return a new instance of RdiffPath to represent the given path."""
@@ -215,6 +215,8 @@ def start():
     # Add a custom signal handler
     cherrypy.engine.signal_handler.handlers['SIGUSR2'] = debug_dump_mem
     cherrypy.engine.signal_handler.handlers['SIGABRT'] = debug_dump_thread
+    # Reload configuration instead of restarting.
+    cherrypy.engine.signal_handler.handlers['SIGHUP'] = app.reload_config
 
     # Create application wrapper if profiling is enabled.
     if profile or profile_aggregated:
@@ -33,6 +33,9 @@ from rdiffweb.i18n import ugettext as _
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# Number of users shown per page.
+USERS_PER_PAGE = 50
+
 
 class AdminPage(page_main.MainPage):
     """Administration pages. Allow to manage users database."""
@@ -55,8 +58,15 @@ class AdminPage(page_main.MainPage):
             user_count += 1
             repo_count += len(user.repos)
 
+        # Templates taking the most time to render.
+        render_stats = sorted(
+            self.app.templates.get_render_stats().items(),
+            key=lambda item: item[1]['total'], reverse=True)[:20]
+
         params = {"user_count": user_count,
-                  "repo_count": repo_count}
+                  "repo_count": repo_count,
+                  "render_stats": render_stats,
+                  "templates_content": []}
 
         return self._compile_template("admin.html", **params)
 
@@ -76,7 +86,7 @@ class AdminPage(page_main.MainPage):
 
     @cherrypy.expose
     def users(self, userfilter=u"", usersearch=u"", action=u"", username=u"",
-              email=u"", password=u"", user_root=u"", is_admin=u""):
+              email=u"", password=u"", user_root=u"", is_admin=u"", page=u"1"):
 
         # Check if user is an administrator
         if not self.app.currentuser or not self.app.currentuser.is_admin:
@@ -84,6 +94,8 @@ class AdminPage(page_main.MainPage):
 
         self.assertIsInstance(userfilter, str)
         self.assertIsInstance(usersearch, str)
+        self.assertIsInt(page)
+        page = int(page)
 
         # If we're just showing the initial page, just do that
         params = {}
@@ -102,32 +114,38 @@ class AdminPage(page_main.MainPage):
 
         # Get page parameters
         params.update(
-            self._users_get_params_for_page(userfilter, usersearch))
+            self._users_get_params_for_page(userfilter, usersearch, page))
 
         # Build users page
         return self._compile_template("admin_users.html", **params)
 
-    def _users_get_params_for_page(self, userfilter, usersearch):
-        users = [{"username": user.username,
-                  "email": user.email,
-                  "is_admin": user.is_admin,
-                  "user_root": user.user_root,
-                  } for user in self.app.userdb.list()]
-
-        # Apply the filters.
-        filtered_users = users
-        if userfilter == "admins":
-            filtered_users = [x for x in filtered_users if x["is_admin"]]
-        # Apply the search.
-        if usersearch:
-            filtered_users = [x for x in filtered_users
-                              if usersearch in x["username"] or
-                              usersearch in x["email"]]
+    def _users_get_params_for_page(self, userfilter, usersearch, page=1):
+        """
+        Return the users matching the filter and the search. The filtering
+        and the pagination are done by the user database.
+        """
+        userdb = self.app.userdb
+        admins = userfilter == "admins"
+        filtered_count = userdb.count(search=usersearch, admins=admins)
+        page_count = max(1, (filtered_count + USERS_PER_PAGE - 1) // USERS_PER_PAGE)
+        page = min(max(1, page), page_count)
+        filtered_users = [{"username": user.username,
+                           "email": user.email,
+                           "is_admin": user.is_admin,
+                           "user_root": user.user_root,
+                           } for user in userdb.list(
+                               search=usersearch, admins=admins,
+                               offset=(page - 1) * USERS_PER_PAGE,
+                               limit=USERS_PER_PAGE)]
 
         return {"userfilter": userfilter,
                 "usersearch": usersearch,
                 "filtered_users": filtered_users,
-                "users": users}
+                "filtered_count": filtered_count,
+                "user_count": userdb.count(),
+                "admin_count": userdb.count(admins=True),
+                "page": page,
+                "page_count": page_count}
 
     def _users_handle_action(self, action, username, email, password,
                              user_root, is_admin):
@@ -57,7 +57,7 @@ class BrowsePage(page_main.MainPage):
 
         # Build the parameters
         parms = self._get_parms_for_page(repo_obj, path_obj, restore, limit)
-        return self._compile_template("browse.html", **parms)
+        return self._stream_template("browse.html", **parms)
 
     def _get_parms_for_page(self, repo_obj, path_obj, restore, limit):
         assert isinstance(repo_obj, librdiff.RdiffRepo)
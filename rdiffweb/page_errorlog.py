@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from builtins import bytes
+from builtins import str
+import cherrypy
+from cherrypy.lib.static import _serve_fileobj
+import logging
+
+from rdiffweb import page_main
+from rdiffweb import rdw_helpers
+from rdiffweb.dispatch import poppath
+from rdiffweb.i18n import ugettext as _
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+@poppath()
+class ErrorLogPage(page_main.MainPage):
+    """
+    Stream the complete error log of a backup session. Error logs may be very
+    large, so pages only show the first lines.
+    """
+    _cp_config = {"response.stream": True}
+
+    @cherrypy.expose
+    def index(self, path=b"", date=None):
+        self.assertIsInstance(path, bytes)
+        self.assertIsInstance(date, str)
+
+        logger.debug("error log [%r][%s]", path, date)
+
+        repo_obj = self.validate_user_path(path)[0]
+
+        # Get the backup date
+        try:
+            date = rdw_helpers.rdwTime(int(date))
+        except:
+            logger.warning("invalid date %s", date)
+            raise cherrypy.HTTPError(400, _("Invalid date."))
+
+        entry = repo_obj.get_error_log(date)
+        if entry is None:
+            raise cherrypy.NotFound()
+
+        # Stream the data.
+        cherrypy.response.headers["Content-Type"] = "text/plain"
+        cherrypy.response.headers["Content-Disposition"] = (
+            'inline; filename="error_log.%s.txt"' % date.getSeconds())
+        return _serve_fileobj(entry.open(), content_type=None, content_length=None)
@@ -24,6 +24,7 @@ import logging
 
 from rdiffweb import librdiff
 from rdiffweb import page_main
+from rdiffweb import rdw_helpers
 from rdiffweb.dispatch import poppath
 
 
@@ -35,21 +36,36 @@ logger = logging.getLogger(__name__)
 class HistoryPage(page_main.MainPage):
 
     @cherrypy.expose
-    def index(self, path=b"", limit='10', **kwargs):
+    def index(self, path=b"", limit='10', before=None, **kwargs):
         self.assertIsInstance(path, bytes)
         self.assertIsInt(limit)
         limit = int(limit)
+        # Cursor used to load the next page: only show entries older than
+        # the given date (seconds since epoch).
+        latest_date = None
+        if before:
+            self.assertIsInt(before)
+            latest_date = rdw_helpers.rdwTime(int(before) - 1)
 
         logger.debug("history [%r]", path)
 
         repo_obj = self.validate_user_path(path)[0]
         assert isinstance(repo_obj, librdiff.RdiffRepo)
 
+        # Get one more entry to know if there is another page.
+        history_entries = repo_obj.get_history_entries(
+            numLatestEntries=limit + 1, latestDate=latest_date, reverse=True)
+        next_cursor = None
+        if len(history_entries) > limit:
+            history_entries = history_entries[:limit]
+            next_cursor = history_entries[-1].date.getSeconds()
+
         parms = {
             "limit": limit,
+            "next_cursor": next_cursor,
             "repo_name": repo_obj.display_name,
             "repo_path": repo_obj.path,
-            "history_entries": repo_obj.get_history_entries(numLatestEntries=limit, reverse=True)
+            "history_entries": history_entries,
         }
 
-        return self._compile_template("history.html", **parms)
+        return self._stream_template("history.html", **parms)
@@ -22,7 +22,6 @@ from __future__ import unicode_literals
 import cherrypy
 import logging
 
-from rdiffweb import librdiff
 from rdiffweb import page_main
 from rdiffweb.i18n import ugettext as _
 
@@ -52,33 +51,7 @@ class LocationsPage(page_main.MainPage):
         Build the params for the locations templates.
         """
         # Get user's locations.
-        user_root = self.app.currentuser.user_root
-        user_repos = self.app.currentuser.repos
-        repos = []
-        for user_repo in user_repos:
-            try:
-                # Get reference to a repo object
-                repo_obj = librdiff.RdiffRepo(user_root, user_repo)
-                path = repo_obj.path
-                name = repo_obj.display_name
-                in_progress = repo_obj.in_progress
-                last_backup_date = repo_obj.last_backup_date
-                failed = False
-            except librdiff.FileError:
-                logging.exception("invalid user path %s" % user_repo)
-                path = b''
-                name = user_repo
-                in_progress = False
-                last_backup_date = 0
-                failed = True
-            # Create an entry to represent the repository
-            repos.append({
-                "path": path,
-                "name": name,
-                "last_backup_date": last_backup_date,
-                'in_progress': in_progress,
-                'failed': failed
-            })
+        repos = self.app.summaries.get_summaries(self.app.currentuser)
         params = {
             "repos": repos,
             "templates_before_content": list(),
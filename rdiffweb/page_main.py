@@ -22,13 +22,13 @@ from __future__ import unicode_literals
 from builtins import bytes
 import cherrypy
 from future.utils.surrogateescape import encodefilename
+import functools
 import logging
 import os.path
 
 from rdiffweb.core import Component
 from rdiffweb.i18n import get_current_lang
 from rdiffweb.librdiff import RdiffRepo, AccessDeniedError, DoesNotExistError
-from rdiffweb.rdw_plugin import ITemplateFilterPlugin
 
 
 # Define the logger
@@ -47,6 +47,43 @@ def normpath(val):
     return val
 
 
+def request_cache(func):
+    """
+    Decorator keeping the value returned by `func` until the end of the
+    current request. Used to share lookups between the page and the
+    template filter plugins. Arguments must be hashable.
+    """
+    @functools.wraps(func)
+    def wrapper(*args):
+        request = cherrypy.serving.request
+        # Don't cache anything when not serving a request.
+        if request.app is None:
+            return func(*args)
+        cache = getattr(request, 'rdw_cache', None)
+        if cache is None:
+            cache = request.rdw_cache = {}
+        key = (func, args)
+        if key not in cache:
+            cache[key] = func(*args)
+        return cache[key]
+    return wrapper
+
+
+@request_cache
+def _get_repo_obj(user_root_b, repo_b):
+    return RdiffRepo(user_root_b, repo_b)
+
+
+def get_repo_obj(user_root_b, repo_b):
+    """
+    Return a reference to the given repository. The same object is returned
+    during the whole request.
+    """
+    assert isinstance(user_root_b, bytes)
+    assert isinstance(repo_b, bytes)
+    return _get_repo_obj(user_root_b.rstrip(SEP), repo_b.strip(SEP))
+
+
 class MainPage(Component):
 
     def assertTrue(self, value, message=None):
@@ -118,7 +155,7 @@ class MainPage(Component):
         try:
             # Get reference to the repository (this ensure the repository does
             # exists and is valid.)
-            repo_obj = RdiffRepo(user_root_b, repo_b)
+            repo_obj = get_repo_obj(user_root_b, repo_b)
 
             # Get reference to the path.
             path_b = path_b[len(repo_b):]
@@ -145,6 +182,24 @@ class MainPage(Component):
         This method should be used by subclasses to provide default template
         value.
         """
+        parms = self._get_template_parms(template_name, **kwargs)
+        return self.app.templates.compile_template(template_name, **parms)
+
+    def _stream_template(self, template_name, **kwargs):
+        """
+        Same as `_compile_template`, but the page is sent to the client while
+        being generated. Used for pages listing many entries: the first
+        bytes are sent right away and the page is never kept in memory.
+        """
+        parms = self._get_template_parms(template_name, **kwargs)
+        cherrypy.response.stream = True
+        return self.app.templates.stream_template(template_name, **parms)
+
+    def _get_template_parms(self, template_name, **kwargs):
+        """
+        Return the parameters of the given template with default values and
+        parameters added by plugins.
+        """
         parms = {
             "lang": get_current_lang(),
             "version": self.app.get_version(),
@@ -167,8 +222,6 @@ class MainPage(Component):
         parms.update(kwargs)
 
         # Filter params using plugins
-        self.app.plugins.run(
-            lambda x: x.filter_data(template_name, parms),
-            category=ITemplateFilterPlugin.CATEGORY)
+        self.app.plugins.filter_data(template_name, parms)
 
-        return self.app.templates.compile_template(template_name, **parms)
+        return parms
@@ -22,6 +22,9 @@ from __future__ import unicode_literals
 from builtins import str
 from builtins import bytes
 import cherrypy
+from cherrypy.lib import cptools, httputil
+from future.utils.surrogateescape import encodefilename
+import hashlib
 import logging
 
 from rdiffweb import librdiff
@@ -72,9 +75,11 @@ class StatusPage(page_main.MainPage):
         else:
             # Validate repo parameter
             repo_obj = self.validate_user_path(path_b)[0]
+            repos = [r for r in self.app.currentuser.repos
+                     if encodefilename(r).strip(b"/") == repo_obj.path]
 
             userMessages = self._getUserMessages(
-                [repo_obj.path], False, True, entry_time, entry_time)
+                repos, False, True, entry_time, entry_time)
 
         return self._compileStatusPageTemplate(False, userMessages, False)
 
@@ -86,6 +91,7 @@ class StatusPage(page_main.MainPage):
         return self._compile_template(
             "status.xml",
             link=statusUrl,
+            base_url=cherrypy.request.base,
             messages=userMessages)
 
     def _compileStatusPageTemplate(self, isMainPage, messages, failuresOnly):
@@ -96,7 +102,7 @@ class StatusPage(page_main.MainPage):
         else:
             feedLink = ""
             feedTitle = ""
-        return self._compile_template(
+        return self._stream_template(
             "status.html",
             messages=messages,
             feedLink=feedLink,
@@ -118,8 +124,6 @@ class StatusPage(page_main.MainPage):
         return url
 
     def _get_user_messages_for_day(self, date):
-        userRepos = self.app.currentuser.repos
-
         # Set the start and end time to be the start and end of the day,
         # respectively, to get all entries for that day
         startTime = rdw_helpers.rdwTime()
@@ -132,27 +136,30 @@ class StatusPage(page_main.MainPage):
         endTime.tzOffset = date.tzOffset
         endTime.setTime(23, 59, 59)
 
-        return self._getUserMessages(userRepos, True, False,
+        return self._getUserMessages(None, True, False,
                                      startTime, endTime)
 
     def _get_recent_user_messages(self, failuresOnly):
-        user_repos = self.app.currentuser.repos
         asOfDate = rdw_helpers.rdwTime()
         asOfDate.initFromMidnightUTC(-5)
 
-        return self._getUserMessages(user_repos, not failuresOnly, True,
+        return self._getUserMessages(None, not failuresOnly, True,
                                      asOfDate, None)
 
-    def _getUserMessages(self,
-                         repos,
-                         includeSuccess,
-                         includeFailure,
-                         earliest_date,
-                         latest_date):
-
-        user_root = self.app.currentuser.user_root
-
-        repoErrors = []
+    def _get_backups(self, repos, earliest_date, latest_date):
+        """
+        Return the backup sessions of the given repositories (or all the user
+        repositories if None) between the given dates.
+        """
+        user = self.app.currentuser
+        if self.app.backup_log.supports(user):
+            return self.app.backup_log.get_sessions(
+                user, repos, earliest_date, latest_date)
+
+        # Read the sessions from the repositories.
+        user_root = user.user_root
+        if repos is None:
+            repos = user.repos
         allBackups = []
         for repo in repos:
             repo = repo.lstrip("/")
@@ -167,6 +174,44 @@ class StatusPage(page_main.MainPage):
                                 "errors": backup.errors} for backup in backups]
             except librdiff.FileError:
                 logging.exception("invalid user path %s" % repo)
+        return allBackups
+
+    def _validate_cache(self, backups, earliest_date=None):
+        """
+        Define ETag and Last-Modified headers for the given backups. Stop the
+        request with "304 Not Modified" if the client already has them.
+        """
+        request = cherrypy.request
+        response = cherrypy.response
+        # The page also depends on the user and the language.
+        data = [self.app.currentuser.username, request.path_info,
+                request.query_string, request.headers.get('Accept-Language', '')]
+        data.extend("%r:%s:%s:%r" % (b["repo_path"], b["date"].getSeconds(), b["size"], b["errors"])
+                    for b in backups)
+        etag = hashlib.md5("\n".join(data).encode('utf-8')).hexdigest()
+        response.headers['ETag'] = '"%s"' % etag
+        dates = [b["date"].getSeconds() for b in backups]
+        if earliest_date is not None:
+            dates.append(earliest_date.getSeconds())
+        if dates:
+            response.headers['Last-Modified'] = httputil.HTTPDate(max(dates))
+        response.headers['Cache-Control'] = 'private, no-cache'
+        cptools.validate_etags()
+        # If-None-Match takes precedence over If-Modified-Since.
+        if 'If-None-Match' not in request.headers:
+            cptools.validate_since()
+
+    def _getUserMessages(self,
+                         repos,
+                         includeSuccess,
+                         includeFailure,
+                         earliest_date,
+                         latest_date):
+
+        repoErrors = []
+        allBackups = self._get_backups(repos, earliest_date, latest_date)
+        # Stop here if the client already has this page.
+        self._validate_cache(allBackups, earliest_date)
 
         allBackups.sort(key=lambda x: x["date"])
         failedBackups = [x for x in allBackups if x["errors"]]
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+SQL UserDB backend used to store users data and credentials into a SQL
+database shared by many rdiffweb servers. Connections are kept in a pool.
+SQLite and PostgreSQL (using psycopg2) are supported.
+
+An existing SQLite database may be copied using `rdiffweb-migrate-db`.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import cherrypy
+import logging
+
+from rdiffweb.plugins.db_sql.database import SQLDatabase
+from rdiffweb.rdw_plugin import IPasswordStore, IDatabase
+from rdiffweb.rdw_userdb import SQLUserStore
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+class SQLUserDB(SQLUserStore, IPasswordStore, IDatabase):
+
+    def activate(self):
+        """
+        Called by the plugin manager to setup the plugin.
+        """
+        super(IPasswordStore, self).activate()
+
+        # Get database location.
+        url = self.app.cfg.get_config("SQLDatabaseURL", "sqlite:////etc/rdiffweb/rdw.db")
+        self._db = SQLDatabase(
+            url,
+            pool_size=self.app.cfg.get_config_int("SQLPoolSize", "5"),
+            timeout=self.app.cfg.get_config_int("SQLPoolTimeout", "30"))
+        self._setup_passwords()
+        cherrypy.engine.subscribe('stop', self.close)
+
+        if self._db.create_tables():
+            self._add_default_admin()
+
+    def deactivate(self):
+        """
+        Called by the plugin manager to close the connections.
+        """
+        cherrypy.engine.unsubscribe('stop', self.close)
+        self.close()
+        super(IPasswordStore, self).deactivate()
+
+    def close(self):
+        """
+        Close the connections to the database.
+        """
+        self._db.close()
+
+    @property
+    def query_count(self):
+        """
+        Number of queries executed by the current thread.
+        """
+        return self._db.query_count
+
+    @property
+    def _instr(self):
+        return self._db.dialect.instr
+
+    @property
+    def _no_limit(self):
+        return self._db.dialect.no_limit
+
+    def _execute_query(self, query, args=()):
+        return self._db.execute_query(query, args)
+
+    def _execute_update(self, query, args=()):
+        return self._db.execute_update(query, args)
+
+    def _transaction(self):
+        return self._db.transaction()
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Copy an existing SQLite database into the database of the SQL plugin.
+
+Usage: rdiffweb-migrate-db [-f] <sqlite file> <database url>
+
+Users, passwords, repositories, repository attributes and backup sessions
+are copied in a single transaction. The destination database must be empty.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from builtins import str
+import getopt
+import logging
+import sqlite3
+import sys
+
+from rdiffweb.core import RdiffError
+from rdiffweb.plugins.db_sql.database import SQLDatabase
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+_REPOS_COLUMNS = ['RepoID', 'UserID', 'RepoPath', 'MaxAge']
+
+_SESSIONS_COLUMNS = ['Date', 'TzOffset', 'Size', 'IncrementSize', 'Errors', 'ErrorCount', 'ErrorClasses']
+
+
+def _bool(val):
+    return str(val).lower() in ['true', '1']
+
+
+def _read_sqlite(path):
+    """
+    Read every rows of the SQLite database. Repository attributes may be
+    stored in `repo_attrs` or as columns of `repos` in older databases.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        if 'users' not in tables:
+            raise RdiffError("no users found in %s" % path)
+        users = conn.execute(
+            "SELECT UserID, Username, Password, UserRoot, IsAdmin, UserEmail FROM users ORDER BY UserID").fetchall()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info('repos')")]
+        extra = [c for c in columns if c not in _REPOS_COLUMNS]
+        repos = conn.execute(
+            "SELECT %s FROM repos ORDER BY RepoID" % ", ".join(_REPOS_COLUMNS + extra)).fetchall()
+        attrs = []
+        for row in repos:
+            attrs.extend((row[0], c.lower(), v) for c, v in zip(extra, row[4:]) if v)
+        if 'repo_attrs' in tables:
+            attrs.extend(conn.execute("SELECT RepoID, Name, Value FROM repo_attrs").fetchall())
+        sessions = []
+        if 'sessions' in tables:
+            sessions = conn.execute(
+                "SELECT RepoID, %s FROM sessions ORDER BY SessionID" % ", ".join(_SESSIONS_COLUMNS)).fetchall()
+        return users, [row[0:4] for row in repos], attrs, sessions
+    finally:
+        conn.close()
+
+
+def copy_database(path, db, force=False):
+    """
+    Copy the content of the SQLite database at `path` into the given
+    `SQLDatabase`. Return the number of users copied.
+
+    Unless `force` is True, the destination must not contain any user.
+    """
+    users, repos, attrs, sessions = _read_sqlite(path)
+    db.create_tables()
+    with db.transaction() as cursor:
+        cursor.execute("SELECT COUNT(*) FROM users")
+        if cursor.fetchall()[0][0] and not force:
+            raise RdiffError("destination database is not empty")
+        if force:
+            for table in ['sessions', 'repo_attrs', 'repos', 'users']:
+                cursor.execute("DELETE FROM %s" % table)
+
+        # Identifiers are generated by the destination database.
+        user_ids = {}
+        for user_id, username, password, user_root, is_admin, email in users:
+            cursor.execute(
+                "INSERT INTO users (Username, Password, UserRoot, IsAdmin, UserEmail) values (?, ?, ?, ?, ?)",
+                (username, password or '', user_root or '', 1 if _bool(is_admin) else 0, email or ''))
+            cursor.execute("SELECT UserID FROM users WHERE Username = ?", (username,))
+            user_ids[user_id] = cursor.fetchall()[0][0]
+        repo_ids = {}
+        for repo_id, user_id, repo_path, maxage in repos:
+            if user_id not in user_ids:
+                logger.warning("skip repository %s of unknown user %s", repo_path, user_id)
+                continue
+            cursor.execute(
+                "INSERT INTO repos (UserID, RepoPath, MaxAge) values (?, ?, ?)",
+                (user_ids[user_id], repo_path, int(maxage or 0)))
+            cursor.execute(
+                "SELECT MAX(RepoID) FROM repos WHERE UserID = ? AND RepoPath = ?",
+                (user_ids[user_id], repo_path))
+            repo_ids[repo_id] = cursor.fetchall()[0][0]
+        cursor.executemany(
+            "INSERT INTO repo_attrs (RepoID, Name, Value) values (?, ?, ?)",
+            dict(((repo_ids[r], name), (repo_ids[r], name, str(value)))
+                 for r, name, value in attrs if r in repo_ids).values())
+        cursor.executemany(
+            "INSERT INTO sessions (RepoID, %s) values (?, %s)" % (
+                ", ".join(_SESSIONS_COLUMNS), ", ".join("?" * len(_SESSIONS_COLUMNS))),
+            [(repo_ids[row[0]],) + tuple(row[1:]) for row in sessions if row[0] in repo_ids])
+    logger.info("%s users, %s repositories and %s sessions copied", len(user_ids), len(repo_ids), len(sessions))
+    return len(user_ids)
+
+
+def main(args=None):
+    """
+    Entry point of `rdiffweb-migrate-db`.
+    """
+    logging.basicConfig(level=logging.INFO)
+    opts, args = getopt.getopt(sys.argv[1:] if args is None else args, 'f', ['force'])
+    force = any(option in ['-f', '--force'] for option, unused in opts)
+    if len(args) != 2:
+        print(__doc__.strip().splitlines()[2], file=sys.stderr)
+        return 2
+    path, url = args
+    db = SQLDatabase(str(url))
+    try:
+        copy_database(str(path), db, force=force)
+    except RdiffError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module to test the SQL database plugin.
+
+Tests are executed with an in-memory SQLite database. Define the environment
+variable `RDIFFWEB_TEST_POSTGRESQL` with the URL of an empty PostgreSQL
+database to run them against PostgreSQL too.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from rdiffweb.core import InvalidUserError, RdiffError
+from rdiffweb.plugins.db_sql.database import SQLDatabase, get_dialect
+from rdiffweb.plugins.db_sql.migrate import copy_database
+from rdiffweb.test import AppTestCase
+
+
+POSTGRESQL_URL = os.environ.get('RDIFFWEB_TEST_POSTGRESQL')
+
+
+class SQLUserDBTest(AppTestCase):
+
+    enabled_plugins = ['SQL']
+
+    default_config = {'SQLDatabaseURL': 'sqlite://'}
+
+    def setUp(self):
+        AppTestCase.setUp(self)
+        self.db = self.app.userdb._databases[0]
+
+    def test_add_user(self):
+        self.db.add_user('joe')
+        self.assertTrue(self.db.exists('joe'))
+        self.assertFalse(self.db.exists('jeff'))
+
+    def test_are_valid_credentials(self):
+        self.db.add_user('mike')
+        self.db.set_password('mike', 'password')
+        self.assertEqual('mike', self.db.are_valid_credentials('mike', 'password'))
+        self.assertFalse(self.db.are_valid_credentials('mike', 'Password'))
+        self.assertIsNone(self.db.are_valid_credentials('jeff', 'password'))
+        with self.assertRaises(RdiffError):
+            self.db.set_password('mike', 'new', old_password='invalid')
+
+    def test_are_valid_credentials_rehash(self):
+        # Unsalted SHA-1 copied from an older SQLite database.
+        self.db.add_user('kim')
+        self.db._set_user_field('kim', 'Password', '5baa61e4c9b93f3f0682250b6cf8331b7ee68fd8')
+        self.assertEqual('kim', self.db.are_valid_credentials('kim', 'password'))
+        hashed = self.db._get_user_field('kim', 'Password')
+        self.assertTrue(hashed.startswith('pbkdf2_sha256$'))
+        self.assertFalse(self.db.are_valid_credentials('kim', 'invalid'))
+
+    def test_delete_user(self):
+        self.db.add_user('vicky')
+        self.db.set_repos('vicky', ['repo1'])
+        self.db.set_repo_attr('vicky', 'repo1', 'keepdays', '30')
+        self.db.add_sessions('vicky', 'repo1', [(10, 0, 100, 10, '', 0, '')])
+        self.assertTrue(self.db.delete_user('vicky'))
+        self.assertFalse(self.db.exists('vicky'))
+        self.assertFalse(self.db.delete_user('vicky'))
+
+    def test_set_attributes(self):
+        self.db.add_user('annik')
+        self.db.set_user_root('annik', '/backups/annik')
+        self.db.set_email('annik', 'annik@test.com')
+        self.db.set_is_admin('annik', True)
+        self.assertEqual('/backups/annik', self.db.get_user_root('annik'))
+        self.assertEqual('annik@test.com', self.db.get_email('annik'))
+        self.assertTrue(self.db.is_admin('annik'))
+        with self.assertRaises(InvalidUserError):
+            self.db.set_email('invalid', 'invalid@test.com')
+
+    def test_set_repos(self):
+        self.db.add_user('kim')
+        self.db.set_repos('kim', ['repo1', 'repo2'])
+        self.db.set_repo_maxage('kim', 'repo2', 3)
+        self.db.set_repos('kim', ['repo2', 'repo3'])
+        self.assertEqual(['repo2', 'repo3'], self.db.get_repos('kim'))
+        self.assertEqual(3, self.db.get_repo_maxage('kim', 'repo2'))
+        self.db.set_repos('kim', [])
+        self.assertEqual([], self.db.get_repos('kim'))
+
+    def test_set_repo_attr(self):
+        self.db.add_user('annik')
+        self.db.set_repos('annik', ['repo1'])
+        self.assertEqual('default', self.db.get_repo_attr('annik', 'repo1', 'encoding', 'default'))
+        self.db.set_repo_attr('annik', 'repo1', 'encoding', 'utf-8')
+        self.db.set_repo_attr('annik', 'repo1', 'encoding', 'latin1')
+        self.assertEqual('latin1', self.db.get_repo_attr('annik', 'repo1', 'encoding'))
+
+    def test_get_users(self):
+        for name in ['delta', 'alpha', 'charlie', 'bravo']:
+            self.db.add_user(name)
+            self.db.set_email(name, '%s@test.com' % name)
+            self.db.set_repos(name, ['repo1', 'repo2'])
+        self.db.set_is_admin('charlie', True)
+        self.db.set_repo_attr('bravo', 'repo2', 'keepdays', '30')
+        count = self.db.query_count
+        users = self.db.get_users()
+        self.assertEqual(count + 1, self.db.query_count)
+        self.assertEqual(['alpha', 'bravo', 'charlie', 'delta'], [u for u, r in users])
+        self.assertEqual({'maxage': 0, 'keepdays': '30'}, users[1][1]['repo_attrs']['repo2'])
+        self.assertEqual(['bravo', 'charlie'], [u for u, r in self.db.get_users(offset=1, limit=2)])
+        self.assertEqual(['delta'], [u for u, r in self.db.get_users(offset=3)])
+        self.assertEqual(['charlie'], [u for u, r in self.db.get_users(admins=True)])
+        self.assertEqual(['delta'], [u for u, r in self.db.get_users(search='delta@')])
+        self.assertEqual(4, self.db.count_users(search='test.com'))
+        self.assertEqual({'email': 'alpha@test.com', 'user_root': '', 'is_admin': False,
+                          'repos': ['repo1', 'repo2'],
+                          'repo_attrs': {'repo1': {'maxage': 0}, 'repo2': {'maxage': 0}}},
+                         self.db.get_user('alpha'))
+
+    def test_sessions(self):
+        self.db.add_user('annik')
+        self.db.set_repos('annik', ['repo1', 'repo2'])
+        self.db.add_sessions('annik', 'repo1', [(10, 0, 100, 10, '', 0, ''), (20, 0, 110, 10, 'error', 1, 'Error')])
+        self.db.add_sessions('annik', 'repo2', [(15, 0, 100, 10, '', 0, '')])
+        self.assertEqual([10, 15, 20], [row[1] for row in self.db.get_sessions('annik')])
+        self.assertEqual([20], [row[1] for row in self.db.get_sessions('annik', ['repo1'], start=11)])
+        self.assertEqual(20, self.db.get_last_session_date('annik', 'repo1'))
+        self.db.delete_sessions('annik', 'repo1', 20)
+        self.assertEqual([15, 20], [row[1] for row in self.db.get_sessions('annik')])
+
+    def test_userdb(self):
+        """Check if the plugin is used by the user manager."""
+        user = self.app.userdb.add_user('bernie', 'password')
+        user.repos = ['computer', 'laptop']
+        user.repo_list[1].set_attr('keepdays', '7')
+        self.assertIsNotNone(self.app.userdb.login('bernie', 'password'))
+        user = self.app.userdb.get_user('bernie')
+        self.assertEqual(['computer', 'laptop'], user.repos)
+        self.assertEqual('7', user.get_repo('laptop').get_attr('keepdays'))
+
+
+@unittest.skipIf(not POSTGRESQL_URL, "RDIFFWEB_TEST_POSTGRESQL is not defined")
+class SQLUserDBPostgreSQLTest(SQLUserDBTest):
+
+    default_config = {'SQLDatabaseURL': POSTGRESQL_URL or ''}
+
+    def tearDown(self):
+        self.db._db.execute_update("DROP TABLE users, repos, repo_attrs, sessions")
+        self.db.close()
+        AppTestCase.tearDown(self)
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='rdiffweb_tests_db_')
+        self.url = 'sqlite:///' + os.path.join(self.tempdir, 'rdw.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_get_dialect(self):
+        self.assertEqual('sqlite', get_dialect('sqlite://').name)
+        self.assertRaises(ValueError, get_dialect, 'mysql://localhost/rdiffweb')
+
+    def test_sql(self):
+        dialect = get_dialect('sqlite://')
+        dialect.paramstyle = 'format'
+        self.assertEqual("SELECT * FROM users WHERE Username = %s AND UserEmail LIKE 'a%%'",
+                         dialect.sql("SELECT * FROM users WHERE Username = ? AND UserEmail LIKE 'a%'"))
+
+    def test_connection_reused(self):
+        db = SQLDatabase(self.url, pool_size=2)
+        db.create_tables()
+        threads = [threading.Thread(target=lambda: db.execute_query("SELECT * FROM users"))
+                   for unused in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(db.pool._count, 2)
+        self.assertEqual(0, db.pool.checkedout)
+        db.close()
+        self.assertEqual(0, db.pool._count)
+
+    def test_create_tables_add_version(self):
+        db = SQLDatabase(self.url)
+        db.execute_update("create table users (UserID integer primary key autoincrement, Username varchar (50))")
+        self.assertFalse(db.create_tables())
+        self.assertEqual([], db.execute_query("SELECT Version FROM users"))
+        # Existing columns are kept.
+        self.assertFalse(db.create_tables())
+        db.close()
+
+    def test_transaction_rollback(self):
+        db = SQLDatabase(self.url)
+        db.create_tables()
+        with self.assertRaises(ValueError):
+            with db.transaction() as cursor:
+                cursor.execute("INSERT INTO users (Username) values (?)", ('annik',))
+                raise ValueError()
+        self.assertEqual([], db.execute_query("SELECT * FROM users"))
+        db.close()
+
+
+class MigrateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp(prefix='rdiffweb_tests_db_')
+        self.path = os.path.join(self.tempdir, 'rdw.db')
+        conn = sqlite3.connect(self.path)
+        # Schema of older version with attributes stored as columns.
+        conn.executescript("""
+create table users (UserID integer primary key autoincrement, Username varchar (50) unique NOT NULL,
+Password varchar (40) NOT NULL DEFAULT "", UserRoot varchar (255) NOT NULL DEFAULT "",
+IsAdmin tinyint NOT NULL DEFAULT FALSE, UserEmail varchar (255) NOT NULL DEFAULT "",
+RestoreFormat tinyint NOT NULL DEFAULT TRUE);
+create table repos (RepoID integer primary key autoincrement, UserID int(11) NOT NULL,
+RepoPath varchar (255) NOT NULL, MaxAge tinyint NOT NULL DEFAULT 0, keepdays varchar(255) NOT NULL DEFAULT "");
+insert into users (Username, Password, UserRoot, IsAdmin, UserEmail) values ('admin', 'hash', '/backups/', '1', 'admin@test.com');
+insert into users (Username, UserRoot) values ('annik', '/backups/annik');
+insert into repos (UserID, RepoPath, MaxAge, keepdays) values (2, 'repo1', 3, '30');
+insert into repos (UserID, RepoPath) values (2, 'repo2');
+""")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_copy_database(self):
+        db = SQLDatabase('sqlite://')
+        self.assertEqual(2, copy_database(self.path, db))
+        self.assertEqual(
+            [('admin', 'hash', '/backups/', 1, 'admin@test.com'), ('annik', '', '/backups/annik', 0, '')],
+            db.execute_query("SELECT Username, Password, UserRoot, IsAdmin, UserEmail FROM users ORDER BY Username"))
+        self.assertEqual(
+            [('repo1', 3, 'keepdays', '30'), ('repo2', 0, None, None)],
+            db.execute_query("SELECT RepoPath, MaxAge, Name, Value FROM repos "
+                             "LEFT JOIN repo_attrs ON repos.RepoID = repo_attrs.RepoID ORDER BY RepoPath"))
+        # Destination must be empty.
+        with self.assertRaises(RdiffError):
+            copy_database(self.path, db)
+        self.assertEqual(2, copy_database(self.path, db, force=True))
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -23,32 +23,49 @@ into a SQLite database.
 from __future__ import unicode_literals
 
 from builtins import str
+import cherrypy
+from contextlib import contextmanager
 import logging
+import threading
 from threading import RLock
+import weakref
 
-from rdiffweb.core import InvalidUserError, RdiffError
-from rdiffweb.i18n import ugettext as _
 from rdiffweb.rdw_plugin import IPasswordStore, IDatabase
+from rdiffweb.rdw_userdb import SQLUserStore
 from rdiffweb.user import UserObject
 
 
-try:
-    # Python 2.5+
-    from hashlib import sha1 as sha
-except ImportError:
-    from sha import new as sha
-
 """We do no length validation for incoming parameters, since truncated values
 will at worst lead to slightly confusing results, but no security risks"""
 
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# Version of the database schema. Stored in `user_version` of the database.
+SCHEMA_VERSION = 2
+
+
+class _ThreadConnection(object):
+    """
+    Connection opened by a thread. Only the thread keeps a reference on it, so
+    the connection get closed when the thread ends.
+    """
+
+    def __init__(self, conn, generation):
+        self.conn = conn
+        self.generation = generation
+
+    def __del__(self):
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
 
-class SQLiteUserDB(IPasswordStore, IDatabase):
+class SQLiteUserDB(SQLUserStore, IPasswordStore, IDatabase):
 
-    def _bool(self, val):
-        return str(val).lower() in ['true', '1']
+    # Older version stored booleans as text.
+    _admin_filter = "lower(IsAdmin) IN ('1', 'true')"
 
     def activate(self):
         """
@@ -62,71 +79,72 @@ class SQLiteUserDB(IPasswordStore, IDatabase):
         # Get database location.
         self._db_file = self.app.cfg.get_config("SQLiteDBFile",
                                                 "/etc/rdiffweb/rdw.db")
+        # Number of seconds to wait for a lock on database.
+        self._timeout = self.app.cfg.get_config_int("SQLiteTimeout", "30")
+        self._setup_passwords()
         self._user_root_cache = {}
+        # Columns of each tables.
+        self._columns = {}
+
+        # One connection is kept open for each running thread.
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._generation = 0
+        cherrypy.engine.subscribe('stop', self.close)
+        # Count the queries executed by each request.
+        cherrypy.engine.subscribe('before_request', self._reset_query_count)
+        cherrypy.engine.subscribe('after_request', self._log_query_count)
+
         self._create_or_update()
 
-    def exists(self, username):
+    def deactivate(self):
         """
-        Check if `username` exists.
+        Called by the plugin manager to close the connections.
         """
-        assert isinstance(username, str)
-
-        results = self._execute_query(
-            "SELECT Username FROM users WHERE Username = ?", (username,))
-        return len(results) == 1
+        cherrypy.engine.unsubscribe('stop', self.close)
+        cherrypy.engine.unsubscribe('before_request', self._reset_query_count)
+        cherrypy.engine.unsubscribe('after_request', self._log_query_count)
+        self.close()
+        super(IPasswordStore, self).deactivate()
 
-    def are_valid_credentials(self, username, password):
+    def close(self):
         """
-        Check if the given `username` and `password` are valid.
+        Close every connections to the database. New connections are
+        created when required.
         """
-        assert isinstance(username, str)
-        assert isinstance(password, str)
-        logger.info("validating user [%s] credentials", username)
-        results = self._execute_query(
-            "SELECT Password, Username FROM users WHERE Username = ?",
-            (username,))
-        if not len(results):
-            return None
-        if results[0][0] == self._hash_password(password):
-            return results[0][1]
-        return False
-
-    def get_repos(self, username):
+        with self.create_tables_lock:
+            connections = list(self._connections)
+            self._connections = weakref.WeakSet()
+            self._generation += 1
+        for holder in connections:
+            try:
+                holder.conn.close()
+            except Exception:
+                logger.warning("fail to close database connection", exc_info=1)
+
+    @property
+    def query_count(self):
         """
-        Get list of repos for the given `username`.
+        Number of queries executed by the current thread since the beginning
+        of the request.
         """
-        assert isinstance(username, str)
-        if not self.exists(username):
-            raise InvalidUserError(username)
-        query = ("SELECT RepoPath FROM repos WHERE UserID = %d" %
-                 self._get_user_id(username))
-        return [row[0] for row in self._execute_query(query)]
+        return getattr(self._local, 'queries', 0)
 
-    def get_repo_attr(self, username, repo_path, key, default=None):
+    def _reset_query_count(self):
+        self._local.queries = 0
+
+    def _log_query_count(self):
+        logger.debug("%s database queries executed by request %s",
+                     self.query_count, cherrypy.serving.request.path_info)
+
+    def _get_user_records(self, where, args, attrs=True):
         """
-        Get repository attribute.
+        Keep the root directory of the users read in memory.
         """
-        assert isinstance(username, str)
-        assert isinstance(repo_path, str)
-        query = "SELECT %s FROM repos WHERE RepoPath=? AND UserID = ?" % (key,)
-        try:
-            results = self._execute_query(query, (repo_path, self._get_user_id(username)))
-            if len(results) == 0 or not results[0][0]:
-                return default
-            return results[0][0]
-        except:
-            return default
-
-    def get_repo_maxage(self, username, repoPath):
-        assert isinstance(username, str)
-        query = "SELECT MaxAge FROM repos WHERE RepoPath=? AND UserID = ?"
-        results = self._execute_query(query, (repoPath, self._get_user_id(username)))
-        assert len(results) == 1
-        return int(results[0][0])
-
-    def get_email(self, username):
-        assert isinstance(username, str)
-        return self._get_user_field(username, "UserEmail")
+        records = super(SQLiteUserDB, self)._get_user_records(where, args, attrs)
+        for username, record in records:
+            self._user_root_cache[username] = record['user_root']
+        return records
 
     def get_user_root(self, username):
         """Get user root directory."""
@@ -137,191 +155,65 @@ class SQLiteUserDB(IPasswordStore, IDatabase):
 
         return self._user_root_cache[username]
 
-    def has_password(self, username):
-        """Check if the given user has a password in database."""
-        try:
-            return bool(self._get_user_field(username, "Password"))
-        except InvalidUserError:
-            return False
-
-    def is_admin(self, username):
-        assert isinstance(username, str)
-        value = self._get_user_field(username, "IsAdmin")
-        return self._bool(value)
-
-    def list(self):
-        """
-        Return a list of username.
-        """
-        query = "SELECT UserName FROM users"
-        users = [x[0] for x in self._execute_query(query)]
-        return users
-
-    def add_user(self, username):
-        """
-        Add a new username to this userdb.
-        """
-        assert isinstance(username, str)
-        logger.info("adding new user [%s]", username)
-        query = "INSERT INTO users (Username) values (?)"
-        self._execute_query(query, (username,))
-
-    def delete_user(self, username):
-        """
-        Delete the given `username`.
-        """
-        assert isinstance(username, str)
-        # Check if user exists
-        if not self.exists(username):
-            return False
-        # Delete user
-        logger.info("deleting user [%s]", username)
-        self._execute_query("DELETE FROM repos WHERE UserID=%d" %
-                            self._get_user_id(username))
-        self._execute_query("DELETE FROM users WHERE Username = ?",
-                            (username,))
-        return True
-
-    def set_is_admin(self, username, is_admin):
-        assert isinstance(username, str)
-        if not self.exists(username):
-            raise InvalidUserError(username)
-        if is_admin:
-            admin_int = 1
-        else:
-            admin_int = 0
-        self._execute_query(
-            "UPDATE users SET IsAdmin = ? WHERE Username = ?",
-            (admin_int, username))
-
-    def set_email(self, username, email):
-        assert isinstance(username, str)
-        assert isinstance(email, str)
-        self._set_user_field(username, 'UserEmail', email)
-
-    def set_repos(self, username, repoPaths):
-        assert isinstance(username, str)
-        if not self.exists(username):
-            raise InvalidUserError(username)
-        user_id = self._get_user_id(username)
-
-        # We don't want to just delete and recreate the repos, since that
-        # would lose notification information.
-        existingRepos = self.get_repos(username)
-        reposToDelete = [x for x in existingRepos if x not in repoPaths]
-        reposToAdd = [x for x in repoPaths if x not in existingRepos]
-
-        # delete any obsolete repos
-        for repo in reposToDelete:
-            query = "DELETE FROM repos WHERE UserID=? AND RepoPath=?"
-            self._execute_query(query, (user_id, repo))
-
-        # add in new repos
-        query = "INSERT INTO repos (UserID, RepoPath) values (?, ?)"
-        repoPaths = [[user_id, repo] for repo in reposToAdd]
-        conn = self._connect()
-        try:
-            cursor = conn.cursor()
-            cursor.executemany(query, repoPaths)
-        finally:
-            conn.close()
-
-    def set_password(self, username, password, old_password=None):
-        assert isinstance(username, str)
-        assert old_password is None or isinstance(old_password, str)
-        assert isinstance(password, str)
-        if not password:
-            raise RdiffError(_("Password can't be empty."))
-
-        # Check old password value.
-        if old_password and not self.are_valid_credentials(username, old_password):
-            raise RdiffError(_("Wrong password."))
-
-        # Update password.
-        self._set_user_field(username, 'Password', self._hash_password(password))
-
-    def set_repo_attr(self, username, repo_path, key, value):
-        assert repo_path
-        assert isinstance(key, str) and key.isalpha() and key.islower()
-
-        # Add column if required.
-        self._create_column('repos', key)
-
-        # Update field.
-        query = "UPDATE repos SET %s=? WHERE RepoPath=? AND UserID = ?" % (key,)
-        self._execute_query(query, (value, repo_path, self._get_user_id(username)))
-
-    def set_repo_maxage(self, username, repoPath, maxAge):
-        assert isinstance(username, str)
-        assert repoPath in self.get_repos(username)
-        query = "UPDATE repos SET MaxAge=? WHERE RepoPath=? AND UserID = ?"
-        self._execute_query(query, (maxAge, repoPath, self._get_user_id(username)))
-
     def set_user_root(self, username, user_root):
-        assert isinstance(username, str)
-        assert isinstance(user_root, str)
-        if not self.exists(username):
-            raise InvalidUserError(username)
         # Remove the user from the cache before
         # updating the database.
         self._user_root_cache.pop(username, None)
-        self._execute_query(
-            "UPDATE users SET UserRoot=? WHERE Username = ?",
-            (user_root, username))
-
-    def _get_user_id(self, username):
-        assert self.exists(username)
-        return self._get_user_field(username, 'UserID')
-
-    def _get_user_field(self, username, fieldName):
-        if not self.exists(username):
-            raise InvalidUserError(username)
-        query = "SELECT " + fieldName + " FROM users WHERE Username = ?"
-        results = self._execute_query(query, (username,))
-        assert len(results) == 1
-        return results[0][0]
-
-    def _set_user_field(self, username, fieldName, value):
-        assert isinstance(username, str)
-        assert isinstance(fieldName, str)
-        assert isinstance(value, str) or isinstance(value, bool) or isinstance(value, int)
-
-        if not self.exists(username):
-            raise InvalidUserError(username)
-        if isinstance(value, bool):
-            if value:
-                value = '1'
-            else:
-                value = '0'
-        query = 'UPDATE users SET ' + fieldName + '=? WHERE Username=?'
-        self._execute_query(query, (value, username))
-
-    def _hash_password(self, password):
-        # At this point the password should be unicode. We converted it into
-        # system encoding.
-        password_b = password.encode('utf8')
-        hasher = sha()
-        hasher.update(password_b)
-        value = hasher.hexdigest()
-        if isinstance(value, bytes):
-            value = value.decode(encoding='latin1')
-        return value
+        super(SQLiteUserDB, self).set_user_root(username, user_root)
 
     def _execute_query(self, query, args=()):
         assert isinstance(query, str)
-        conn = self._connect()
+        self._local.queries = self.query_count + 1
+        cursor = self._connect().cursor()
         try:
-            cursor = conn.cursor()
             cursor.execute(query, args)
-            results = cursor.fetchall()
+            return cursor.fetchall()
         finally:
-            conn.close()
-        return results
+            cursor.close()
+
+    def _execute_update(self, query, args=()):
+        """
+        Execute the given statement and return the number of rows modified.
+        """
+        assert isinstance(query, str)
+        self._local.queries = self.query_count + 1
+        cursor = self._connect().cursor()
+        try:
+            cursor.execute(query, args)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Return a cursor to execute multiple statements in a single
+        transaction. The transaction is rolled back on error.
+        """
+        self._local.queries = self.query_count + 1
+        cursor = self._connect().cursor()
+        try:
+            # Acquire the write lock immediately. Otherwise, a transaction
+            # reading then writing may fail when another thread is writing.
+            cursor.execute("BEGIN IMMEDIATE TRANSACTION")
+            try:
+                yield cursor
+            except:
+                cursor.execute("ROLLBACK TRANSACTION")
+                raise
+            cursor.execute("COMMIT TRANSACTION")
+        finally:
+            cursor.close()
 
     def _connect(self):
         """
-        Called to create a new connection to database.
+        Return the connection to database of the current thread. A new
+        connection is created when required.
         """
+        holder = getattr(self._local, 'holder', None)
+        if holder is not None and holder.generation == self._generation:
+            return holder.conn
+
         try:
             import sqlite3
         except ImportError:
@@ -330,8 +222,20 @@ class SQLiteUserDB(IPasswordStore, IDatabase):
         connect_path = self._db_file
         if not connect_path:
             connect_path = ":memory:"
-        conn = sqlite3.connect(connect_path)
+        # Connection are only used by the current thread, but get closed by
+        # the engine.
+        conn = sqlite3.connect(
+            connect_path, timeout=self._timeout, cached_statements=256,
+            check_same_thread=False)
         conn.isolation_level = None
+        if connect_path != ":memory:":
+            # Let readers and writer work concurrently.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        with self.create_tables_lock:
+            holder = _ThreadConnection(conn, self._generation)
+            self._connections.add(holder)
+            self._local.holder = holder
         return conn
 
     def _create_or_update(self):
@@ -343,42 +247,65 @@ class SQLiteUserDB(IPasswordStore, IDatabase):
         with self.create_tables_lock:
 
             # Check if tables exists, if not created them.
-            if self._get_tables():
+            tables = self._get_tables()
+            if tables:
+                # Create tables added in later version.
+                if 'sessions' not in tables:
+                    self._execute_statements(self._get_create_statements()[2:4])
+                self._migrate()
                 return
 
             # Create the tables.
-            conn = self._connect()
-            try:
-                cursor = conn.cursor()
-                cursor.execute("BEGIN TRANSACTION")
-                for statement in self._get_create_statements():
-                    cursor.execute(statement)
-                cursor.execute("COMMIT TRANSACTION")
-            finally:
-                conn.close()
-
-            # Create admin user
-            self.add_user('admin')
-            self.set_password('admin', 'admin123', old_password=None)
-            self.set_user_root('admin', '/backups/')
-            self.set_is_admin('admin', True)
-
-    def _create_column(self, table, column):
+            self._execute_statements(
+                self._get_create_statements() +
+                ["PRAGMA user_version = %d" % SCHEMA_VERSION])
+
+            self._add_default_admin()
+
+    def _migrate(self):
         """
-        Add a column to the tables.
+        Update the schema of an existing database to the current version.
         """
-        # Check if column exists.
-        if column in self._get_columns(table):
+        version = self._execute_query("PRAGMA user_version")[0][0]
+        if version >= SCHEMA_VERSION:
             return
-        # Add column.
-        self._execute_query('ALTER TABLE %s ADD COLUMN %s varchar(255) NOT NULL DEFAULT ""' % (table, column,))
+        logger.info("updating database schema from version %s to %s", version, SCHEMA_VERSION)
+        statements = self._get_create_statements()[4:]
+        # Repository attributes used to be stored as columns of repos table.
+        for column in self._get_columns('repos', refresh=True):
+            if column in ['RepoID', 'UserID', 'RepoPath', 'MaxAge']:
+                continue
+            statements.append(
+                "INSERT OR REPLACE INTO repo_attrs (RepoID, Name, Value) "
+                "SELECT RepoID, '%s', %s FROM repos WHERE %s IS NOT NULL AND %s != ''" %
+                (column.lower(), column, column, column))
+        # Version of users was added later.
+        if 'Version' not in self._get_columns('users', refresh=True):
+            statements.append("ALTER TABLE users ADD COLUMN Version int NOT NULL DEFAULT 0")
+        statements.append("PRAGMA user_version = %d" % SCHEMA_VERSION)
+        self._execute_statements(statements)
+
+    def _execute_statements(self, statements):
+        """
+        Execute the given statements in a single transaction.
+        """
+        with self._transaction() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self._columns.clear()
 
-    def _get_columns(self, table):
+    def _get_columns(self, table, refresh=False):
         """
-        List columns for the given table.
+        List columns for the given table. Columns are kept in memory.
         """
         assert table
-        return [row[1] for row in self._execute_query("pragma table_info('%s')" % (table,))]
+        columns = None if refresh else self._columns.get(table)
+        if columns is None:
+            columns = [row[1] for row in self._execute_query("pragma table_info('%s')" % (table,))]
+            # Don't keep missing table in memory.
+            if columns:
+                self._columns[table] = columns
+        return columns
 
     def _get_tables(self):
         return [
@@ -394,13 +321,28 @@ Password varchar (40) NOT NULL DEFAULT "",
 UserRoot varchar (255) NOT NULL DEFAULT "",
 IsAdmin tinyint NOT NULL DEFAULT FALSE,
 UserEmail varchar (255) NOT NULL DEFAULT "",
-RestoreFormat tinyint NOT NULL DEFAULT TRUE)""",
+RestoreFormat tinyint NOT NULL DEFAULT TRUE,
+Version int NOT NULL DEFAULT 0)""",
             """create table repos (
 RepoID integer primary key autoincrement,
 UserID int(11) NOT NULL,
 RepoPath varchar (255) NOT NULL,
-MaxAge tinyint NOT NULL DEFAULT 0)"""
+MaxAge tinyint NOT NULL DEFAULT 0)""",
+            """create table sessions (
+SessionID integer primary key autoincrement,
+RepoID int(11) NOT NULL,
+Date int NOT NULL,
+TzOffset int NOT NULL DEFAULT 0,
+Size bigint NOT NULL DEFAULT 0,
+IncrementSize bigint NOT NULL DEFAULT 0,
+Errors text NOT NULL DEFAULT "",
+ErrorCount int NOT NULL DEFAULT 0,
+ErrorClasses varchar (255) NOT NULL DEFAULT "")""",
+            """create index sessions_repo_date on sessions (RepoID, Date)""",
+            """create table if not exists repo_attrs (
+RepoID int(11) NOT NULL,
+Name varchar (255) NOT NULL,
+Value text,
+PRIMARY KEY (RepoID, Name))""",
+            """create index if not exists repos_user_path on repos (UserID, RepoPath)""",
         ]
-
-    def supports(self, operation):
-        return hasattr(self, operation)
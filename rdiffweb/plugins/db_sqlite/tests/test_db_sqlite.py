@@ -23,9 +23,13 @@ Created on Oct 17, 2015
 
 from __future__ import unicode_literals
 
+import gc
+import sqlite3
+import threading
 import unittest
 
 from rdiffweb.core import InvalidUserError, RdiffError
+from rdiffweb.plugins.db_sqlite import SCHEMA_VERSION
 from rdiffweb.test import AppTestCase
 
 
@@ -60,6 +64,29 @@ class SQLiteUserDBTest(AppTestCase):
     def test_are_valid_credentials_with_invalid_user(self):
         self.assertIsNone(self.db.are_valid_credentials('josh', 'password'))
 
+    def test_are_valid_credentials_rehash(self):
+        # Unsalted SHA-1 stored by older versions.
+        self.db.add_user('kim')
+        self.db._set_user_field('kim', 'Password', '5baa61e4c9b93f3f0682250b6cf8331b7ee68fd8')
+        self.assertEqual('kim', self.db.are_valid_credentials('kim', 'password'))
+        # Password hash is replaced.
+        hashed = self.db._get_user_field('kim', 'Password')
+        self.assertTrue(hashed.startswith('pbkdf2_sha256$'))
+        self.assertEqual('kim', self.db.are_valid_credentials('kim', 'password'))
+        self.assertFalse(self.db.are_valid_credentials('kim', 'invalid'))
+
+    def test_are_valid_credentials_cached(self):
+        self.db.add_user('tom')
+        self.db.set_password('tom', 'password')
+        self.assertEqual('tom', self.db.are_valid_credentials('tom', 'password'))
+        self.assertEqual(1, len(self.db._credentials))
+        self.assertEqual('tom', self.db.are_valid_credentials('tom', 'password'))
+        self.assertFalse(self.db.are_valid_credentials('tom', 'invalid'))
+        # Cached credentials are not valid after password change.
+        self.db.set_password('tom', 'new_password')
+        self.assertFalse(self.db.are_valid_credentials('tom', 'password'))
+        self.assertEqual('tom', self.db.are_valid_credentials('tom', 'new_password'))
+
     def test_delete_user(self):
         # Create user
         self.db.add_user('vicky')
@@ -124,6 +151,52 @@ class SQLiteUserDBTest(AppTestCase):
         self.assertEqual(1, len(users))
         self.assertEqual('annik', users[0].username)
 
+    def test_get_user(self):
+        self.db.add_user('annik')
+        self.db.set_user_root('annik', '/backups/annik')
+        self.db.set_email('annik', 'annik@test.com')
+        self.db.set_repos('annik', ['repo1', 'repo2'])
+        self.db.set_repo_attr('annik', 'repo2', 'keepdays', '30')
+        count = self.db.query_count
+        record = self.db.get_user('annik')
+        self.assertEqual(count + 1, self.db.query_count)
+        self.assertEqual({'email': 'annik@test.com',
+                          'user_root': '/backups/annik',
+                          'is_admin': False,
+                          'repos': ['repo1', 'repo2'],
+                          'repo_attrs': {'repo1': {'maxage': 0},
+                                         'repo2': {'maxage': 0, 'keepdays': '30'}}}, record)
+        self.db.add_user('kim')
+        self.assertEqual([], self.db.get_user('kim')['repos'])
+        with self.assertRaises(InvalidUserError):
+            self.db.get_user('invalid')
+
+    def test_get_users(self):
+        for name in ['delta', 'alpha', 'charlie', 'bravo']:
+            self.db.add_user(name)
+            self.db.set_email(name, '%s@test.com' % name)
+            self.db.set_repos(name, ['repo1', 'repo2'])
+        self.db.set_is_admin('charlie', True)
+        self.db.set_repo_attr('bravo', 'repo2', 'keepdays', '30')
+        count = self.db.query_count
+        users = self.db.get_users()
+        self.assertEqual(count + 1, self.db.query_count)
+        self.assertEqual(['alpha', 'bravo', 'charlie', 'delta'], [u for u, r in users])
+        bravo = users[1][1]
+        self.assertEqual(['repo1', 'repo2'], bravo['repos'])
+        self.assertEqual('bravo@test.com', bravo['email'])
+        self.assertEqual('30', bravo['repo_attrs']['repo2']['keepdays'])
+        self.assertNotIn('keepdays', bravo['repo_attrs']['repo1'])
+        # Filter and paginate.
+        self.assertEqual(['bravo', 'charlie'], [u for u, r in self.db.get_users(offset=1, limit=2)])
+        self.assertEqual(['delta'], [u for u, r in self.db.get_users(offset=3)])
+        self.assertEqual(['charlie'], [u for u, r in self.db.get_users(admins=True)])
+        self.assertEqual(['charlie'], [u for u, r in self.db.get_users(search='char')])
+        self.assertEqual(['delta'], [u for u, r in self.db.get_users(search='delta@')])
+        self.assertEqual(4, self.db.count_users())
+        self.assertEqual(1, self.db.count_users(admins=True))
+        self.assertEqual(4, self.db.count_users(search='test.com'))
+
     def test_set_invalid_user(self):
         with self.assertRaises(InvalidUserError):
             self.db.set_user_root('invalid', '/backups/')
@@ -163,6 +236,172 @@ class SQLiteUserDBTest(AppTestCase):
         self.assertEquals([], self.db.get_repos('kim'))
 
 
+    def test_sessions(self):
+        """Check if sessions are recorded and queried by date."""
+        self.db.add_user('annik')
+        self.db.set_repos('annik', ['repo1', 'repo2'])
+        self.db.add_sessions('annik', 'repo1', [(10, 0, 100, 1, '', 0, ''), (20, 0, 200, 2, 'error', 1, 'ListError')])
+        self.db.add_sessions('annik', 'repo2', [(15, -18000, 150, 3, '', 0, '')])
+        self.assertEqual(20, self.db.get_last_session_date('annik', 'repo1'))
+        self.assertEqual(
+            [('repo1', 10, 0, 100, 1, '', 0, ''),
+             ('repo2', 15, -18000, 150, 3, '', 0, ''),
+             ('repo1', 20, 0, 200, 2, 'error', 1, 'ListError')],
+            self.db.get_sessions('annik'))
+        self.assertEqual([10, 20], [row[1] for row in self.db.get_sessions('annik', ['repo1'])])
+        self.assertEqual([15, 20], [row[1] for row in self.db.get_sessions('annik', start=15)])
+        self.assertEqual([10, 15], [row[1] for row in self.db.get_sessions('annik', end=15)])
+        # Delete old sessions.
+        self.db.delete_sessions('annik', 'repo1', 15)
+        self.assertEqual([15, 20], [row[1] for row in self.db.get_sessions('annik')])
+        # Sessions are deleted with repository.
+        self.db.set_repos('annik', ['repo1'])
+        self.assertEqual([20], [row[1] for row in self.db.get_sessions('annik')])
+
+    def test_update_database(self):
+        """Check if tables are added to existing database."""
+        self.db._execute_query("DROP TABLE sessions")
+        self.assertNotIn('sessions', self.db._get_tables())
+        self.db._create_or_update()
+        self.assertIn('sessions', self.db._get_tables())
+
+    def test_update_database_repo_attrs(self):
+        """Check if repository attributes stored as columns are migrated."""
+        self.db.add_user('annik')
+        self.db.set_repos('annik', ['repo1', 'repo2'])
+        self.db._execute_statements([
+            "DROP TABLE repo_attrs",
+            "DROP INDEX repos_user_path",
+            'ALTER TABLE repos ADD COLUMN keepdays varchar(255) NOT NULL DEFAULT ""',
+            "UPDATE repos SET keepdays = '30' WHERE RepoPath = 'repo1'",
+            "PRAGMA user_version = 0"])
+        self.db._create_or_update()
+        self.assertIn('repo_attrs', self.db._get_tables())
+        self.assertEqual(SCHEMA_VERSION, self.db._execute_query("PRAGMA user_version")[0][0])
+        self.assertEqual('30', self.db.get_repo_attr('annik', 'repo1', 'keepdays'))
+        self.assertEqual(None, self.db.get_repo_attr('annik', 'repo2', 'keepdays'))
+        # Check if indexes are used.
+        plan = self.db._execute_query(
+            "EXPLAIN QUERY PLAN SELECT RepoID FROM repos WHERE UserID = 1 AND RepoPath = 'repo1'")
+        self.assertIn('repos_user_path', ' '.join(str(row) for row in plan))
+
+    def test_update_database_version(self):
+        """Check if version column is added to users."""
+        self.db.add_user('annik')
+        self.db._execute_statements([
+            "ALTER TABLE users RENAME TO old_users",
+            """create table users (
+UserID integer primary key autoincrement,
+Username varchar (50) unique NOT NULL,
+Password varchar (40) NOT NULL DEFAULT "",
+UserRoot varchar (255) NOT NULL DEFAULT "",
+IsAdmin tinyint NOT NULL DEFAULT FALSE,
+UserEmail varchar (255) NOT NULL DEFAULT "",
+RestoreFormat tinyint NOT NULL DEFAULT TRUE)""",
+            "INSERT INTO users (UserID, Username) SELECT UserID, Username FROM old_users",
+            "DROP TABLE old_users",
+            "PRAGMA user_version = 1"])
+        self.db._create_or_update()
+        self.assertIn('Version', self.db._get_columns('users'))
+        version = self.db.get_user_version('annik')
+        self.db.set_email('annik', 'annik@test.com')
+        self.assertNotEqual(version, self.db.get_user_version('annik'))
+
+    def test_get_user_version(self):
+        """Check if version of user changes with every modification."""
+        self.db.add_user('annik')
+        self.assertIsNone(self.db.get_user_version('invalid'))
+        versions = [self.db.get_user_version('annik')]
+        self.db.set_email('annik', 'annik@test.com')
+        versions.append(self.db.get_user_version('annik'))
+        self.db.set_repos('annik', ['repo1'])
+        versions.append(self.db.get_user_version('annik'))
+        self.db.set_repo_attr('annik', 'repo1', 'keepdays', '30')
+        versions.append(self.db.get_user_version('annik'))
+        self.db.set_repo_maxage('annik', 'repo1', 3)
+        versions.append(self.db.get_user_version('annik'))
+        self.db.set_password('annik', 'password')
+        versions.append(self.db.get_user_version('annik'))
+        self.assertEqual(len(versions), len(set(versions)))
+        # Summaries are not kept in session.
+        self.db.set_repo_attr('annik', 'repo1', 'summary', '{}')
+        self.assertEqual(versions[-1], self.db.get_user_version('annik'))
+        # Version is lost with the user.
+        self.db.delete_user('annik')
+        self.assertIsNone(self.db.get_user_version('annik'))
+        self.db.add_user('annik')
+        self.assertNotIn(self.db.get_user_version('annik'), versions)
+
+    def test_connection_reused(self):
+        """Check if a single connection is used by a thread."""
+        self.db.add_user('annik')
+        count = len(self.db._connections)
+        self.db.set_repos('annik', ['repo1'])
+        self.db.get_repos('annik')
+        self.db.get_email('annik')
+        self.assertEqual(count, len(self.db._connections))
+        self.assertEqual('wal', self.db._execute_query("PRAGMA journal_mode")[0][0])
+
+    def test_connection_per_thread(self):
+        count = len(self.db._connections)
+        results = []
+
+        def run():
+            results.append(self.db.exists('admin'))
+            results.append(len(self.db._connections))
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        self.assertEqual([False, count + 1], results)
+
+    def test_connection_released_with_thread(self):
+        """Check if the connection of a finished thread is released."""
+        self.db.exists('admin')
+        count = len(self.db._connections)
+        conns = []
+        thread = threading.Thread(target=lambda: conns.append(self.db._connect()))
+        thread.start()
+        thread.join()
+        gc.collect()
+        self.assertEqual(count, len(self.db._connections))
+        # The connection is closed.
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conns[0].execute("SELECT 1")
+
+    def test_close(self):
+        self.db.add_user('annik')
+        self.db.close()
+        self.assertEqual(0, len(self.db._connections))
+        # New connection get created.
+        self.assertTrue(self.db.exists('annik'))
+        self.assertEqual(1, len(self.db._connections))
+
+    def test_concurrent_writes(self):
+        def add_users(prefix):
+            for i in range(20):
+                self.db.add_user('%s%s' % (prefix, i))
+                self.db.set_repos('%s%s' % (prefix, i), ['repo1', 'repo2'])
+        threads = [threading.Thread(target=add_users, args=(p,)) for p in 'abcd']
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(80, len(self.db.list()))
+        self.assertEqual(['repo1', 'repo2'], self.db.get_repos('c19'))
+
+    def test_set_repo_attr(self):
+        self.db.add_user('annik')
+        self.db.set_repos('annik', ['repo1'])
+        self.assertEqual('default', self.db.get_repo_attr('annik', 'repo1', 'encoding', 'default'))
+        self.db.set_repo_attr('annik', 'repo1', 'encoding', 'utf-8')
+        self.assertEqual('utf-8', self.db.get_repo_attr('annik', 'repo1', 'encoding'))
+        self.db.set_repo_attr('annik', 'repo1', 'encoding', 'latin1')
+        self.assertEqual('latin1', self.db.get_repo_attr('annik', 'repo1', 'encoding'))
+        # Attributes are deleted with the repository.
+        self.db.set_repos('annik', [])
+        self.assertEqual([], self.db._execute_query("SELECT * FROM repo_attrs"))
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
@@ -74,6 +74,8 @@ class DeleteRepoPage(MainPage):
 
 class DeleteRepoPlugin(ITemplateFilterPlugin):
 
+    templates = ['settings.html']
+
     def activate(self):
         # Register new handler to delete repository.
         self.app.root.delete = DeleteRepoPage(self.app)
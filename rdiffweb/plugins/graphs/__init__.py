@@ -22,21 +22,27 @@ from __future__ import unicode_literals
 from builtins import bytes
 from builtins import str
 import cherrypy
-from future.utils import iteritems
+import json
 import logging
 import pkg_resources
+import time
 
 from rdiffweb import librdiff, rdw_helpers
 from rdiffweb import page_main
 import rdiffweb
 from rdiffweb.dispatch import poppath, static
 from rdiffweb.i18n import ugettext as _
+from rdiffweb.plugins.graphs.stats import SessionStatsCache, BUCKETS, combine
 from rdiffweb.rdw_helpers import unquote_url
 from rdiffweb.rdw_plugin import IRdiffwebPlugin, ITemplateFilterPlugin
 
 
 _logger = logging.getLogger(__name__)
 
+# Metrics shown in overview of repositories.
+OVERVIEW_METRICS = ['sourcefilesize:last', 'incrementfilesize:sum',
+                    'changedfiles:sum', 'errors:sum']
+
 
 def url_for_graphs(repo, graph=''):
     """
@@ -55,7 +61,12 @@ def url_for_graphs(repo, graph=''):
 @poppath('graph')
 class GraphsPage(page_main.MainPage):
 
-    def _data(self, path, **kwargs):
+    def __init__(self, app):
+        page_main.MainPage.__init__(self, app)
+        self._stats = SessionStatsCache()
+
+    def _data(self, path, start=None, end=None, max_points=None, bucket=None,
+              metrics=None, agg='last', format='csv', **kwargs):
         assert isinstance(path, bytes)
 
         _logger.debug("repo stats [%r]", path)
@@ -67,29 +78,29 @@ class GraphsPage(page_main.MainPage):
             _logger.exception("invalid user path [%r]", path)
             return self._compile_error_template(str(e))
 
-        attrs = [
-            'starttime', 'endtime', 'elapsedtime', 'sourcefiles', 'sourcefilesize',
-            'mirrorfiles', 'mirrorfilesize', 'newfiles', 'newfilesize', 'deletedfiles',
-            'deletedfilesize', 'changedfiles', 'changedsourcesize', 'changedmirrorsize',
-            'incrementfiles', 'incrementfilesize', 'totaldestinationsizechange', 'errors']
-
-        # Return a generator
-        def func():
-            # Header
-            yield 'date'
-            for attr in attrs:
-                yield ','
-                yield attr
-            yield '\n'
-            # Content
-            for d, s in iteritems(repo_obj.session_statistics):
-                yield str(d.getSeconds())
-                for attr in attrs:
-                    yield ','
-                    yield str(getattr(s, attr))
-                yield '\n'
-
-        return func()
+        # Validate optional date range (seconds since epoch) and sampling.
+        for value in [start, end, max_points]:
+            if value:
+                self.assertIsInt(value)
+        if format not in ['csv', 'json']:
+            raise cherrypy.HTTPError(400, _("Invalid format."))
+        params = {
+            'start': int(start) if start else None,
+            'end': int(end) if end else None,
+            'max_points': int(max_points) if max_points else None,
+            'bucket': bucket or None,
+            'metrics': metrics.split(',') if metrics else None,
+            'agg': agg,
+        }
+
+        stats = self._stats.get(repo_obj)
+        try:
+            if format == 'json':
+                cherrypy.response.headers['Content-Type'] = 'application/json'
+                return stats.to_json(**params).encode('utf-8')
+            return stats.to_csv(**params)
+        except ValueError as e:
+            raise cherrypy.HTTPError(400, str(e))
 
     def _page(self, path, graph, **kwargs):
         """
@@ -114,8 +125,74 @@ class GraphsPage(page_main.MainPage):
         # Generate page.
         return self._compile_template("graphs_%s.html" % graph, **params)
 
+    def _overview(self, bucket='month', start=None, end=None, all_users=None,
+                  format='html', **kwargs):
+        """
+        Show the statistics of every repositories of the current user. For
+        administrators, show every repositories of every users when
+        `all_users` is defined.
+        """
+        _logger.debug("repo graphs overview [%s]", bucket)
+
+        for value in [start, end]:
+            if value:
+                self.assertIsInt(value)
+        if bucket not in BUCKETS:
+            raise cherrypy.HTTPError(400, _("Invalid bucket."))
+        if format not in ['html', 'json']:
+            raise cherrypy.HTTPError(400, _("Invalid format."))
+        all_users = (
+            bool(all_users) and all_users.lower() in ('1', 't', 'true', 'on', 'yes') and
+            self.app.currentuser.is_admin)
+
+        # List the repositories.
+        if all_users:
+            users = self.app.userdb.list()
+        else:
+            users = [self.app.currentuser]
+        locations = [
+            (user.user_root, repo)
+            for user in users if user.user_root
+            for repo in user.repos]
+
+        # Load statistics of each repositories in parallel.
+        threads = self.app.cfg.get_config_int("GraphsThreads", "8")
+        params = {
+            'start': int(start) if start else None,
+            'end': int(end) if end else None,
+            'bucket': bucket,
+            'metrics': OVERVIEW_METRICS,
+        }
+        results = [
+            stats.query(**params)
+            for stats in self._stats.get_many(locations, threads)
+            if stats is not None]
+        dates, columns = combine(results, OVERVIEW_METRICS)
+
+        if format == 'json':
+            data = dict(columns)
+            data['date'] = dates
+            cherrypy.response.headers['Content-Type'] = 'application/json'
+            return json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+        # Periods are computed in UTC.
+        dateformat = '%Y-%m-%d %H:%M' if bucket == 'hour' else '%Y-%m-%d'
+        rows = [
+            dict([('date', d), ('label', time.strftime(dateformat, time.gmtime(d)))] +
+                 [(m, c[i] or 0) for m, c in columns])
+            for i, d in enumerate(dates)]
+        rows.reverse()
+        params = {
+            'bucket': bucket,
+            'buckets': BUCKETS,
+            'all_users': all_users,
+            'repo_count': len(locations),
+            'rows': rows,
+        }
+        return self._compile_template("graphs_overview.html", **params)
+
     @cherrypy.expose
-    def index(self, graph, path, **kwargs):
+    def index(self, graph, path=b"", **kwargs):
         """
         Called to show every graphs
         """
@@ -126,6 +203,8 @@ class GraphsPage(page_main.MainPage):
         # check if data should be shown.
         if graph == 'data':
             return self._data(path, **kwargs)
+        elif graph == 'overview':
+            return self._overview(**kwargs)
         elif graph in ['activities', 'errors', 'files', 'sizes', 'times']:
             return self._page(path, graph, **kwargs)
         # Raise error.
@@ -156,3 +235,5 @@ class GraphsPlugins(ITemplateFilterPlugin):
             # Add our graph item in repo_nav_bar
             # id, label, url, icon
             data.setdefault('repo_nav_bar_extras', []).append(('graphs', _('Graphs'), url_for_graphs(data.get('repo_path'), 'activities'), 'icon-chart-bar'))
+        # Add overview of every repositories in nav_bar
+        data.setdefault('nav_bar_extras', []).append(('graphs', _('Graphs'), url_for_graphs(b'', 'overview')))
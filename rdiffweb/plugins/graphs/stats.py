@@ -0,0 +1,364 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Columnar cache of session statistics.
+
+Every backup session has a `session_statistics` file in `rdiff-backup-data`.
+Reading thousands of small files for every graph is slow. The statistics of
+each repository are parsed once and kept in memory as one list per metric.
+When new sessions are created, only the new files are parsed.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from builtins import object
+from builtins import str
+import bisect
+import calendar
+import json
+import logging
+from multiprocessing.pool import ThreadPool
+import os
+import threading
+import time
+
+from rdiffweb import librdiff
+
+
+_logger = logging.getLogger(__name__)
+
+# List of metrics available in session statistics.
+STATS_FIELDS = librdiff.SESSION_STATISTICS_FIELDS
+
+
+def _hour(value):
+    start = value - value % 3600
+    return start, start + 3600
+
+
+def _day(value):
+    start = value - value % 86400
+    return start, start + 86400
+
+
+def _week(value):
+    # Weeks start on Monday. Epoch is a Thursday.
+    start = value - (value + 3 * 86400) % (7 * 86400)
+    return start, start + 7 * 86400
+
+
+def _month(value):
+    t = time.gmtime(value)
+    start = calendar.timegm((t.tm_year, t.tm_mon, 1, 0, 0, 0))
+    end = calendar.timegm((t.tm_year + t.tm_mon // 12, t.tm_mon % 12 + 1, 1, 0, 0, 0))
+    return start, end
+
+
+# Functions to compute the beginning and the end of a period.
+_BUCKETS = {
+    'hour': _hour,
+    'day': _day,
+    'week': _week,
+    'month': _month,
+}
+
+# Aggregate functions.
+_AGGREGATES = {
+    'sum': sum,
+    'min': min,
+    'max': max,
+    'avg': lambda values: float(sum(values)) / len(values),
+    'last': lambda values: values[-1],
+}
+
+BUCKETS = ['hour', 'day', 'week', 'month']
+
+AGGREGATES = sorted(_AGGREGATES)
+
+
+def _parse_metrics(metrics, agg):
+    """
+    Return the list of metrics and aggregate functions. Raise ValueError if
+    invalid.
+    """
+    if agg not in _AGGREGATES:
+        raise ValueError("invalid aggregate function: %s" % agg)
+    if not metrics:
+        return list(STATS_FIELDS), [agg] * len(STATS_FIELDS)
+    names = []
+    funcs = []
+    for metric in metrics:
+        name, unused, func = metric.partition(':')
+        if name not in STATS_FIELDS:
+            raise ValueError("invalid metric: %s" % name)
+        if func and func not in _AGGREGATES:
+            raise ValueError("invalid aggregate function: %s" % func)
+        names.append(name)
+        funcs.append(func or agg)
+    return names, funcs
+
+
+class SessionStats(object):
+    """
+    Session statistics of a repository stored by column. `dates` is the
+    sorted list of session dates in seconds since epoch (UTC) and `columns`
+    contains one list of values per metric.
+    """
+
+    def __init__(self, dates=None, columns=None, mtime=None):
+        self.dates = dates or []
+        self.columns = columns or dict((f, []) for f in STATS_FIELDS)
+        # Used to detect modification of the repository.
+        self.mtime = mtime
+        self.checked = time.time()
+        # Results of previous queries. The statistics are never modified.
+        self._queries = {}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def update(self, repo, mtime=None, threads=1):
+        """
+        Return a new `SessionStats` including the sessions of the given
+        repository. Only sessions missing from this object are read, using
+        the given number of threads.
+        """
+        entries = list(repo.session_statistics.values())
+        dates = [e.date.getSeconds() for e in entries]
+        # Sessions may get deleted from the beginning of the history.
+        skip = bisect.bisect_left(self.dates, dates[0]) if dates else len(self.dates)
+        if self.dates[skip:] != dates[:len(self.dates) - skip]:
+            _logger.debug("session statistics changed, reading all sessions")
+            skip = 0
+            start = 0
+            stats = SessionStats(mtime=mtime)
+        else:
+            start = len(self.dates) - skip
+            stats = SessionStats(
+                self.dates[skip:],
+                dict((f, c[skip:]) for f, c in self.columns.items()),
+                mtime=mtime)
+        # Read new sessions.
+        records = librdiff.load_session_statistics(entries[start:], threads)
+        stats.dates.extend(dates[start:])
+        for i, attr in enumerate(STATS_FIELDS):
+            stats.columns[attr].extend(None if r is None else r[i] for r in records)
+        return stats
+
+    def slice(self, start=None, end=None):
+        """
+        Return the range of index of sessions between `start` and `end`
+        (inclusive, in seconds since epoch).
+        """
+        lo = 0
+        hi = len(self.dates)
+        if start is not None:
+            lo = bisect.bisect_left(self.dates, start)
+        if end is not None:
+            hi = bisect.bisect_right(self.dates, end, lo)
+        return lo, hi
+
+    def query(self, start=None, end=None, max_points=None, bucket=None,
+              metrics=None, agg='last'):
+        """
+        Return the statistics as a tuple `(dates, columns)` where `columns`
+        is a list of `(metric, values)`.
+
+        `start` and `end` limit the range of dates (inclusive, in seconds
+        since epoch). `metrics` is the list of metrics to return, each one
+        optionally followed by the aggregate function, e.g.: `errors:sum`.
+
+        If `bucket` is defined (hour, day, week or month), sessions are
+        grouped by period using `agg` as default aggregate function (sum,
+        min, max, avg or last) and dates are the beginning of each period.
+        Otherwise, if `max_points` is defined, sessions are sampled at
+        regular interval to return at most `max_points` rows, always
+        including the last session.
+        """
+        key = (start, end, max_points, bucket, tuple(metrics or []), agg)
+        result = self._queries.get(key)
+        if result is None:
+            result = self._query(start, end, max_points, bucket, metrics, agg)
+            if len(self._queries) >= 16:
+                self._queries.clear()
+            self._queries[key] = result
+        return result
+
+    def _query(self, start, end, max_points, bucket, metrics, agg):
+        metrics, funcs = _parse_metrics(metrics, agg)
+        lo, hi = self.slice(start, end)
+        if bucket:
+            if bucket not in _BUCKETS:
+                raise ValueError("invalid bucket: %s" % bucket)
+            return self._aggregate(lo, hi, bucket, metrics, funcs)
+        indexes = list(range(lo, hi))
+        if max_points and len(indexes) > max_points:
+            step = float(len(indexes)) / max_points
+            indexes = [indexes[int(len(indexes) - 1 - i * step)]
+                       for i in range(max_points)]
+            indexes.reverse()
+        dates = [self.dates[i] for i in indexes]
+        columns = [(m, [self.columns[m][i] for i in indexes]) for m in metrics]
+        return dates, columns
+
+    def _aggregate(self, lo, hi, bucket, metrics, funcs):
+        """
+        Group the sessions between the given index by period.
+        """
+        period = _BUCKETS[bucket]
+        dates = []
+        bounds = []
+        while lo < hi:
+            start, end = period(self.dates[lo])
+            i = bisect.bisect_left(self.dates, end, lo, hi)
+            dates.append(start)
+            bounds.append((lo, i))
+            lo = i
+        columns = []
+        for m, func in zip(metrics, funcs):
+            column = self.columns[m]
+            func = _AGGREGATES[func]
+            values = []
+            for lo, hi in bounds:
+                data = column[lo:hi]
+                if None in data:
+                    data = [v for v in data if v is not None]
+                values.append(func(data) if data else None)
+            columns.append((m, values))
+        return dates, columns
+
+    def _export(self, **kwargs):
+        """
+        Query the statistics to be exported. Columns are identified by metric
+        name, so a metric can't be requested twice.
+        """
+        dates, columns = self.query(**kwargs)
+        names = [m for m, unused in columns]
+        if len(set(names)) != len(names):
+            raise ValueError("duplicate metric")
+        return dates, columns
+
+    def to_csv(self, **kwargs):
+        """
+        Return the statistics as CSV. See `query()` for arguments.
+        """
+        dates, columns = self._export(**kwargs)
+        lines = [','.join(['date'] + [m for m, unused in columns])]
+        for i, date in enumerate(dates):
+            row = [str(date)]
+            row.extend('' if c[i] is None else str(c[i]) for unused, c in columns)
+            lines.append(','.join(row))
+        lines.append('')
+        return '\n'.join(lines)
+
+    def to_json(self, **kwargs):
+        """
+        Return the statistics as compact JSON object with one list per
+        column. See `query()` for arguments.
+        """
+        dates, columns = self._export(**kwargs)
+        data = dict(columns)
+        data['date'] = dates
+        return json.dumps(data, separators=(',', ':'), sort_keys=True)
+
+
+def combine(results, metrics):
+    """
+    Combine the results of `SessionStats.query()` for many repositories by
+    summing the values of each date. For metrics using the `last` aggregate
+    function, the last value of a repository is carried over to the
+    following dates.
+    """
+    metrics, funcs = _parse_metrics(metrics, 'last')
+    dates = sorted(set(d for r in results for d in r[0]))
+    index = dict((d, i) for i, d in enumerate(dates))
+    columns = [(m, [None] * len(dates)) for m in metrics]
+    for repo_dates, repo_columns in results:
+        positions = [index[d] for d in repo_dates]
+        for (m, total), (unused, values), func in zip(columns, repo_columns, funcs):
+            if func == 'last':
+                # Carry over the value until the next date of the repository.
+                ends = positions[1:] + [len(dates)]
+                items = zip(positions, ends, values)
+            else:
+                items = ((p, p + 1, v) for p, v in zip(positions, values))
+            for lo, hi, value in items:
+                if value is None:
+                    continue
+                for i in range(lo, hi):
+                    total[i] = value if total[i] is None else total[i] + value
+    return dates, columns
+
+
+class SessionStatsCache(object):
+    """
+    Keep the session statistics of repositories in memory.
+    """
+
+    def __init__(self, max_age=5):
+        self._lock = threading.RLock()
+        self._cache = {}
+        # Number of seconds the statistics are used without checking the disk.
+        self.max_age = max_age
+
+    def get(self, repo, threads=4):
+        """
+        Return the `SessionStats` of the given `RdiffRepo`. The statistics are
+        updated when the repository is modified.
+        """
+        key = repo.data_path
+        with self._lock:
+            stats = self._cache.get(key)
+        if stats is not None and time.time() - stats.checked <= self.max_age:
+            return stats
+        try:
+            mtime = os.stat(repo.data_path).st_mtime
+        except OSError:
+            mtime = None
+        if stats is not None and mtime is not None and stats.mtime == mtime:
+            stats.checked = time.time()
+            return stats
+        stats = (stats or SessionStats()).update(repo, mtime, threads)
+        with self._lock:
+            self._cache[key] = stats
+        return stats
+
+    def get_many(self, locations, threads=8):
+        """
+        Return the `SessionStats` of many repositories. `locations` is a list
+        of `(user_root, repo_path)`. Repositories are loaded in parallel. None
+        is returned for invalid repositories.
+        """
+        def load(location):
+            try:
+                return self.get(librdiff.RdiffRepo(*location), threads=1)
+            except librdiff.FileError:
+                _logger.warning("invalid repository %r", location[1])
+            except Exception:
+                _logger.exception("fail to read session statistics of %r", location[1])
+            return None
+
+        if not locations:
+            return []
+        pool = ThreadPool(max(1, min(threads, len(locations))))
+        try:
+            return pool.map(load, locations)
+        finally:
+            pool.close()
+            pool.join()
@@ -22,6 +22,7 @@ Created on Jan 1, 2016
 """
 from __future__ import unicode_literals
 
+import json
 import logging
 import unittest
 
@@ -40,8 +41,8 @@ class SettingsTest(WebCase):
     def setup_server(cls):
         WebCase.setup_server(enabled_plugins=['SQLite', 'Graphs'])
 
-    def _stats(self, repo):
-        return self.getPage("/graphs/data/" + repo + "/")
+    def _stats(self, repo, query=""):
+        return self.getPage("/graphs/data/" + repo + "/" + query)
 
     def test_stats(self):
         self._stats(self.REPO)
@@ -72,6 +73,90 @@ class SettingsTest(WebCase):
 1454448640,1454448640.0,1454448640.93,0.93,25,3667068,22,3667068,6,14869,3,14869,2,0,0,11,2915,2915,0
 """
         self.assertEquals(expected, self.body)
+        # Served from cache.
+        self._stats(self.REPO)
+        self.assertEquals(expected, self.body)
+
+    def test_stats_with_range(self):
+        self._stats(self.REPO, "?start=1415221495&end=1453304541")
+        self.assertStatus('200 OK')
+        dates = [line.split(b',')[0] for line in self.body.splitlines()[1:]]
+        self.assertEqual([b'1415221495', b'1415221507', b'1453304541'], dates)
+
+    def test_stats_with_max_points(self):
+        self._stats(self.REPO, "?max_points=5")
+        self.assertStatus('200 OK')
+        dates = [line.split(b',')[0] for line in self.body.splitlines()[1:]]
+        self.assertEqual(5, len(dates))
+        self.assertEqual(b'1454448640', dates[-1])
+
+    def test_stats_with_bucket(self):
+        self._stats(self.REPO, "?bucket=month&metrics=sourcefilesize,newfiles:sum&format=json")
+        self.assertStatus('200 OK')
+        self.assertHeader('Content-Type', 'application/json')
+        data = json.loads(self.body.decode('utf-8'))
+        self.assertEqual([1414800000, 1451606400, 1454284800], data['date'])
+        self.assertEqual([3667010, 3667068, 3667068], data['sourcefilesize'])
+        self.assertEqual([26, 6, 6], data['newfiles'])
+
+    def test_stats_with_invalid_bucket(self):
+        self._stats(self.REPO, "?bucket=invalid")
+        self.assertStatus(400)
+        self._stats(self.REPO, "?metrics=invalid")
+        self.assertStatus(400)
+        self._stats(self.REPO, "?format=invalid")
+        self.assertStatus(400)
+        self._stats(self.REPO, "?metrics=sourcefilesize:min,sourcefilesize:max")
+        self.assertStatus(400)
+
+    def test_overview(self):
+        self.getPage("/graphs/overview/")
+        self.assertStatus('200 OK')
+        self.assertInBody("My repositories")
+        self.assertInBody("2016-02-01")
+        self.assertInBody("Show all users")
+
+    def test_overview_all_users(self):
+        self.getPage("/graphs/overview/?bucket=week&all_users=T")
+        self.assertStatus('200 OK')
+        self.assertInBody("All repositories")
+
+    def test_overview_all_users_false(self):
+        for value in ['0', 'false', 'off']:
+            self.getPage("/graphs/overview/?all_users=" + value)
+            self.assertStatus('200 OK')
+            self.assertInBody("My repositories")
+
+    def test_overview_json(self):
+        self.getPage("/graphs/overview/?format=json")
+        self.assertStatus('200 OK')
+        data = json.loads(self.body.decode('utf-8'))
+        self.assertEqual([1414800000, 1451606400, 1454284800], data['date'])
+        self.assertEqual([3667010, 3667068, 3667068], data['sourcefilesize'])
+        self.assertEqual([0, 0, 0], data['errors'])
+
+    def test_overview_invalid(self):
+        self.getPage("/graphs/overview/?bucket=invalid")
+        self.assertStatus(400)
+
+    def test_stats_with_invalid_range(self):
+        self._stats(self.REPO, "?start=invalid")
+        self.assertStatus(400)
+
+    def test_graphs(self):
+        """Check if graphs only download the data they show."""
+        for graph, query in [('activities', 'bucket=hour&metrics=newfiles:sum'),
+                             ('errors', 'bucket=hour&metrics=errors:sum'),
+                             ('files', 'max_points=1000&metrics=sourcefiles'),
+                             ('sizes', 'max_points=1000&metrics=mirrorfilesize'),
+                             ('times', 'max_points=1000&metrics=elapsedtime')]:
+            self.getPage("/graphs/%s/%s/" % (graph, self.REPO))
+            self.assertStatus('200 OK')
+            self.assertInBody('/graphs/data/%s/?%s' % (self.REPO, query))
+        # Hourly sums match the sessions.
+        self._stats(self.REPO, "?bucket=hour&metrics=newfiles:sum&format=json")
+        data = json.loads(self.body.decode('utf-8'))
+        self.assertEqual(38, sum(data['newfiles']))
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module to test the columnar cache of session statistics.
+"""
+
+from __future__ import unicode_literals
+
+from builtins import object
+from collections import OrderedDict
+import json
+from mock import patch
+import unittest
+
+from rdiffweb.plugins.graphs.stats import SessionStats, SessionStatsCache, STATS_FIELDS, \
+    combine
+from rdiffweb.librdiff import SessionStatistics
+from rdiffweb.rdw_helpers import rdwTime
+
+
+class MockSession(object):
+
+    def __init__(self, date, reads):
+        self.date = rdwTime(date)
+        self.name = b'session_statistics.data'
+        self._reads = reads
+
+    @property
+    def stats(self):
+        self._reads.append(self.date)
+        value = self.date.getSeconds() % 100
+        return SessionStatistics(*[value] * len(STATS_FIELDS))
+
+
+class MockRepo(object):
+
+    def __init__(self, dates):
+        self.reads = []
+        self.session_statistics = OrderedDict(
+            (rdwTime(d), MockSession(d, self.reads)) for d in dates)
+
+
+class SessionStatsTest(unittest.TestCase):
+
+    def test_update(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 3002]))
+        self.assertEqual([1000, 2001, 3002], stats.dates)
+        self.assertEqual([0, 1, 2], stats.columns['sourcefiles'])
+
+    def test_update_incremental(self):
+        stats = SessionStats().update(MockRepo([1000, 2001]))
+        repo = MockRepo([1000, 2001, 3002])
+        stats = stats.update(repo)
+        self.assertEqual([1000, 2001, 3002], stats.dates)
+        self.assertEqual([0, 1, 2], stats.columns['errors'])
+        # Only the new session get read.
+        self.assertEqual([rdwTime(3002)], repo.reads)
+
+    def test_update_with_deleted_sessions(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 3002]))
+        repo = MockRepo([2001, 3002, 4003])
+        stats = stats.update(repo)
+        self.assertEqual([2001, 3002, 4003], stats.dates)
+        self.assertEqual([1, 2, 3], stats.columns['errors'])
+        self.assertEqual([rdwTime(4003)], repo.reads)
+
+    def test_update_with_modified_sessions(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 3002]))
+        repo = MockRepo([1000, 2500, 3002])
+        stats = stats.update(repo)
+        self.assertEqual([1000, 2500, 3002], stats.dates)
+        self.assertEqual(3, len(repo.reads))
+
+    def test_to_csv(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 3002]))
+        lines = stats.to_csv().splitlines()
+        self.assertEqual(','.join(['date'] + STATS_FIELDS), lines[0])
+        self.assertEqual(','.join(['2001'] + ['1'] * len(STATS_FIELDS)), lines[2])
+        self.assertEqual(4, len(lines))
+
+    def test_to_csv_with_range(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 3002]))
+        lines = stats.to_csv(start=1001, end=3002).splitlines()
+        self.assertEqual(['2001', '3002'], [l.split(',')[0] for l in lines[1:]])
+
+    def test_to_csv_with_max_points(self):
+        stats = SessionStats().update(MockRepo(range(1000, 2000)))
+        lines = stats.to_csv(max_points=10).splitlines()
+        dates = [int(l.split(',')[0]) for l in lines[1:]]
+        self.assertEqual(10, len(dates))
+        self.assertEqual(1999, dates[-1])
+        self.assertEqual(sorted(dates), dates)
+
+    def test_query_with_metrics(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 3002]))
+        dates, columns = stats.query(metrics=['errors', 'sourcefiles'])
+        self.assertEqual([1000, 2001, 3002], dates)
+        self.assertEqual([('errors', [0, 1, 2]), ('sourcefiles', [0, 1, 2])], columns)
+
+    def test_query_with_bucket(self):
+        # Two sessions on 2014-11-01, one on 2014-11-02.
+        stats = SessionStats().update(MockRepo([1414800010, 1414850020, 1414900030]))
+        dates, columns = stats.query(
+            bucket='day', metrics=['errors', 'errors:sum', 'errors:min', 'errors:max', 'errors:avg'])
+        self.assertEqual([1414800000, 1414886400], dates)
+        self.assertEqual([20, 30], columns[0][1])
+        self.assertEqual([30, 30], columns[1][1])
+        self.assertEqual([10, 30], columns[2][1])
+        self.assertEqual([20, 30], columns[3][1])
+        self.assertEqual([15.0, 30.0], columns[4][1])
+
+    def test_query_with_bucket_week_month(self):
+        # Thursday 2014-10-30, Monday 2014-11-03, Saturday 2014-11-15.
+        stats = SessionStats().update(MockRepo([1414627200, 1414972800, 1416009600]))
+        dates = stats.query(bucket='week')[0]
+        self.assertEqual([1414368000, 1414972800, 1415577600], dates)
+        dates = stats.query(bucket='month')[0]
+        self.assertEqual([1412121600, 1414800000], dates)
+
+    def test_query_invalid(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 3002]))
+        self.assertRaises(ValueError, stats.query, bucket='year')
+        self.assertRaises(ValueError, stats.query, metrics=['invalid'])
+        self.assertRaises(ValueError, stats.query, metrics=['errors:invalid'])
+        # Exported columns are identified by metric.
+        self.assertRaises(ValueError, stats.to_json, metrics=['errors:min', 'errors:max'])
+        self.assertRaises(ValueError, stats.to_csv, metrics=['errors:min', 'errors:max'])
+        self.assertRaises(ValueError, stats.query, agg='invalid')
+
+    def test_to_json(self):
+        stats = SessionStats().update(MockRepo([1000, 2001, 4002]))
+        data = json.loads(stats.to_json(metrics=['errors:sum'], bucket='hour'))
+        self.assertEqual({'date': [0, 3600], 'errors': [1, 2]}, data)
+
+
+class CombineTest(unittest.TestCase):
+
+    def test_combine(self):
+        stats1 = SessionStats().update(MockRepo([1000, 4001, 11002]))
+        stats2 = SessionStats().update(MockRepo([4010, 7220]))
+        metrics = ['sourcefiles:last', 'errors:sum']
+        results = [s.query(bucket='hour', metrics=metrics) for s in [stats1, stats2]]
+        dates, columns = combine(results, metrics)
+        self.assertEqual([0, 3600, 7200, 10800], dates)
+        # Last value of each repository is carried over.
+        self.assertEqual(('sourcefiles', [0, 1 + 10, 1 + 20, 2 + 20]), columns[0])
+        self.assertEqual(('errors', [0, 1 + 10, 20, 2]), columns[1])
+
+    def test_combine_empty(self):
+        self.assertEqual(([], [('errors', [])]), combine([], ['errors:sum']))
+
+    def test_combine_many(self):
+        """Check overview of 1000 repositories."""
+        all_stats = [
+            SessionStats().update(MockRepo(range(1400000000 + i, 1400000000 + i + 86400 * 365, 3 * 86400)))
+            for i in range(1000)]
+        metrics = ['sourcefilesize:last', 'incrementfilesize:sum', 'changedfiles:sum', 'errors:sum']
+        results = [s.query(bucket='month', metrics=metrics) for s in all_stats]
+        dates, columns = combine(results, metrics)
+        self.assertEqual(13, len(dates))
+        self.assertEqual(1398902400, dates[0])
+        # Every sessions of repository `i` have the value `i % 100`.
+        total = sum(i % 100 for i in range(1000))
+        self.assertEqual(('sourcefilesize', [total] * 13), columns[0])
+        self.assertEqual(122 * total, sum(columns[3][1]))
+        # Queries are cached.
+        with patch.object(SessionStats, '_query') as _query:
+            again = [s.query(bucket='month', metrics=metrics) for s in all_stats]
+        self.assertFalse(_query.called)
+        self.assertIs(results[0], again[0])
+
+class SessionStatsCacheTest(unittest.TestCase):
+
+    def test_get_many_invalid(self):
+        self.assertEqual([None], SessionStatsCache().get_many([('/invalid', 'repo')]))
+        self.assertEqual([], SessionStatsCache().get_many([]))
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
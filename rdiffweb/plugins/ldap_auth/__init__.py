@@ -30,26 +30,99 @@ to the LDAP plugin.
 from __future__ import unicode_literals
 
 from builtins import bytes
+from builtins import object
 from builtins import str
+import cherrypy
+from collections import OrderedDict
 import ldap
+from ldap.controls import SimplePagedResultsControl
 import logging
+import threading
 import time
 
 from rdiffweb.core import RdiffError
 from rdiffweb.i18n import ugettext as _
 from rdiffweb.rdw_config import Option, BoolOption, IntOption
-from rdiffweb.rdw_plugin import IPasswordStore
+from rdiffweb.rdw_plugin import IPasswordStore, ITemplateFilterPlugin
+from rdiffweb.rdw_pool import ConnectionPool
 
 
 logger = logging.getLogger(__name__)
 
 
-class LdapPasswordStore(IPasswordStore):
+class SearchCache(object):
+    """
+    Keep the search results of recently used usernames. Users not found are
+    kept for `negative_ttl` seconds, others for `ttl` seconds. The least
+    recently used entries are removed when the cache contains more than
+    `size` entries.
+    """
+
+    def __init__(self, size=10000, ttl=300, negative_ttl=60):
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, username):
+        """
+        Return the search result of the given user or None if not cached.
+        """
+        with self._lock:
+            entry = self._entries.pop(username, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return None
+            # Move the entry to the end.
+            self._entries[username] = entry
+            self.hits += 1
+            return entry[1]
+
+    def set(self, username, result):
+        ttl = self.ttl if result else self.negative_ttl
+        if not self.size or ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(username, None)
+            self._entries[username] = (time.time() + ttl, result)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username=None):
+        """
+        Remove the given user from the cache or every users if None.
+        """
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
+
+    def stats(self):
+        """
+        Return the number of entries, hits, misses and the hit rate.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': float(self.hits) / total if total else 0.0,
+            }
+
+
+class LdapPasswordStore(IPasswordStore, ITemplateFilterPlugin):
 
     """Wrapper for LDAP authentication.
 
     This implementation assume the LDAP is using the system encoding."""
 
+    templates = ['admin.html']
+
     uri = Option("LdapUri", doc="Get Ldap URI")
     base_dn = Option("LdapBaseDn", "", doc="Get Base DN")
     scope = Option("LdapScope", "subtree")
@@ -64,26 +137,80 @@ class LdapPasswordStore(IPasswordStore):
     encoding = Option("LdapEncoding", "utf-8", doc="Get default LdapEncoding")
     allow_password_change = BoolOption("LdapAllowPasswordChange", "false", doc="Check if password change are allowed.")
     check_shadow_expire = BoolOption("LdapCheckShadowExpire", "false", doc="Enable verification of Shadow Expire.")
+    pool_size = IntOption("LdapPoolSize", "5", doc="Maximum number of connections kept open.")
+    pool_max_idle = IntOption("LdapPoolMaxIdle", "300", doc="Number of seconds an idle connection is reused.")
+    email_attribute = Option("LdapEmailAttribute", "mail")
+    home_attribute = Option("LdapHomeDirectoryAttribute", "homeDirectory")
+    group_attribute = Option("LdapGroupAttribute", "memberOf")
+    cache_size = IntOption("LdapCacheSize", "10000", doc="Maximum number of users kept in cache.")
+    cache_ttl = IntOption("LdapCacheTTL", "300", doc="Number of seconds a user is kept in cache.")
+    cache_negative_ttl = IntOption("LdapCacheNegativeTTL", "60", doc="Number of seconds an unknown user is kept in cache.")
 
     def activate(self):
         """Called by the plugin manager to setup the plugin."""
         super(IPasswordStore, self).activate()
+        self._setup()
+        cherrypy.engine.subscribe('stop', self.close)
+        self.app.cfg.subscribe(self.config_changed)
+
+    def _setup(self):
+        # Connections bound with the service account, reused to search
+        # the directory.
+        self._pool = ConnectionPool(
+            self._connect,
+            size=self.pool_size,
+            timeout=self.network_timeout,
+            errors=(ldap.SERVER_DOWN, ldap.CONNECT_ERROR, ldap.TIMEOUT),
+            close=lambda l: l.unbind_s(),
+            max_idle=self.pool_max_idle)
+        # Recent search results.
+        self._cache = SearchCache(
+            size=self.cache_size,
+            ttl=self.cache_ttl,
+            negative_ttl=self.cache_negative_ttl)
+
+    def config_changed(self, changed):
+        """
+        Called when the configuration is reloaded. Replace the connection
+        pool and the cache if LDAP settings were modified.
+        """
+        if not any(key.startswith('ldap') for key in changed):
+            return
+        logger.info("LDAP configuration modified, closing connections")
+        pool = self._pool
+        self._setup()
+        # Connections still in use are closed when garbage collected.
+        pool.close()
+
+    def deactivate(self):
+        """Called by the plugin manager to close the connections."""
+        cherrypy.engine.unsubscribe('stop', self.close)
+        self.app.cfg.unsubscribe(self.config_changed)
+        self.close()
+        super(IPasswordStore, self).deactivate()
+
+    def close(self):
+        """Close every idle connections to the LDAP server."""
+        self._pool.close()
 
     def are_valid_credentials(self, username, password):
         """Check if the given credential as valid according to LDAP."""
         assert isinstance(username, str)
         assert isinstance(password, str)
 
-        def check_crendential(l, r):
+        def check_crendential(r):
             # Check results
             if len(r) != 1:
                 logger.debug("user [%s] not found in LDAP", username)
                 return None
 
-            # Bind using the user credentials. Throws an exception in case of
-            # error.
-            l.simple_bind_s(r[0][0], password)
-            l.unbind_s()
+            # Bind using the user credentials on a new connection. Throws an
+            # exception in case of error.
+            l = self._connect(bind=False)
+            try:
+                l.simple_bind_s(r[0][0], password)
+            finally:
+                l.unbind_s()
             logger.info("user [%s] found in LDAP", username)
 
             # Verify the shadow expire
@@ -134,25 +261,17 @@ class LdapPasswordStore(IPasswordStore):
             value = value.decode(encoding=self.encoding)
         return value
 
-    def _execute(self, username, function):
-        assert isinstance(username, str)
-
-        """Reusable method to run LDAP operation."""
-
+    def _connect(self, bind=True):
+        """
+        Open a new connection to the LDAP server. If `bind` is True, bind
+        using the service account.
+        """
         assert self.uri, "LdapUri must be define in configuration"
-        assert self.base_dn, "LdapBaseDn must be define in configuration"
-        if self.scope == "base":
-            scope = ldap.SCOPE_BASE
-        elif self.scope == "onelevel":
-            scope = ldap.SCOPE_ONELEVEL
-        else:
-            scope = ldap.SCOPE_SUBTREE
 
         # try STARTLS if configured
         if self.tls:
             ldap.set_option(ldap.OPT_X_TLS_REQUIRE_CERT, ldap.OPT_X_TLS_NEVER)
 
-        # Check LDAP credential only.
         l = ldap.initialize(self.uri)
 
         # Set v2 or v3
@@ -161,23 +280,64 @@ class LdapPasswordStore(IPasswordStore):
         else:
             l.protocol_version = ldap.VERSION3
 
-        try:
+        if bind:
             # Bind to the LDAP server
             logger.debug("binding to ldap server {}".format(self.uri))
-            l.simple_bind_s(self.bind_dn, self.bind_password)
+            try:
+                l.simple_bind_s(self.bind_dn, self.bind_password)
+            except:
+                l.unbind_s()
+                raise
+        return l
+
+    def _scope(self):
+        if self.scope == "base":
+            return ldap.SCOPE_BASE
+        elif self.scope == "onelevel":
+            return ldap.SCOPE_ONELEVEL
+        return ldap.SCOPE_SUBTREE
+
+    def _search(self, username):
+        """
+        Search the user. Results are cached.
+        """
+        r = self._cache.get(username)
+        if r is None:
+            r = self._search_ldap(username)
+            self._cache.set(username, r)
+        return r
+
+    def _search_ldap(self, username):
+        """
+        Search the user using a connection from the pool. When the connection
+        was lost, try again once with a new connection.
+        """
+        assert self.base_dn, "LdapBaseDn must be define in configuration"
+        scope = self._scope()
+        search_filter = "(&{}({}={}))".format(
+            self.filter, self.attribute, username)
+        logger.debug("search ldap server: {}/{}?{}?{}?{}".format(
+            self.uri, self.base_dn, self.attribute, scope,
+            search_filter))
+        try:
+            with self._pool.connection() as l:
+                return l.search_s(self.base_dn, scope, search_filter)
+        except (ldap.SERVER_DOWN, ldap.CONNECT_ERROR):
+            logger.info("ldap connection lost, reconnecting")
+            with self._pool.connection() as l:
+                return l.search_s(self.base_dn, scope, search_filter)
+
+    def _execute(self, username, function):
+        """Reusable method to run LDAP operation."""
+        assert isinstance(username, str)
 
+        try:
             # Search the LDAP server
-            search_filter = "(&{}({}={}))".format(
-                self.filter, self.attribute, username)
-            logger.debug("search ldap server: {}/{}?{}?{}?{}".format(
-                self.uri, self.base_dn, self.attribute, scope,
-                search_filter))
-            r = l.search_s(self.base_dn, scope, search_filter)
+            r = self._search(username)
 
             # Execute operation
-            return function(l, r)
+            return function(r)
         except ldap.LDAPError as e:
-            l.unbind_s()
             # Handle the LDAP exception and build a nice user message.
             logger.warning('ldap error', exc_info=1)
             msg = _("An LDAP error occurred: %s")
@@ -192,7 +352,7 @@ class LdapPasswordStore(IPasswordStore):
     def has_password(self, username):
         """Check if the user exists in LDAP"""
 
-        def check_user_exists(l, r):  # @UnusedVariable
+        def check_user_exists(r):
             # Check the results
             if len(r) != 1:
                 logger.debug("user [%s] not found", username)
@@ -207,24 +367,85 @@ class LdapPasswordStore(IPasswordStore):
     def get_email(self, username):
         """Get user mail."""
         logger.debug("get email for user [%s]", username)
-        value = self.get_user_attr(username, 'mail')
-        if value:
-            return value[0]
-        return None
+        info = self.get_user_info(username)
+        return info and info['email']
 
     def get_home_dir(self, username):
         """Get user home directory."""
-        logger.debug("get email for user [%s]", username)
-        value = self.get_user_attr(username, 'homeDirectory')
-        if isinstance(value, list):
-            value = value[0]
-        return value
+        logger.debug("get home directory for user [%s]", username)
+        info = self.get_user_info(username)
+        return info and info['user_root']
+
+    def get_user_info(self, username):
+        """
+        Return the attributes of the user from a single search: `username`,
+        `email`, `user_root`, `shadow_expire` and `groups`. Return None if the
+        user is not found.
+        """
+        assert isinstance(username, str)
+
+        def fetch_user_info(r):
+            if len(r) != 1:
+                logger.warning("user [%s] not found", username)
+                return None
+            return self._user_info(r[0])
+
+        # Execute the LDAP operation
+        try:
+            return self._execute(username, fetch_user_info)
+        except:
+            logger.exception("can't get user [%s] attributes", username)
+            return None
+
+    def _user_info(self, entry):
+        """Build the user attributes from a search result entry."""
+        attrs = entry[1]
+
+        def first(name):
+            values = attrs.get(name)
+            return self._decode(values[0]) if values else None
+
+        shadow_expire = first('shadowExpire')
+        return {
+            'username': first(self.attribute),
+            'email': first(self.email_attribute),
+            'user_root': first(self.home_attribute),
+            'shadow_expire': int(shadow_expire) if shadow_expire else None,
+            'groups': [self._decode(g) for g in attrs.get(self.group_attribute, [])],
+        }
+
+    def search_users(self, page_size=500):
+        """
+        Return an iterator on the attributes of every users of the directory.
+        See `get_user_info()`. Results are requested by pages of `page_size`
+        entries using a dedicated connection.
+        """
+        assert self.base_dn, "LdapBaseDn must be define in configuration"
+        search_filter = "(&{}({}=*))".format(self.filter, self.attribute)
+        ctrl = SimplePagedResultsControl(True, size=page_size, cookie='')
+        l = self._connect()
+        try:
+            while True:
+                msgid = l.search_ext(
+                    self.base_dn, self._scope(), search_filter, serverctrls=[ctrl])
+                unused, rdata, unused, serverctrls = l.result3(msgid)
+                for entry in rdata:
+                    # Skip search references.
+                    if entry[0]:
+                        yield self._user_info(entry)
+                cookies = [c.cookie for c in serverctrls
+                           if c.controlType == SimplePagedResultsControl.controlType]
+                if not cookies or not cookies[0]:
+                    break
+                ctrl.cookie = cookies[0]
+        finally:
+            l.unbind_s()
 
     def get_user_attr(self, username, attr):
         """Get user attributes."""
         assert isinstance(username, str)
 
-        def fetch_user_email(l, r):  # @UnusedVariable
+        def fetch_user_email(r):
             if len(r) != 1:
                 logger.warning("user [%s] not found", username)
                 return ""
@@ -259,15 +480,19 @@ class LdapPasswordStore(IPasswordStore):
 
     def _set_password_in_ldap(self, username, old_password, password):
 
-        def change_passwd(l, r):
+        def change_passwd(r):
             if len(r) != 1:
                 raise RdiffError(_("User %s not found." % (username,)))
-            # Bind using the user credentials. Throws an exception in case of
-            # error.
-            if old_password is not None:
-                l.simple_bind_s(r[0][0], old_password)
-            l.passwd_s(r[0][0], old_password, password)
-            l.unbind_s()
+            # Bind using the user credentials, or the service account, on a
+            # new connection. Throws an exception in case of error.
+            l = self._connect(bind=old_password is None)
+            try:
+                if old_password is not None:
+                    l.simple_bind_s(r[0][0], old_password)
+                l.passwd_s(r[0][0], old_password, password)
+            finally:
+                l.unbind_s()
+            self._cache.invalidate(username)
             logger.info("password for user [%s] is updated in LDAP", username)
             # User updated, return False
             return False
@@ -276,6 +501,15 @@ class LdapPasswordStore(IPasswordStore):
         logger.debug("updating password for [%s] in LDAP", username)
         return self._execute(username, change_passwd)
 
+    def filter_data(self, template_name, data):
+        """
+        Show the statistics of the cache to administrators.
+        """
+        if template_name == 'admin.html' and 'templates_content' in data:
+            data['ldap_cache'] = self._cache.stats()
+            template = self.app.templates.get_template("admin_ldap_cache.html")
+            data["templates_content"].append(template)
+
     def supports(self, operation):
         if operation == 'set_password':
             return self.allow_password_change
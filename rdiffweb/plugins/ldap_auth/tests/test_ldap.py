@@ -24,11 +24,14 @@ Created on Oct 17, 2015
 from __future__ import unicode_literals
 
 from builtins import str
+import ldap
 import logging
 from mockldap import MockLdap
+import time
 import unittest
 
 from rdiffweb.core import RdiffError
+from rdiffweb.plugins.ldap_auth import SearchCache
 from rdiffweb.test import AppTestCase
 
 
@@ -124,12 +127,92 @@ class UserManagerLdapTest(AppTestCase):
         self.assertEquals({u'uid': ['bob'], u'cn': ['bob']},
                           self.ldapstore.get_user_attr('bob', ['uid', 'cn']))
 
+    def test_get_user_info(self):
+        ldapobj = self.mockldap[self.ldapstore.uri]
+        self.assertEqual({'username': 'bob', 'email': None, 'user_root': None,
+                          'shadow_expire': None, 'groups': []},
+                         self.ldapstore.get_user_info('bob'))
+        self.assertIsNone(self.ldapstore.get_email('bob'))
+        self.assertIsNone(self.ldapstore.get_home_dir('bob'))
+        # Attributes are read from a single search.
+        self.assertEqual(1, ldapobj.methods_called().count('search_s'))
+        self.assertIsNone(self.ldapstore.get_user_info('invalid'))
+
     def test_has_password(self):
         self.assertTrue(self.ldapstore.has_password('bob'))
 
     def test_has_password_with_invalid_user(self):
         self.assertFalse(self.ldapstore.has_password('invalid'))
 
+    def test_connection_reused(self):
+        """Check if many searches reuse the connection of the pool."""
+        ldapobj = self.mockldap[self.ldapstore.uri]
+        for i in range(200):
+            self.assertFalse(self.ldapstore.has_password('user%s' % i))
+        # Service bind executed once.
+        self.assertEqual(1, ldapobj.methods_called().count('simple_bind_s'))
+        self.assertEqual(200, ldapobj.methods_called().count('search_s'))
+        self.assertEqual(0, self.ldapstore._pool.checkedout)
+
+    def test_connection_reused_after_login(self):
+        ldapobj = self.mockldap[self.ldapstore.uri]
+        self.assertTrue(self.ldapstore.has_password('bob'))
+        self.assertEqual('mike', self.ldapstore.are_valid_credentials('mike', 'password'))
+        self.assertTrue(self.ldapstore.has_password('annik'))
+        # User bind executed on a separate connection.
+        self.assertEqual(['simple_bind_s', 'search_s', 'search_s', 'simple_bind_s', 'unbind_s', 'search_s'],
+                         ldapobj.methods_called())
+
+    def test_reconnect(self):
+        ldapobj = self.mockldap[self.ldapstore.uri]
+        self.assertTrue(self.ldapstore.has_password('bob'))
+        # Connection lost.
+        ldapobj.search_s.seed('dc=nodomain', ldap.SCOPE_SUBTREE, '(&(objectClass=*)(uid=mike))')(ldap.SERVER_DOWN())
+        with self.assertRaises(RdiffError):
+            self.ldapstore.has_password('mike')
+        # Broken connections are closed.
+        self.assertEqual(0, self.ldapstore._pool.checkedout)
+        self.assertEqual(2, ldapobj.methods_called().count('unbind_s'))
+
+    def test_cache(self):
+        ldapobj = self.mockldap[self.ldapstore.uri]
+        self.assertTrue(self.ldapstore.has_password('bob'))
+        self.assertEqual('bob', self.ldapstore.are_valid_credentials('bob', 'password'))
+        self.assertEqual(['bob'], self.ldapstore.get_user_attr('bob', 'cn'))
+        self.assertEqual(1, ldapobj.methods_called().count('search_s'))
+        # Unknown users are cached too.
+        self.assertFalse(self.ldapstore.has_password('invalid'))
+        self.assertFalse(self.ldapstore.has_password('invalid'))
+        self.assertEqual(2, ldapobj.methods_called().count('search_s'))
+        self.assertEqual({'size': 2, 'hits': 3, 'misses': 2, 'hit_rate': 0.6}, self.ldapstore._cache.stats())
+
+    def test_cache_invalidated_on_password_change(self):
+        self.assertTrue(self.ldapstore.has_password('annik'))
+        self.assertEqual(1, self.ldapstore._cache.stats()['size'])
+        self.ldapstore.set_password('annik', 'new_password')
+        self.assertEqual(0, self.ldapstore._cache.stats()['size'])
+
+    def test_filter_data(self):
+        self.ldapstore.has_password('bob')
+        data = {'templates_content': []}
+        self.ldapstore.filter_data('admin.html', data)
+        self.assertEqual(1, data['ldap_cache']['size'])
+        self.assertEqual(1, len(data['templates_content']))
+
+    def test_config_changed(self):
+        self.assertTrue(self.ldapstore.has_password('annik'))
+        pool = self.ldapstore._pool
+        # Pool and cache kept when other settings are modified.
+        self.app.cfg.set_config('LdapCacheSize', '5')
+        self.ldapstore.config_changed(set(['headername']))
+        self.assertIs(pool, self.ldapstore._pool)
+        self.assertEqual(1, self.ldapstore._cache.stats()['size'])
+        # Replaced when LDAP settings are modified.
+        self.ldapstore.config_changed(set(['ldapcachesize']))
+        self.assertIsNot(pool, self.ldapstore._pool)
+        self.assertEqual(0, self.ldapstore._cache.stats()['size'])
+        self.assertEqual(5, self.ldapstore._cache.size)
+
     def test_set_password_not_found(self):
         with self.assertRaises(RdiffError):
             self.assertTrue(self.ldapstore.set_password('joe', 'password'))
@@ -150,6 +233,39 @@ class UserManagerLdapTest(AppTestCase):
             self.assertFalse(self.ldapstore.set_password('bar', 'new_password'))
 
 
+class SearchCacheTest(unittest.TestCase):
+
+    def test_get(self):
+        cache = SearchCache()
+        self.assertIsNone(cache.get('bob'))
+        cache.set('bob', [('uid=bob', {})])
+        cache.set('invalid', [])
+        self.assertEqual([('uid=bob', {})], cache.get('bob'))
+        self.assertEqual([], cache.get('invalid'))
+        cache.invalidate('bob')
+        self.assertIsNone(cache.get('bob'))
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+    def test_expired(self):
+        cache = SearchCache(ttl=300, negative_ttl=0)
+        # Negative caching disabled.
+        cache.set('invalid', [])
+        self.assertIsNone(cache.get('invalid'))
+        cache.set('bob', [('uid=bob', {})])
+        cache._entries['bob'] = (time.time() - 1, [])
+        self.assertIsNone(cache.get('bob'))
+
+    def test_size(self):
+        cache = SearchCache(size=2)
+        cache.set('bob', [])
+        cache.set('mike', [])
+        cache.get('bob')
+        cache.set('annik', [])
+        self.assertEqual(2, cache.stats()['size'])
+        self.assertIsNone(cache.get('mike'))
+
+
 class UserManagerLdapNoPasswordChangeTest(AppTestCase):
 
     basedn = ('dc=nodomain', {
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+When enabled with the LDAP plugin, this plugin periodically reads every users
+of the LDAP directory and copies their email and home directory into the
+database. Logins and pages read those attributes from the database without
+waiting on the directory.
+
+Users missing from the database are created when `AddMissingUser` is
+enabled. The home directory is only used for users without a root
+directory, so values defined by administrators are kept.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+
+from rdiffweb.rdw_plugin import IDeamonPlugin
+
+
+_logger = logging.getLogger(__name__)
+
+
+class LdapSyncPlugin(IDeamonPlugin):
+    """
+    Plugin to copy LDAP users attributes in database.
+    """
+
+    @property
+    def deamon_frequency(self):
+        """
+        Return the frequency of synchronization. Default to 60min.
+        """
+        value = self.app.cfg.get_config_int("LdapSyncFrequency", "60")
+        if value <= 0:
+            value = 60
+        return value * 60
+
+    def deamon_run(self):
+        """
+        Synchronize the users.
+        """
+        try:
+            self.sync()
+        except:
+            _logger.exception("fail to synchronize ldap users")
+
+    def _get_store(self):
+        return self.app.plugins.get_plugin_by_name('LdapPasswordStore')
+
+    def sync(self):
+        """
+        Copy the attributes of every LDAP users into the database. Return the
+        number of users updated.
+        """
+        store = self._get_store()
+        if not store:
+            _logger.warning("ldap plugin is not enabled")
+            return 0
+        page_size = self.app.cfg.get_config_int("LdapSyncPageSize", "500")
+        add_missing = self.app.cfg.get_config_bool("AddMissingUser", "false")
+        userdb = self.app.userdb
+
+        # Read every users of the database at once.
+        users = dict((user.username, user) for user in userdb.list())
+        count = 0
+        for info in store.search_users(page_size):
+            username = info['username']
+            if not username:
+                continue
+            user = users.get(username)
+            if user is None:
+                if not add_missing:
+                    continue
+                _logger.info("adding ldap user [%s] to database", username)
+                user = userdb.add_user(username)
+            attrs = {}
+            if info['email'] and info['email'] != user.email:
+                attrs['email'] = info['email']
+            if info['user_root'] and not user.user_root:
+                attrs['user_root'] = info['user_root']
+            if attrs:
+                user.set_attrs(notify=False, **attrs)
+                count += 1
+        _logger.info("%s ldap users updated in database", count)
+        return count
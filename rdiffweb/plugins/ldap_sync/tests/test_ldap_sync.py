@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module used to test the LDAP synchronization plugin.
+"""
+
+from __future__ import unicode_literals
+
+from builtins import object
+import unittest
+
+from rdiffweb.test import AppTestCase
+
+
+def _info(username, email=None, user_root=None):
+    return {'username': username, 'email': email, 'user_root': user_root,
+            'shadow_expire': None, 'groups': []}
+
+
+class MockStore(object):
+
+    def __init__(self, users):
+        self.users = users
+        self.page_size = None
+
+    def search_users(self, page_size=500):
+        self.page_size = page_size
+        return iter(self.users)
+
+
+class LdapSyncTest(AppTestCase):
+
+    enabled_plugins = ['SQLite', 'LdapSync']
+
+    default_config = {'LdapSyncPageSize': '100'}
+
+    def setUp(self):
+        AppTestCase.setUp(self)
+        self.plugin = self.app.plugins.get_plugin_by_name('LdapSyncPlugin')
+        self.store = MockStore([
+            _info('bob', 'bob@test.com', '/home/bob'),
+            _info('annik', 'annik@test.com'),
+            _info('mike'),
+        ])
+        self.plugin._get_store = lambda: self.store
+        self.app.userdb.add_user('bob')
+        self.app.userdb.add_user('annik').user_root = '/backups/annik'
+
+    def test_sync(self):
+        self.assertEqual(2, self.plugin.sync())
+        self.assertEqual(100, self.store.page_size)
+        bob = self.app.userdb.get_user('bob')
+        self.assertEqual('bob@test.com', bob.email)
+        self.assertEqual('/home/bob', bob.user_root)
+        # Root directory defined by administrator is kept.
+        annik = self.app.userdb.get_user('annik')
+        self.assertEqual('annik@test.com', annik.email)
+        self.assertEqual('/backups/annik', annik.user_root)
+        # Missing users are not added.
+        self.assertFalse(self.app.userdb.exists('mike'))
+        # Nothing to update.
+        self.assertEqual(0, self.plugin.sync())
+
+    def test_sync_add_missing_user(self):
+        self.app.cfg.set_config('AddMissingUser', 'true')
+        self.store.users.append(_info('john', 'john@test.com'))
+        self.assertEqual(3, self.plugin.sync())
+        self.assertTrue(self.app.userdb.exists('mike'))
+        self.assertEqual('john@test.com', self.app.userdb.get_user('john').email)
+
+    def test_sync_without_ldap(self):
+        self.plugin._get_store = lambda: None
+        self.assertEqual(0, self.plugin.sync())
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -34,7 +34,6 @@ import smtplib
 import time
 from xml.etree.ElementTree import fromstring, tostring
 
-from rdiffweb import librdiff
 from rdiffweb.core import RdiffError, RdiffWarning
 from rdiffweb.i18n import ugettext as _
 from rdiffweb.rdw_helpers import rdwTime
@@ -202,15 +201,18 @@ class NotificationPlugin(IPreferencesPanelProvider, JobPlugin, IUserChangeListen
                     continue
                 # Identify old repo for current user.
                 old_repos = []
-                for repo in user.repo_list:
+                repos = user.repo_list
+                summaries = self.app.summaries.get_summaries(user, block=True, repos=repos)
+                for repo, summary in zip(repos, summaries):
                     # Check if repo has age configured (in days)
                     maxage = repo.maxage
-                    if not maxage or maxage <= 0:
+                    if not maxage or maxage <= 0 or summary.failed:
                         continue
                     # Check repo age.
-                    r = librdiff.RdiffRepo(user.user_root, repo.name)
-                    if r.last_backup_date < (now - datetime.timedelta(days=maxage)):
-                        old_repos.append(r)
+                    last_backup_date = summary.last_backup_date
+                    if (last_backup_date is None or
+                            last_backup_date < (now - datetime.timedelta(days=maxage))):
+                        old_repos.append(summary)
                 # Return an item only if user had old repo
                 if old_repos:
                     yield user, old_repos
@@ -74,6 +74,8 @@ class RemoveOlderPage(page_main.MainPage):
 
 class RemoveOlderPlugin(ITemplateFilterPlugin, JobPlugin):
 
+    templates = ['settings.html']
+
     def activate(self):
         # Add page
         self.app.root.ajax.remove_older = RemoveOlderPage(self.app)
@@ -0,0 +1,112 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+When enabled, this plugin periodically scans every users repositories and
+stores a summary of each repository in database: last backup date, backup in
+progress, statistics of the last session, number of errors and mirror size.
+Pages and jobs read this summary instead of reading the repositories. New
+backup sessions are also recorded in the backup log.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+from multiprocessing.pool import ThreadPool
+
+from rdiffweb import repo_summary
+from rdiffweb.rdw_plugin import IDeamonPlugin
+
+
+_logger = logging.getLogger(__name__)
+
+
+class RepoScannerPlugin(IDeamonPlugin):
+    """
+    Plugin to compute repositories summary in background.
+    """
+
+    @property
+    def deamon_frequency(self):
+        """
+        Return the frequency to scan the repositories. Default to 5min.
+        """
+        value = self.app.cfg.get_config_int("RepoScannerFrequency", "5")
+        if value <= 0:
+            value = 5
+        return value * 60
+
+    @property
+    def _threads(self):
+        """Number of repositories scanned in parallel."""
+        return max(1, self.app.cfg.get_config_int("RepoScannerThreads", "4"))
+
+    def deamon_run(self):
+        """
+        Scan the repositories.
+        """
+        try:
+            self.scan()
+        except:
+            _logger.exception("fail to scan repositories")
+
+    def scan(self):
+        """
+        Compute the summary of every modified repositories. Return the number
+        of summaries updated.
+        """
+        users = list(self.app.userdb.list())
+        count = self._scan_summaries(users)
+        # Record new sessions.
+        for user in users:
+            if user.user_root and self.app.backup_log.supports(user):
+                self.app.backup_log.update(user)
+        return count
+
+    def _scan_summaries(self, users):
+        """
+        Compute and store the summary of modified repositories.
+        """
+        # Identify modified repositories.
+        modified = []
+        for user in users:
+            user_root = user.user_root
+            if not user_root:
+                continue
+            for repo_obj in user.repo_list:
+                stored = repo_summary.loads(
+                    user_root, repo_obj.name, repo_obj.get_attr('summary'))
+                if stored is None or stored.is_modified():
+                    modified.append((user_root, repo_obj))
+        if not modified:
+            return 0
+
+        # Read repositories in parallel, but write to database from the
+        # current thread.
+        _logger.debug("scanning %s repositories", len(modified))
+        pool = ThreadPool(min(self._threads, len(modified)))
+        try:
+            summaries = pool.map(
+                lambda args: repo_summary.compute_summary(args[0], args[1].name, extended=True),
+                modified)
+        finally:
+            pool.close()
+            pool.join()
+        for (user_root, repo_obj), summary in zip(modified, summaries):
+            repo_obj.set_attr('summary', repo_summary.dumps(summary))
+            self.app.summaries.invalidate(user_root, repo_obj.name)
+        return len(summaries)
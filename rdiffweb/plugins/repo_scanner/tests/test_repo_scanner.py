@@ -0,0 +1,91 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module used to test the repository scanner plugin.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import time
+import unittest
+
+from rdiffweb import repo_summary
+from rdiffweb.rdw_helpers import rdwTime
+from rdiffweb.test import AppTestCase
+
+
+class RepoScannerTest(AppTestCase):
+
+    enabled_plugins = ['SQLite', 'RepoScanner']
+
+    USERNAME = 'admin'
+
+    PASSWORD = 'admin123'
+
+    reset_testcases = True
+
+    def setUp(self):
+        AppTestCase.setUp(self)
+        self.plugin = self.app.plugins.get_plugin_by_name('RepoScannerPlugin')
+        self.user = self.app.userdb.get_user(self.USERNAME)
+
+    def _stored(self, repo='testcases/'):
+        # Read the user again since the attributes are kept with the user.
+        user = self.app.userdb.get_user(self.USERNAME)
+        return repo_summary.loads(
+            self.app.testcases, repo, user.get_repo(repo).get_attr('summary'))
+
+    def test_scan(self):
+        """Check if summaries are stored in database."""
+        self.assertIsNone(self._stored())
+        self.assertEqual(1, self.plugin.scan())
+        summary = self._stored()
+        self.assertEqual('testcases', summary.name)
+        self.assertEqual(rdwTime(1454448640), summary.last_backup_date)
+        self.assertEqual(22, summary.backup_count)
+        self.assertEqual(0, summary.error_count)
+        self.assertFalse(summary.in_progress)
+        self.assertFalse(summary.failed)
+
+    def test_scan_incremental(self):
+        """Check if only modified repositories are scanned again."""
+        self.assertEqual(1, self.plugin.scan())
+        self.assertEqual(0, self.plugin.scan())
+        # Touch the repository.
+        data_path = self._stored().data_path
+        os.utime(data_path, (time.time() + 10, time.time() + 10))
+        self.assertEqual(1, self.plugin.scan())
+
+    def test_scan_invalid_repo(self):
+        """Check if invalid repositories are stored as failed."""
+        self.user.repos = ['testcases/', 'invalid/']
+        self.assertEqual(2, self.plugin.scan())
+        self.assertTrue(self._stored('invalid/').failed)
+        self.assertFalse(self._stored('testcases/').failed)
+
+    def test_get_summaries(self):
+        """Check if summary manager use the stored summaries."""
+        self.plugin.scan()
+        summaries = self.app.summaries.get_summaries(self.user)
+        self.assertEqual(22, summaries[0].backup_count)
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
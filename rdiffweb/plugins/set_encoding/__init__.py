@@ -27,11 +27,12 @@ import cherrypy
 from cherrypy._cperror import HTTPRedirect
 import datetime
 import encodings
+from future.utils.surrogateescape import encodefilename
 import logging
 import os
 import re
 
-from rdiffweb import rdw_spider_repos, page_main, librdiff
+from rdiffweb import rdw_spider_repos, page_main
 from rdiffweb.dispatch import poppath
 from rdiffweb.i18n import ugettext as _
 from rdiffweb.page_main import MainPage
@@ -80,6 +81,8 @@ class SetEncodingPage(page_main.MainPage):
 
 class SetEncodingPlugin(ITemplateFilterPlugin):
 
+    templates = ['settings.html']
+
     def activate(self):
         # Add page
         self.app.root.ajax.set_encoding = SetEncodingPage(self.app)
@@ -94,8 +97,9 @@ class SetEncodingPlugin(ITemplateFilterPlugin):
             # Append our template
             template = self.app.templates.get_template("set_encoding.html")
             data["templates_content"].append(template)
-            # Query current data from database.
-            repo_obj = librdiff.RdiffRepo(self.app.currentuser.user_root, data['repo_path'])
+            # Reuse the repository opened by the page.
+            repo_obj = page_main.get_repo_obj(
+                encodefilename(self.app.currentuser.user_root), data['repo_path'])
             current_encoding = repo_obj.get_encoding()
             current_encoding = encodings.normalize_encoding(current_encoding)
             data['current_encoding'] = current_encoding
@@ -25,6 +25,7 @@ import sys
 
 from cherrypy import Application
 import cherrypy
+from cherrypy.lib.sessions import FileSession
 from cherrypy.process.plugins import Monitor
 from future.utils import native_str
 import pkg_resources
@@ -33,9 +34,11 @@ from rdiffweb import i18n  # @UnusedImport
 from rdiffweb import rdw_config, page_main
 from rdiffweb import rdw_plugin
 from rdiffweb import rdw_templating
+from rdiffweb.backup_log import BackupLogManager
 from rdiffweb.dispatch import static
 from rdiffweb.page_admin import AdminPage
 from rdiffweb.page_browse import BrowsePage
+from rdiffweb.page_errorlog import ErrorLogPage
 from rdiffweb.page_history import HistoryPage
 from rdiffweb.page_locations import LocationsPage
 from rdiffweb.page_main import MainPage
@@ -43,6 +46,7 @@ from rdiffweb.page_prefs import PreferencesPage
 from rdiffweb.page_restore import RestorePage
 from rdiffweb.page_settings import SettingsPage
 from rdiffweb.page_status import StatusPage
+from rdiffweb.repo_summary import RepoSummaryManager
 from rdiffweb.user import UserManager
 
 
@@ -60,6 +64,7 @@ class Root(LocationsPage):
         self.browse = BrowsePage(app)
         self.restore = RestorePage(app)
         self.history = HistoryPage(app)
+        self.errorlog = ErrorLogPage(app)
         self.status = StatusPage(app)
         self.admin = AdminPage(app)
         self.prefs = PreferencesPage(app)
@@ -89,8 +94,12 @@ class RdiffwebApp(Application):
         # Initialise the configuration
         self.load_config(configfile)
 
-        # Initialise the template enginge.
-        self.templates = rdw_templating.TemplateManager()
+        # Initialise the template enginge. In production, templates are not
+        # reloaded when modified.
+        environment = self.cfg.get_config('Environment', 'production')
+        self.templates = rdw_templating.TemplateManager(
+            cache_dir=self.cfg.get_config('TemplateCacheDir'),
+            auto_reload=self.cfg.get_config_bool('TemplateAutoReload', 'true' if environment == 'development' else 'false'))
 
         # Initialise the plugins
         self.plugins = rdw_plugin.PluginManager(self.cfg)
@@ -114,7 +123,7 @@ class RdiffwebApp(Application):
         if PY3 and cherrypy.__version__ >= "5.5.0":
             config[native_str('/')]["request.uri_encoding"] = "ISO-8859-1"
 
-        self._setup_session_storage(config)
+        self._setup_session_storage(config[native_str('/')])
         Application.__init__(self, root=Root(self), config=config)
 
         # Activate every loaded plugin
@@ -123,9 +132,19 @@ class RdiffwebApp(Application):
         # create user manager
         self.userdb = UserManager(self)
 
+        # create repository summary manager
+        self.summaries = RepoSummaryManager(self)
+
+        # create backup log manager
+        self.backup_log = BackupLogManager(self)
+
         # Start deamon plugins
         self._start_deamons()
 
+        # Watch the configuration file for modifications.
+        self._start_config_watcher()
+        self.cfg.subscribe(self._config_changed)
+
     def activate_plugin(self, plugin_obj):
         """Activate the given plugin object."""
         plugin_obj.app = self
@@ -214,6 +233,8 @@ class RdiffwebApp(Application):
 
     def _setup_session_storage(self, config):
         # Configure session storage.
+        config.pop('tools.sessions.storage_class', None)
+        config.pop('tools.sessions.storage_path', None)
         session_storage = self.cfg.get_config("SessionStorage")
         session_dir = self.cfg.get_config("SessionDir")
         if session_storage.lower() != "disk":
@@ -227,20 +248,72 @@ class RdiffwebApp(Application):
         logger.info("Setting session mode to disk in directory %s", session_dir)
         config.update({
             'tools.sessions.on': True,
-            'tools.sessions.storage_type': True,
+            'tools.sessions.storage_class': FileSession,
             'tools.sessions.storage_path': session_dir,
         })
 
+    def _start_config_watcher(self):
+        """
+        Periodically check if the configuration file was modified. Reading
+        the configuration never check the file.
+        """
+        self._config_watcher = None
+        if not self.cfg.get_config_file():
+            return
+        self._config_watcher = Monitor(
+            cherrypy.engine,
+            self.cfg.reload_if_modified,
+            frequency=self.cfg.get_config_int('ConfigCheckInterval', '5'),
+            name='ConfigWatcher')
+        self._config_watcher.subscribe()
+
     def _start_deamons(self):
         """
         Start deamon plugins
         """
         logger.debug("starting daemon plugins")
+        # List of (plugin, monitor).
+        self._deamons = []
 
         def start_deamon(p):
-            Monitor(cherrypy.engine,
-                    p.deamon_run,
-                    frequency=p.deamon_frequency,
-                    name=p.__class__.__name__).subscribe()
+            monitor = Monitor(cherrypy.engine,
+                              p.deamon_run,
+                              frequency=p.deamon_frequency,
+                              name=p.__class__.__name__)
+            monitor.subscribe()
+            self._deamons.append((p, monitor))
 
         self.plugins.run(start_deamon, category='Daemon')
+
+    def reload_config(self):
+        """
+        Read the configuration file again and apply the modifications. Called
+        when receiving SIGHUP.
+        """
+        logger.info("reloading configuration")
+        self.cfg.reload_if_modified(force=True)
+
+    def _config_changed(self, changed):
+        """
+        Called when the configuration file is reloaded to apply the
+        modifications not read on every use.
+        """
+        # Update session storage.
+        if 'sessionstorage' in changed or 'sessiondir' in changed:
+            self._setup_session_storage(self.config[native_str('/')])
+
+        # Restart the threads running at a different frequency.
+        monitors = [(m, p.deamon_frequency) for p, m in self._deamons]
+        if self._config_watcher:
+            monitors.append((self._config_watcher, self.cfg.get_config_int('ConfigCheckInterval', '5')))
+        for monitor, frequency in monitors:
+            if monitor.frequency == frequency:
+                continue
+            logger.info("changing frequency of %s to %s", monitor.name, frequency)
+            # Monitor.stop() doesn't cancel the thread calling it.
+            if monitor.thread is not None:
+                monitor.thread.cancel()
+            monitor.stop()
+            monitor.frequency = frequency
+            if cherrypy.engine.state == cherrypy.engine.states.STARTED:
+                monitor.start()
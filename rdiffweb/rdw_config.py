@@ -28,6 +28,7 @@ from io import open
 import logging
 import os
 import re
+import threading
 
 
 # Define the logger
@@ -45,15 +46,43 @@ class SettingsError(Exception):
         return self.error
 
 
+class _Snapshot(object):
+    """
+    Configuration values read from file. Never modified once created except
+    for `typed` caching the values coerced by `get_config_*`.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        self.typed = {}
+
+
 class Configuration(object):
+    """
+    Configuration read from a file of `key=value` lines.
+
+    The file is parsed once into a snapshot. Reading a value is a dictionary
+    lookup without checking if the file was modified. `reload_if_modified()`
+    is called periodically to read the file again when modified.
+
+    Components keeping objects built from the configuration (connection
+    pools, caches, threads) may `subscribe()` to be notified when the file
+    is reloaded.
+    """
 
     def __init__(self, filename=None):
-        # Declare the cache variable used to store the configuration in memory.
-        self._cache = OrderedDict()
+        # Declare the snapshot used to store the configuration in memory.
+        self._snapshot = None
+        # Only used to replace the snapshot, never to read.
+        self._lock = threading.RLock()
+        # Held while reloading the file and notifying subscribers.
+        self._reload_lock = threading.Lock()
         # Declare default location
         self._filename = filename
         # Declare modification time
         self._lastmtime = False
+        # Functions called when the configuration is reloaded.
+        self._listeners = []
 
     def get_config_file(self):
         """Return the configuration file location."""
@@ -68,39 +97,63 @@ class Configuration(object):
                                 % filename)
 
         # Force reading the configuration file.
-        self._lastmtime = False
-
-    def get_config(self, key, default=""):
-        """Get the configuration value corresponding to key."""
+        with self._lock:
+            self._lastmtime = False
+            self._parse_if_needed()
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            # Read the configuration file the first time.
+            with self._lock:
+                if self._snapshot is None:
+                    self._parse_if_needed()
+                if self._snapshot is None:
+                    self._snapshot = _Snapshot(OrderedDict())
+                snapshot = self._snapshot
+        return snapshot
+
+    def _get(self, snapshot, key, default):
         assert isinstance(key, str)
         # Raise error if key contains equals(=)
         assert '=' not in key, "key contains ="
+        return snapshot.values.get(key.lower()) or default
 
-        # Read the configuration file if required.
-        self._parse_if_needed()
+    def _get_typed(self, kind, key, default, coerce):
+        """
+        Return the value of `key` converted by `coerce`. The result is kept
+        with the snapshot.
+        """
+        snapshot = self._get_snapshot()
+        cache_key = (kind, key, default)
+        try:
+            return snapshot.typed[cache_key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Default value is not hashable.
+            return coerce(self._get(snapshot, key, default))
+        value = coerce(self._get(snapshot, key, default))
+        snapshot.typed[cache_key] = value
+        return value
 
-        # Use the cached value
-        cache = self._cache.get(key.lower())
-        if cache:
-            return cache
-        else:
-            return default
+    def get_config(self, key, default=""):
+        """Get the configuration value corresponding to key."""
+        return self._get(self._get_snapshot(), key, default)
 
     def get_config_bool(self, key, default="False"):
         """
         A convenience method which coerces the key to a boolean.
         """
-        value = self.get_config(key, default).lower()
-        return (value == "1" or
-                value == "yes" or
-                value == "true" or
-                value == "on")
+        def coerce(value):
+            return value.lower() in ("1", "yes", "true", "on")
+        return self._get_typed('bool', key, default, coerce)
 
     def get_config_int(self, key, default=''):
         """
         A convenience method which coerces the key to an integer.
         """
-        return int(self.get_config(key, default))
+        return self._get_typed('int', key, default, int)
 
     def get_config_list(self, key, default='', sep=',', keep_empty=False):
         """
@@ -113,31 +166,89 @@ class Configuration(object):
 
         Valid default input is a string or a list. Returns a string.
         """
-        value = self.get_config(key, default)
-        if not value:
-            return []
-        if isinstance(value, str):
-            if isinstance(sep, (list, tuple)):
-                splitted = re.split('|'.join(map(re.escape, sep)), value)
+        def coerce(value):
+            if not value:
+                return ()
+            if isinstance(value, str):
+                if isinstance(sep, (list, tuple)):
+                    splitted = re.split('|'.join(map(re.escape, sep)), value)
+                else:
+                    splitted = value.split(sep)
+                items = [item.strip() for item in splitted]
             else:
-                splitted = value.split(sep)
-            items = [item.strip() for item in splitted]
-        else:
-            items = list(value)
-        if not keep_empty:
-            items = [item for item in items if item not in (None, '')]
-        return items
+                items = list(value)
+            if not keep_empty:
+                items = [item for item in items if item not in (None, '')]
+            return tuple(items)
+        kind = ('list', tuple(sep) if isinstance(sep, list) else sep, keep_empty)
+        # Return a copy since lists may be modified by the caller.
+        return list(self._get_typed(kind, key, default, coerce))
+
+    def subscribe(self, callback):
+        """
+        Register a function called with the set of keys (lower case) modified
+        when the configuration file is reloaded.
+        """
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        """
+        Unregister a function registered with `subscribe()`.
+        """
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def reload_if_modified(self, force=False):
+        """
+        Read the configuration file again if it was modified. If the file is
+        not valid, the current configuration is kept. Return True if the
+        configuration was reloaded.
+
+        When values are modified, subscribers are notified.
+        """
+        # Reload and notify one at a time to apply changes in order.
+        with self._reload_lock:
+            with self._lock:
+                previous = self._snapshot
+                try:
+                    if not self._parse_if_needed(force=force):
+                        return False
+                except (SettingsError, IOError, OSError) as e:
+                    logger.error("fail to reload configuration file [%s]: %s", self._filename, e)
+                    # Report each invalid version of the file once.
+                    try:
+                        self._lastmtime = os.path.getmtime(self._filename)
+                    except OSError:
+                        pass
+                    return False
+                current = self._snapshot
+            if previous is None:
+                return True
+            changed = set(
+                key for key in set(previous.values) | set(current.values)
+                if previous.values.get(key) != current.values.get(key))
+            if not changed:
+                return True
+            logger.info("configuration file [%s] reloaded, modified: %s",
+                        self._filename, ', '.join(sorted(changed)))
+            for callback in list(self._listeners):
+                try:
+                    callback(changed)
+                except:
+                    logger.exception("fail to apply configuration changes")
+            return True
 
     def _parse_if_needed(self, force=False):
-        """Read the configuration file and update the internal _cache. Return True
-        if the configuration was read. False if the configuration wasn't read. Used
-        may called this method with force=True to force the configuration to be
-        read."""
+        """Read the configuration file and replace the snapshot. Return True
+        if the configuration was read. False if the configuration wasn't read.
+        Used may called this method with force=True to force the configuration
+        to be read."""
         if not self._filename:
             return False
 
         if not os.access(self._filename, os.R_OK) or not os.path.isfile(self._filename):
-            logger.info("configuration file [%s] doesn't exists", self._filename)
+            if self._snapshot is None:
+                logger.info("configuration file [%s] doesn't exists", self._filename)
             return False
 
         # Check if parsing the config file is required.
@@ -169,8 +280,8 @@ class Configuration(object):
                     "Error reading configuration line %s" % (line))
             new_cache[split_line[0].lower().strip()] = split_line[2].strip()
 
-        # Return the configuration data.
-        self._cache = new_cache
+        # Replace the configuration data.
+        self._snapshot = _Snapshot(new_cache)
         self._lastmtime = modtime
         return True
 
@@ -182,19 +293,22 @@ class Configuration(object):
         assert isinstance(value, str)
         # Raise error if key contains equals(=)
         assert '=' not in key, "key contains ="
-        # Read file if required
-        self._parse_if_needed()
-        # Update the cache
-        self._cache[key.lower().strip()] = value
+        with self._lock:
+            # Read file if required
+            values = OrderedDict(self._get_snapshot().values)
+            # Replace the snapshot
+            values[key.lower().strip()] = value
+            self._snapshot = _Snapshot(values)
 
     def save(self):
         """Write the configuration back to file."""
+        values = self._get_snapshot().values
         # Nothing read / nothing written.
-        if not self._cache:
+        if not values:
             return
         # Start writting the file.
         with open(self._filename, "w", encoding='utf-8') as f:
-            for key, value in list(self._cache.items()):
+            for key, value in list(values.items()):
                 f.write('%s=%s' % (key, value))
                 f.write('\n')
 
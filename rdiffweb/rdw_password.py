@@ -0,0 +1,184 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Password hashing used by the database plugins.
+
+Passwords are stored as `pbkdf2_sha256$<iterations>$<salt>$<hash>`. Older
+databases contain unsalted SHA-1 hex digests. Those are still accepted and
+should be replaced by a new hash on the next successful login.
+
+Computing a slow hash on every request authenticated with HTTP basic
+authentication is too expensive. `CredentialCache` remembers the credentials
+recently verified.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from builtins import object
+from builtins import str
+import base64
+import binascii
+from collections import OrderedDict
+import hashlib
+import hmac
+import logging
+import os
+import threading
+import time
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+ALGORITHM = 'pbkdf2_sha256'
+
+# Default number of iterations of PBKDF2.
+ITERATIONS = 100000
+
+_SALT_SIZE = 16
+
+
+def _b64(value):
+    return base64.b64encode(value).decode('ascii')
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac(
+        'sha256', password.encode('utf8'), salt.encode('ascii'), iterations)
+
+
+def _sha1(password):
+    value = hashlib.sha1(password.encode('utf8')).hexdigest()
+    if isinstance(value, bytes):
+        value = value.decode(encoding='latin1')
+    return value
+
+
+def _is_legacy(hashed):
+    """
+    Check if the given value is an unsalted SHA-1 hex digest.
+    """
+    if len(hashed) != 40:
+        return False
+    try:
+        binascii.unhexlify(hashed.encode('ascii'))
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def hash_password(password, iterations=ITERATIONS):
+    """
+    Return a salted hash of the given password.
+    """
+    assert isinstance(password, str)
+    salt = _b64(os.urandom(_SALT_SIZE))
+    value = _b64(_pbkdf2(password, salt, iterations))
+    return '%s$%d$%s$%s' % (ALGORITHM, iterations, salt, value)
+
+
+def check_password(password, hashed):
+    """
+    Check if the password match the hash. Unsalted SHA-1 hashes are
+    supported.
+    """
+    assert isinstance(password, str)
+    if not hashed:
+        return False
+    if _is_legacy(hashed):
+        return hmac.compare_digest(_sha1(password), hashed.lower())
+    try:
+        algorithm, iterations, salt, value = hashed.split('$')
+        iterations = int(iterations)
+    except ValueError:
+        logger.warning("invalid password hash")
+        return False
+    if algorithm != ALGORITHM:
+        logger.warning("unsupported password hash algorithm %s", algorithm)
+        return False
+    return hmac.compare_digest(_b64(_pbkdf2(password, salt, iterations)), value)
+
+
+def needs_rehash(hashed, iterations=ITERATIONS):
+    """
+    Check if the hash should be replaced because it was computed with an
+    older algorithm or less iterations.
+    """
+    if not hashed or _is_legacy(hashed):
+        return True
+    parts = hashed.split('$')
+    return len(parts) != 4 or parts[0] != ALGORITHM or parts[1] != str(iterations)
+
+
+class CredentialCache(object):
+    """
+    Remember the credentials recently verified for `ttl` seconds.
+
+    Passwords are never stored. Entries are identified by a keyed hash of the
+    username, the password and the stored password hash, so changing the
+    password invalidates the entry. The key is random and only kept in
+    memory. The least recently used entries are removed when the cache
+    contains more than `size` entries.
+    """
+
+    def __init__(self, size=1000, ttl=300):
+        self.size = size
+        self.ttl = ttl
+        self._secret = os.urandom(32)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _key(self, username, password, hashed):
+        data = '\0'.join([username, password, hashed or '']).encode('utf8')
+        return hmac.new(self._secret, data, hashlib.sha256).digest()
+
+    def check(self, username, password, hashed):
+        """
+        Return True if the credentials were verified recently.
+        """
+        if not self.size or self.ttl <= 0:
+            return False
+        key = self._key(username, password, hashed)
+        with self._lock:
+            expire = self._entries.pop(key, None)
+            if expire is None or expire < time.time():
+                return False
+            # Move the entry to the end.
+            self._entries[key] = expire
+            return True
+
+    def add(self, username, password, hashed):
+        """
+        Remember the given valid credentials.
+        """
+        if not self.size or self.ttl <= 0:
+            return
+        key = self._key(username, password, hashed)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = time.time() + self.ttl
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -53,6 +53,8 @@ class PluginManager(object):
         self._categories = {}
         self._names = {}
         self._plugin_infos = []
+        # Template filter plugins by template name.
+        self._template_filters = {}
 
         # Load all enabled plugins.
         self._load_plugins()
@@ -298,6 +300,29 @@ class PluginManager(object):
         # Register plugin with category.
         for c in set(categories):
             self._categories.setdefault(c, list()).append(instance)
+        self._template_filters.clear()
+
+    def get_template_filters(self, template_name):
+        """
+        Return the template filter plugins interested by the given template.
+        """
+        plugins = self._template_filters.get(template_name)
+        if plugins is None:
+            plugins = [
+                p for p in self.get_plugins_of_category(ITemplateFilterPlugin.CATEGORY)
+                if p.templates is None or template_name in p.templates]
+            self._template_filters[template_name] = plugins
+        return plugins
+
+    def filter_data(self, template_name, data):
+        """
+        Let plugins filter the params of the given template.
+        """
+        for plugin in self.get_template_filters(template_name):
+            try:
+                plugin.filter_data(template_name, data)
+            except:
+                logger.exception("fail to run plugin [%r]", plugin.__class__.__name__)
 
     def run(self, method, category=None):
         """
@@ -402,6 +427,31 @@ class IDatabase(IRdiffwebPlugin):
     def is_admin(self, user):
         """Return True if the user is Admin."""
 
+    # Optional operations used to read every attributes of users at once.
+    # `get_user()` return a dictionary with keys `email`, `user_root`,
+    # `is_admin` and `repos`. `get_users()` return a list of `(user, record)`
+    # ordered by username matching the given criteria. These records may also
+    # contain `repo_attrs`, the attributes of each repository, in which case
+    # they are kept in the session with the user.
+    #
+    # get_user(user)
+    # get_users(search=None, admins=None, offset=0, limit=None)
+    # count_users(search=None, admins=None)
+
+    # Optional operation returning a value changing every time the user or its
+    # repositories are modified, or None if the user doesn't exists. Used to
+    # invalidate the users kept in sessions.
+    #
+    # get_user_version(user)
+
+    # Optional operations used to keep a log of backup sessions. Check with
+    # `supports('get_sessions')`.
+    #
+    # get_sessions(user, repo_paths=None, start=None, end=None)
+    # get_last_session_date(user, repo_path)
+    # add_sessions(user, repo_path, sessions)
+    # delete_sessions(user, repo_path, before)
+
 
 class IDeamonPlugin(IRdiffwebPlugin):
     """
@@ -549,9 +599,14 @@ class IPreferencesPanelProvider(IRdiffwebPlugin):
 class ITemplateFilterPlugin(IRdiffwebPlugin):
     """
     Plugin to extend any pages params.
+
+    Plugins should define `templates` with the names of the templates they
+    are filtering. When `None`, `filter_data` is called for every template.
     """
     CATEGORY = "TemplateFilter"
 
+    templates = None
+
     def filter_data(self, template_name, data):
         """
         Called by to filter the params.
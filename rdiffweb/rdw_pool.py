@@ -0,0 +1,154 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Pool of connections shared by every threads. Used by plugins connecting to
+a remote server: SQL database, LDAP directory.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from builtins import object
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+from rdiffweb.core import RdiffError
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(RdiffError):
+    """
+    Raised when no connection is available in the pool.
+    """
+    pass
+
+
+def _close(conn):
+    conn.close()
+
+
+class ConnectionPool(object):
+    """
+    Keep a limited number of connections open to be reused by every threads.
+
+    `connect` is called to open a new connection and `close` to close it.
+    Connections raising one of the `errors` exceptions are considered broken
+    and closed. Connections idle for more than `max_idle` seconds are closed
+    instead of being reused, since servers usually drop them.
+    """
+
+    def __init__(self, connect, size=5, timeout=30, errors=(), close=_close, max_idle=None):
+        assert size > 0
+        self._connect = connect
+        self._close = close
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        # Exceptions raised when a connection is broken.
+        self._errors = errors
+        self._cond = threading.Condition(threading.Lock())
+        # List of (connection, time released).
+        self._idle = []
+        # Number of connections open.
+        self._count = 0
+
+    @property
+    def checkedout(self):
+        """Number of connections currently used."""
+        with self._cond:
+            return self._count - len(self._idle)
+
+    def _acquire(self):
+        deadline = time.time() + self.timeout
+        stale = []
+        try:
+            with self._cond:
+                while not self._idle and self._count >= self.size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        raise PoolTimeoutError("no connection available")
+                    self._cond.wait(remaining)
+                # Most recently used connections are at the end.
+                while self._idle:
+                    conn, released = self._idle.pop()
+                    if self.max_idle is None or time.time() - released <= self.max_idle:
+                        return conn
+                    self._count -= 1
+                    stale.append(conn)
+                self._count += 1
+        finally:
+            for conn in stale:
+                logger.debug("closing idle connection")
+                self._safe_close(conn)
+        try:
+            return self._connect()
+        except:
+            self._discard(None)
+            raise
+
+    def _release(self, conn):
+        with self._cond:
+            self._idle.append((conn, time.time()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self._count -= 1
+            self._cond.notify()
+        if conn is not None:
+            self._safe_close(conn)
+
+    def _safe_close(self, conn):
+        try:
+            self._close(conn)
+        except Exception:
+            logger.warning("fail to close connection", exc_info=1)
+
+    @contextmanager
+    def connection(self):
+        """
+        Return a connection from the pool. The connection is returned to the
+        pool when done. Broken connections are closed.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        except self._errors:
+            logger.warning("closing broken connection", exc_info=1)
+            self._discard(conn)
+            raise
+        except:
+            self._release(conn)
+            raise
+        self._release(conn)
+
+    def close(self):
+        """
+        Close the idle connections.
+        """
+        with self._cond:
+            connections = self._idle
+            self._idle = []
+            self._count -= len(connections)
+        for conn, unused in connections:
+            self._safe_close(conn)
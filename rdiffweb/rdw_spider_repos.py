@@ -55,8 +55,14 @@ def _find_repos(path, depth=3):
 
 
 def find_repos_for_user(user, userdb):
+    """
+    Search the repositories in the user root directory. `user` may be a
+    username or a user object.
+    """
     logger.debug("find repos for [%s]", user)
-    user_root = userdb.get_user(user).user_root
+    if not hasattr(user, 'user_root'):
+        user = userdb.get_user(user)
+    user_root = user.user_root
     repo_paths = list(_find_repos(user_root))
 
     def striproot(path):
@@ -65,4 +71,4 @@ def find_repos_for_user(user, userdb):
         return path[len(user_root):]
     repo_paths = list(map(striproot, repo_paths))
     logger.debug("set user [%s] repos: %s ", user, repo_paths)
-    userdb.get_user(user).repos = repo_paths
+    user.repos = repo_paths
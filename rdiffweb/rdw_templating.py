@@ -22,11 +22,13 @@ from __future__ import unicode_literals
 from builtins import bytes
 from builtins import object
 from builtins import str
+import cherrypy
 from io import StringIO
-from jinja2 import Environment, PackageLoader
+from jinja2 import Environment, PackageLoader, FileSystemBytecodeCache
 from jinja2.ext import _make_new_gettext, _make_new_ngettext
 from jinja2.loaders import ChoiceLoader, FileSystemLoader
 import logging
+import threading
 import time
 
 from rdiffweb import i18n
@@ -160,6 +162,20 @@ def url_for_browse(repo, path=None, restore=False):
     return ''.join(url)
 
 
+def url_for_error_log(repo, date):
+    assert isinstance(repo, bytes)
+    assert isinstance(date, rdw_helpers.rdwTime)
+    url = []
+    url.append("/errorlog/")
+    if repo:
+        repo = repo.rstrip(b"/")
+        url.append(rdw_helpers.quote_url(repo))
+        url.append("/")
+    url.append("?date=")
+    url.append(str(date.getSeconds()))
+    return ''.join(url)
+
+
 def url_for_history(repo):
     assert isinstance(repo, bytes)
     url = []
@@ -217,6 +233,29 @@ def url_for_status_entry(date, repo=None):
     return ''.join(url)
 
 
+def url_for_static(path):
+    """
+    Generate an URL for a static file. The URL contains a fingerprint of the
+    file to let the browser cache it until it get modified.
+    """
+    url = "/static/" + path
+    app = cherrypy.request.app
+    handler = getattr(getattr(app, 'root', None), 'static', None)
+    if handler is None:
+        return url
+    # Lookup the handler the same way cherrypy does.
+    parts = path.split('/')
+    child = getattr(handler, parts[0].replace('.', '_'), None)
+    if hasattr(child, 'fingerprint'):
+        handler, parts = child, parts[1:]
+    if not hasattr(handler, 'fingerprint'):
+        return url
+    fingerprint = handler.fingerprint(*parts)
+    if fingerprint:
+        url += "?v=" + fingerprint
+    return url
+
+
 def _get_translation(domain):
     """
     Used in templates to load a different translation domain.
@@ -232,16 +271,24 @@ class TemplateManager(object):
     Uses to generate HTML page from template using Jinja2 templating.
     """
 
-    def __init__(self):
+    def __init__(self, cache_dir=None, auto_reload=True):
 
         loader = ChoiceLoader([
             PackageLoader('rdiffweb', 'templates')
         ])
 
-        # Load all the templates from /templates directory
+        # Keep compiled templates on disk to avoid compiling them again
+        # after restart.
+        bytecode_cache = None
+        if cache_dir:
+            bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+        # Load all the templates from /templates directory. When auto_reload
+        # is disabled, template files are not checked for modification.
         self.jinja_env = Environment(
             loader=loader,
-            auto_reload=True,
+            auto_reload=auto_reload,
+            bytecode_cache=bytecode_cache,
             autoescape=True,
             extensions=[
                 'jinja2.ext.i18n',
@@ -257,13 +304,27 @@ class TemplateManager(object):
         # Register method
         self.jinja_env.globals['attrib'] = attrib
         self.jinja_env.globals['url_for_browse'] = url_for_browse
+        self.jinja_env.globals['url_for_error_log'] = url_for_error_log
         self.jinja_env.globals['url_for_history'] = url_for_history
         self.jinja_env.globals['url_for_restore'] = url_for_restore
         self.jinja_env.globals['url_for_settings'] = url_for_settings
         self.jinja_env.globals['url_for_status_entry'] = url_for_status_entry
+        self.jinja_env.globals['url_for_static'] = url_for_static
         self.jinja_env.globals['load_translation'] = _get_translation
         self.jinja_env.globals['get_translation'] = _get_translation
 
+        # Translation functions are looking for the translation of the
+        # current request, so they only need to be installed once.
+        self.jinja_env.install_gettext_callables(
+            i18n.ugettext, i18n.ungettext, newstyle=True)
+
+        # Number of characters sent at once when streaming a template.
+        self.chunk_size = 16384
+
+        # Render time per template name: [count, total, max].
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
     def add_templatesdir(self, templates_dir):
         """
         Add a new templates directory.
@@ -280,13 +341,60 @@ class TemplateManager(object):
                 The arguments to be passed to the template.
         """
         logger.log(1, "compiling template [%s]", template_name)
-        self.jinja_env.install_gettext_callables(
-            i18n.ugettext, i18n.ungettext, newstyle=True)
+        start = time.time()
         template = self.jinja_env.get_template(template_name)
         data = template.render(kwargs)
-        logger.log(1, "template [%s] compiled", template_name)
+        elapsed = time.time() - start
+        self._record(template_name, elapsed)
+        logger.log(1, "template [%s] compiled in %.3fs", template_name, elapsed)
         return data
 
+    def stream_template(self, template_name, **kwargs):
+        """
+        Same as `compile_template`, but return a generator producing the
+        page by chunks of about `chunk_size` characters. Used by pages
+        which may be very large to avoid building the whole page in memory.
+        """
+        logger.log(1, "streaming template [%s]", template_name)
+        template = self.jinja_env.get_template(template_name)
+        return self._stream(template_name, template.generate(kwargs))
+
+    def _stream(self, template_name, events):
+        start = time.time()
+        buf = []
+        size = 0
+        for event in events:
+            buf.append(event)
+            size += len(event)
+            if size >= self.chunk_size:
+                yield ''.join(buf)
+                buf = []
+                size = 0
+        if buf:
+            yield ''.join(buf)
+        self._record(template_name, time.time() - start)
+
+    def _record(self, template_name, elapsed):
+        with self._stats_lock:
+            stat = self._stats.setdefault(template_name, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] = max(stat[2], elapsed)
+
+    def get_render_stats(self):
+        """
+        Return the render time of every template compiled since startup as
+        a dictionary: template name -> {count, total, average, max}. Times
+        are in seconds.
+        """
+        with self._stats_lock:
+            return dict(
+                (name, {'count': count,
+                        'total': total,
+                        'average': total / count,
+                        'max': max_time})
+                for name, (count, total, max_time) in self._stats.items())
+
     def get_template(self, template_name):
         """
         Return a reference to the given template identify by `template_name`.
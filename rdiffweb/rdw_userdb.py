@@ -0,0 +1,498 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Users, repositories and sessions stored in a SQL database. Shared by the
+database plugins.
+
+`SQLUserStore` implements the queries. A plugin provides the connections by
+implementing `_execute_query()`, `_execute_update()` and `_transaction()`.
+Queries are written using `?` placeholders.
+
+The `Version` column of users is incremented by every modification of the user
+or its repositories. It's used to invalidate the users kept in sessions, even
+when modified by another process.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from builtins import object
+from builtins import str
+import logging
+
+from rdiffweb.core import InvalidUserError, RdiffError
+from rdiffweb.i18n import ugettext as _
+from rdiffweb.rdw_password import CredentialCache, check_password, hash_password, needs_rehash
+from rdiffweb.user import SESSION_EXCLUDED_ATTRS
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+
+class SQLUserStore(object):
+    """
+    Mixin implementing `IPasswordStore` and `IDatabase` with SQL queries.
+    """
+
+    # Function returning the position of a substring.
+    _instr = 'instr'
+
+    # Value of LIMIT to return every rows.
+    _no_limit = '-1'
+
+    # Condition selecting the administrators.
+    _admin_filter = "IsAdmin = 1"
+
+    def _bool(self, val):
+        return str(val).lower() in ['true', '1']
+
+    def _setup_passwords(self):
+        """
+        Read the configuration of password hashing.
+        """
+        # Cost of password hashing.
+        self._iterations = self.app.cfg.get_config_int("PasswordIterations", "100000")
+        # Credentials recently verified.
+        self._credentials = CredentialCache(
+            size=self.app.cfg.get_config_int("PasswordCacheSize", "1000"),
+            ttl=self.app.cfg.get_config_int("PasswordCacheTTL", "300"))
+
+    def _add_default_admin(self):
+        """
+        Create the default administrator in a new database.
+        """
+        self.add_user('admin')
+        self.set_password('admin', 'admin123', old_password=None)
+        self.set_user_root('admin', '/backups/')
+        self.set_is_admin('admin', True)
+
+    def _execute_query(self, query, args=()):
+        """
+        Execute the given query and return every rows.
+        """
+        raise NotImplementedError()
+
+    def _execute_update(self, query, args=()):
+        """
+        Execute the given statement and return the number of rows modified.
+        """
+        raise NotImplementedError()
+
+    def _transaction(self):
+        """
+        Return a context manager providing a cursor to execute multiple
+        statements in a single transaction.
+        """
+        raise NotImplementedError()
+
+    def exists(self, username):
+        """
+        Check if `username` exists.
+        """
+        assert isinstance(username, str)
+        results = self._execute_query(
+            "SELECT Username FROM users WHERE Username = ?", (username,))
+        return len(results) == 1
+
+    def are_valid_credentials(self, username, password):
+        """
+        Check if the given `username` and `password` are valid.
+        """
+        assert isinstance(username, str)
+        assert isinstance(password, str)
+        logger.info("validating user [%s] credentials", username)
+        results = self._execute_query(
+            "SELECT Password, Username FROM users WHERE Username = ?",
+            (username,))
+        if not len(results):
+            return None
+        hashed, real_username = results[0]
+        if self._credentials.check(real_username, password, hashed):
+            return real_username
+        if not check_password(password, hashed):
+            return False
+        if needs_rehash(hashed, self._iterations):
+            logger.info("updating password hash of user [%s]", real_username)
+            hashed = hash_password(password, self._iterations)
+            self._set_user_field(real_username, 'Password', hashed)
+        self._credentials.add(real_username, password, hashed)
+        return real_username
+
+    def get_repos(self, username):
+        """
+        Get list of repos for the given `username`.
+        """
+        assert isinstance(username, str)
+        query = ("SELECT repos.RepoPath FROM users "
+                 "LEFT JOIN repos ON repos.UserID = users.UserID "
+                 "WHERE users.Username = ? ORDER BY repos.RepoID")
+        results = self._execute_query(query, (username,))
+        if not results:
+            raise InvalidUserError(username)
+        return [row[0] for row in results if row[0] is not None]
+
+    def get_user(self, username):
+        """
+        Return the record of the given `username` as a dictionary with keys
+        `email`, `user_root`, `is_admin`, `repos` and `repo_attrs`, the
+        attributes of each repository. Everything is read using a single
+        query.
+        """
+        assert isinstance(username, str)
+        records = self._get_user_records("WHERE Username = ?", (username,))
+        if not records:
+            raise InvalidUserError(username)
+        return records[0][1]
+
+    def get_user_version(self, username):
+        """
+        Return a value changing every time the given `username` is modified or
+        None if the user doesn't exists.
+        """
+        assert isinstance(username, str)
+        results = self._execute_query(
+            "SELECT UserID, Version FROM users WHERE Username = ?", (username,))
+        if not results:
+            return None
+        return tuple(results[0])
+
+    def get_users(self, search=None, admins=None, offset=0, limit=None):
+        """
+        Return a list of `(username, record)` ordered by username. See
+        `get_user()` for the content of the record. Users, their repositories
+        and the attributes are read using a single query.
+
+        `search` is used to filter users by username or email. If `admins` is
+        True, only the administrators are returned.
+        """
+        where, args = self._get_users_filter(search, admins)
+        where += " ORDER BY Username"
+        if limit is not None or offset:
+            where += " LIMIT %s OFFSET %d" % (
+                self._no_limit if limit is None else int(limit), int(offset))
+        return self._get_user_records(where, args)
+
+    def count_users(self, search=None, admins=None):
+        """
+        Return the number of users matching the given criteria. See
+        `get_users()`.
+        """
+        where, args = self._get_users_filter(search, admins)
+        return self._execute_query("SELECT COUNT(*) FROM users " + where, args)[0][0]
+
+    def _get_users_filter(self, search, admins):
+        conditions = []
+        args = ()
+        if search:
+            conditions.append("(%s(Username, ?) > 0 OR %s(UserEmail, ?) > 0)" % (self._instr, self._instr))
+            args += (search, search)
+        if admins:
+            conditions.append(self._admin_filter)
+        if not conditions:
+            return "", args
+        return "WHERE " + " AND ".join(conditions), args
+
+    def _get_user_records(self, where, args, attrs=True):
+        """
+        Return a list of `(username, record)` for the users selected by the
+        given `where` clause. If `attrs` is True, the attributes of the
+        repositories are read too.
+        """
+        query = ("SELECT users.Username, users.UserEmail, users.UserRoot, users.IsAdmin, "
+                 "repos.RepoPath, repos.MaxAge, %s "
+                 "FROM (SELECT * FROM users %s) AS users "
+                 "LEFT JOIN repos ON repos.UserID = users.UserID %s"
+                 "ORDER BY users.Username, repos.RepoID" %
+                 ("repo_attrs.Name, repo_attrs.Value" if attrs else "NULL, NULL",
+                  where,
+                  "LEFT JOIN repo_attrs ON repo_attrs.RepoID = repos.RepoID " if attrs else ""))
+        records = []
+        current = None
+        for row in self._execute_query(query, args):
+            if current is None or current[0] != row[0]:
+                current = (row[0], {
+                    'email': row[1],
+                    'user_root': row[2],
+                    'is_admin': self._bool(row[3]),
+                    'repos': [],
+                })
+                if attrs:
+                    current[1]['repo_attrs'] = {}
+                records.append(current)
+            repo_path, maxage, name, value = row[4:8]
+            if repo_path is None:
+                continue
+            if not attrs:
+                current[1]['repos'].append(repo_path)
+                continue
+            repo_attrs = current[1]['repo_attrs'].get(repo_path)
+            if repo_attrs is None:
+                current[1]['repos'].append(repo_path)
+                repo_attrs = current[1]['repo_attrs'][repo_path] = {'maxage': maxage}
+            if name is not None:
+                repo_attrs[name] = value
+        return records
+
+    def get_repo_attr(self, username, repo_path, key, default=None):
+        """
+        Get repository attribute.
+        """
+        assert isinstance(username, str)
+        assert isinstance(repo_path, str)
+        query = ("SELECT repo_attrs.Value FROM repo_attrs "
+                 "JOIN repos ON repo_attrs.RepoID = repos.RepoID "
+                 "JOIN users ON repos.UserID = users.UserID "
+                 "WHERE users.Username = ? AND repos.RepoPath = ? AND repo_attrs.Name = ?")
+        results = self._execute_query(query, (username, repo_path, key))
+        if len(results) == 0 or not results[0][0]:
+            return default
+        return results[0][0]
+
+    def get_repo_maxage(self, username, repoPath):
+        assert isinstance(username, str)
+        query = ("SELECT repos.MaxAge FROM repos JOIN users ON repos.UserID = users.UserID "
+                 "WHERE users.Username = ? AND repos.RepoPath = ?")
+        results = self._execute_query(query, (username, repoPath))
+        assert len(results) == 1
+        return int(results[0][0])
+
+    def get_sessions(self, username, repo_paths=None, start=None, end=None):
+        """
+        Return the backup sessions of the given repositories, ordered by date.
+        Each session is a tuple (repo_path, date, tz_offset, size,
+        increment_size, errors, error_count, error_classes). `start` and `end`
+        are inclusive, in seconds since epoch.
+        """
+        assert isinstance(username, str)
+        query = ("SELECT repos.RepoPath, sessions.Date, sessions.TzOffset, "
+                 "sessions.Size, sessions.IncrementSize, sessions.Errors, "
+                 "sessions.ErrorCount, sessions.ErrorClasses "
+                 "FROM sessions JOIN repos ON sessions.RepoID = repos.RepoID "
+                 "JOIN users ON repos.UserID = users.UserID "
+                 "WHERE users.Username = ?")
+        args = [username]
+        if repo_paths is not None:
+            if not repo_paths:
+                return []
+            query += " AND repos.RepoPath IN (%s)" % ", ".join("?" * len(repo_paths))
+            args.extend(repo_paths)
+        if start is not None:
+            query += " AND sessions.Date >= ?"
+            args.append(start)
+        if end is not None:
+            query += " AND sessions.Date <= ?"
+            args.append(end)
+        query += " ORDER BY sessions.Date"
+        return self._execute_query(query, args)
+
+    def get_last_session_date(self, username, repo_path):
+        """
+        Return the date of the most recent session recorded for the given
+        repository or None.
+        """
+        assert isinstance(username, str)
+        query = ("SELECT MAX(sessions.Date) FROM sessions JOIN repos ON sessions.RepoID = repos.RepoID "
+                 "JOIN users ON repos.UserID = users.UserID "
+                 "WHERE users.Username = ? AND repos.RepoPath = ?")
+        results = self._execute_query(query, (username, repo_path))
+        return results[0][0] if results else None
+
+    def add_sessions(self, username, repo_path, sessions):
+        """
+        Record new backup sessions for the given repository. `sessions` is a
+        list of tuple (date, tz_offset, size, increment_size, errors,
+        error_count, error_classes).
+        """
+        assert isinstance(username, str)
+        query = ("INSERT INTO sessions (RepoID, Date, TzOffset, Size, IncrementSize, Errors, ErrorCount, ErrorClasses) "
+                 "values (?, ?, ?, ?, ?, ?, ?, ?)")
+        with self._transaction() as cursor:
+            repo_id = self._get_repo_id(cursor, username, repo_path)
+            cursor.executemany(query, [[repo_id] + list(row) for row in sessions])
+
+    def delete_sessions(self, username, repo_path, before):
+        """
+        Delete sessions of the given repository older than `before`.
+        """
+        assert isinstance(username, str)
+        query = ("DELETE FROM sessions WHERE Date < ? AND RepoID IN "
+                 "(SELECT repos.RepoID FROM repos JOIN users ON repos.UserID = users.UserID "
+                 "WHERE users.Username = ? AND repos.RepoPath = ?)")
+        self._execute_update(query, (before, username, repo_path))
+
+    def get_email(self, username):
+        assert isinstance(username, str)
+        return self._get_user_field(username, "UserEmail")
+
+    def get_user_root(self, username):
+        """Get user root directory."""
+        assert isinstance(username, str)
+        return self._get_user_field(username, "UserRoot")
+
+    def has_password(self, username):
+        """Check if the given user has a password in database."""
+        try:
+            return bool(self._get_user_field(username, "Password"))
+        except InvalidUserError:
+            return False
+
+    def is_admin(self, username):
+        assert isinstance(username, str)
+        return self._bool(self._get_user_field(username, "IsAdmin"))
+
+    def list(self):
+        """
+        Return a list of username.
+        """
+        return [row[0] for row in self._execute_query("SELECT Username FROM users")]
+
+    def add_user(self, username):
+        """
+        Add a new username to this userdb.
+        """
+        assert isinstance(username, str)
+        logger.info("adding new user [%s]", username)
+        self._execute_update("INSERT INTO users (Username) values (?)", (username,))
+
+    def delete_user(self, username):
+        """
+        Delete the given `username`.
+        """
+        assert isinstance(username, str)
+        with self._transaction() as cursor:
+            # Check if user exists
+            cursor.execute("SELECT UserID FROM users WHERE Username = ?", (username,))
+            results = cursor.fetchall()
+            if not results:
+                return False
+            user_id = results[0][0]
+            # Delete user
+            logger.info("deleting user [%s]", username)
+            for table in ['sessions', 'repo_attrs']:
+                cursor.execute(
+                    "DELETE FROM %s WHERE RepoID IN (SELECT RepoID FROM repos WHERE UserID = ?)" % table,
+                    (user_id,))
+            cursor.execute("DELETE FROM repos WHERE UserID = ?", (user_id,))
+            cursor.execute("DELETE FROM users WHERE UserID = ?", (user_id,))
+        return True
+
+    def set_is_admin(self, username, is_admin):
+        assert isinstance(username, str)
+        self._set_user_field(username, 'IsAdmin', 1 if is_admin else 0)
+
+    def set_email(self, username, email):
+        assert isinstance(username, str)
+        assert isinstance(email, str)
+        self._set_user_field(username, 'UserEmail', email)
+
+    def set_repos(self, username, repoPaths):
+        assert isinstance(username, str)
+        with self._transaction() as cursor:
+            cursor.execute(
+                "SELECT users.UserID, repos.RepoPath FROM users "
+                "LEFT JOIN repos ON repos.UserID = users.UserID "
+                "WHERE users.Username = ?", (username,))
+            results = cursor.fetchall()
+            if not results:
+                raise InvalidUserError(username)
+            user_id = results[0][0]
+
+            # We don't want to just delete and recreate the repos, since that
+            # would lose notification information.
+            existing = [row[1] for row in results if row[1] is not None]
+            for repo in [x for x in existing if x not in repoPaths]:
+                for table in ['sessions', 'repo_attrs']:
+                    cursor.execute(
+                        "DELETE FROM %s WHERE RepoID IN (SELECT RepoID FROM repos WHERE UserID = ? AND RepoPath = ?)" % table,
+                        (user_id, repo))
+                cursor.execute("DELETE FROM repos WHERE UserID = ? AND RepoPath = ?", (user_id, repo))
+            cursor.executemany(
+                "INSERT INTO repos (UserID, RepoPath) values (?, ?)",
+                [(user_id, repo) for repo in repoPaths if repo not in existing])
+            cursor.execute("UPDATE users SET Version = Version + 1 WHERE UserID = ?", (user_id,))
+
+    def set_password(self, username, password, old_password=None):
+        assert isinstance(username, str)
+        assert old_password is None or isinstance(old_password, str)
+        assert isinstance(password, str)
+        if not password:
+            raise RdiffError(_("Password can't be empty."))
+
+        # Check old password value.
+        if old_password and not self.are_valid_credentials(username, old_password):
+            raise RdiffError(_("Wrong password."))
+
+        # Update password.
+        self._set_user_field(username, 'Password', hash_password(password, self._iterations))
+
+    def set_repo_attr(self, username, repo_path, key, value):
+        assert repo_path
+        assert isinstance(key, str) and key.isalpha() and key.islower()
+        with self._transaction() as cursor:
+            repo_id = self._get_repo_id(cursor, username, repo_path)
+            cursor.execute("DELETE FROM repo_attrs WHERE RepoID = ? AND Name = ?", (repo_id, key))
+            cursor.execute(
+                "INSERT INTO repo_attrs (RepoID, Name, Value) values (?, ?, ?)",
+                (repo_id, key, None if value is None else str(value)))
+            if key not in SESSION_EXCLUDED_ATTRS:
+                self._update_version(cursor, username)
+
+    def set_repo_maxage(self, username, repoPath, maxAge):
+        assert isinstance(username, str)
+        query = ("UPDATE repos SET MaxAge = ? WHERE RepoPath = ? AND UserID = "
+                 "(SELECT UserID FROM users WHERE Username = ?)")
+        with self._transaction() as cursor:
+            cursor.execute(query, (maxAge, repoPath, username))
+            assert cursor.rowcount == 1
+            self._update_version(cursor, username)
+
+    def set_user_root(self, username, user_root):
+        assert isinstance(username, str)
+        assert isinstance(user_root, str)
+        self._set_user_field(username, 'UserRoot', user_root)
+
+    def _get_repo_id(self, cursor, username, repo_path):
+        cursor.execute(
+            "SELECT repos.RepoID FROM repos JOIN users ON repos.UserID = users.UserID "
+            "WHERE users.Username = ? AND repos.RepoPath = ?",
+            (username, repo_path))
+        results = cursor.fetchall()
+        assert len(results) == 1
+        return results[0][0]
+
+    def _update_version(self, cursor, username):
+        cursor.execute("UPDATE users SET Version = Version + 1 WHERE Username = ?", (username,))
+
+    def _get_user_field(self, username, fieldName):
+        query = "SELECT " + fieldName + " FROM users WHERE Username = ?"
+        results = self._execute_query(query, (username,))
+        if not results:
+            raise InvalidUserError(username)
+        return results[0][0]
+
+    def _set_user_field(self, username, fieldName, value):
+        assert isinstance(username, str)
+        assert isinstance(fieldName, str)
+        assert isinstance(value, str) or isinstance(value, int)
+        query = 'UPDATE users SET ' + fieldName + ' = ?, Version = Version + 1 WHERE Username = ?'
+        if not self._execute_update(query, (value, username)):
+            raise InvalidUserError(username)
+
+    def supports(self, operation):
+        return hasattr(self, operation)
@@ -0,0 +1,330 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Repository summary service.
+
+Computing the state of a repository (last backup date, backup in progress)
+requires listing and reading files from `rdiff-backup-data`. On slow
+filesystems, doing this serially for every repository of a user takes too
+long. This module computes the summaries in a pool of threads, keeps them in
+memory and only reads them again from disk when the `rdiff-backup-data`
+directory is modified.
+
+When the repository scanner plugin is enabled, the summaries are computed
+periodically in background and stored in database. In such case, the summaries
+missing from memory are read from database instead of the filesystem, unless
+the repository was modified since.
+"""
+
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from builtins import object
+from future.utils.surrogateescape import encodefilename
+import json
+import logging
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+import os
+import threading
+import time
+
+import cherrypy
+
+from rdiffweb import librdiff
+from rdiffweb.core import Component
+from rdiffweb.rdw_helpers import rdwTime
+
+
+# Define the logger
+logger = logging.getLogger(__name__)
+
+# List of session statistics kept in extended summary.
+SESSION_FIELDS = ['starttime', 'endtime', 'elapsedtime', 'sourcefiles',
+                  'sourcefilesize', 'newfiles', 'newfilesize', 'deletedfiles',
+                  'deletedfilesize', 'changedfiles', 'incrementfilesize',
+                  'totaldestinationsizechange', 'errors']
+
+
+class RepoSummary(object):
+    """
+    Represent the state of a single repository at a given time.
+    """
+
+    def __init__(self, path, name, last_backup_date=None, in_progress=False,
+                 failed=False, pending=False, data_path=None, mtime=None,
+                 backup_count=None, error_count=None, source_size=None,
+                 last_session=None, scanned=None):
+        self.path = path
+        self.name = name
+        self.last_backup_date = last_backup_date
+        self.in_progress = in_progress
+        self.failed = failed
+        # True when the summary is not yet available.
+        self.pending = pending
+        # Used to detect modification of the repository.
+        self.data_path = data_path
+        self.mtime = mtime
+        # Extended summary, only computed by the repository scanner.
+        self.backup_count = backup_count
+        # Number of errors of every sessions.
+        self.error_count = error_count
+        # Size of the source files of the last session.
+        self.source_size = source_size
+        self.last_session = last_session
+        self.scanned = scanned
+        # Time when the summary was validated against the filesystem.
+        self.checked = time.time()
+
+    def is_modified(self):
+        """
+        Check if the repository was modified since this summary was computed.
+        """
+        # A backup in progress may die without touching the data directory.
+        if self.failed or self.in_progress or not self.data_path:
+            return True
+        try:
+            return os.stat(self.data_path).st_mtime != self.mtime
+        except OSError:
+            return True
+
+
+def _placeholder(user_root, repo, failed=False, pending=False):
+    """
+    Create a summary to represent a repository we can't read.
+    """
+    path = encodefilename(repo).strip(b"/")
+    name = repo.strip("/") or os.path.basename(user_root.rstrip("/"))
+    return RepoSummary(path, name, failed=failed, pending=pending)
+
+
+def compute_summary(user_root, repo, extended=False):
+    """
+    Read the repository from disk and return a new summary.
+
+    If `extended` is True, the summary also include the number of backups,
+    the number of errors, the statistics of the last session and the size of
+    the source files.
+    """
+    try:
+        repo_obj = librdiff.RdiffRepo(user_root, repo)
+        # Read the modification time first to detect any modification made
+        # while the summary get computed.
+        mtime = os.stat(repo_obj.data_path).st_mtime
+        summary = RepoSummary(
+            path=repo_obj.path,
+            name=repo_obj.display_name,
+            last_backup_date=repo_obj.last_backup_date,
+            in_progress=repo_obj.in_progress,
+            data_path=repo_obj.data_path,
+            mtime=mtime)
+        if extended:
+            summary.backup_count = len(repo_obj.backup_dates)
+            sessions = list(repo_obj.session_statistics.values())
+            if sessions:
+                summary.last_session = dict(
+                    (k, getattr(sessions[-1], k)) for k in SESSION_FIELDS)
+                summary.error_count = sum(s.errors or 0 for s in sessions)
+                summary.source_size = summary.last_session['sourcefilesize']
+            summary.scanned = time.time()
+        return summary
+    except librdiff.FileError:
+        logger.exception("invalid user path %s", repo)
+    except Exception:
+        logger.exception("fail to compute summary of %s", repo)
+    return _placeholder(user_root, repo, failed=True)
+
+
+def dumps(summary):
+    """
+    Serialize the given summary to be stored in database.
+    """
+    last_backup_date = summary.last_backup_date
+    if last_backup_date is not None:
+        last_backup_date = [last_backup_date.timeInSeconds,
+                            last_backup_date.tzOffset]
+    return json.dumps({
+        'name': summary.name,
+        'last_backup_date': last_backup_date,
+        'in_progress': summary.in_progress,
+        'failed': summary.failed,
+        'mtime': summary.mtime,
+        'backup_count': summary.backup_count,
+        'error_count': summary.error_count,
+        'source_size': summary.source_size,
+        'last_session': summary.last_session,
+        'scanned': summary.scanned,
+    }, sort_keys=True)
+
+
+def loads(user_root, repo, data):
+    """
+    Create a summary from data stored in database. Return None if the data is
+    missing or invalid.
+    """
+    if not data:
+        return None
+    try:
+        data = json.loads(data)
+        summary = _placeholder(user_root, repo)
+        summary.name = data['name']
+        if data['last_backup_date'] is not None:
+            summary.last_backup_date = rdwTime(*data['last_backup_date'])
+        summary.data_path = os.path.join(
+            encodefilename(user_root).rstrip(b"/"), summary.path,
+            librdiff.RDIFF_BACKUP_DATA)
+        for key in ['in_progress', 'failed', 'mtime', 'backup_count',
+                    'error_count', 'source_size', 'last_session', 'scanned']:
+            setattr(summary, key, data[key])
+        return summary
+    except (ValueError, KeyError, TypeError):
+        logger.warning("invalid summary stored for %s", repo)
+        return None
+
+
+class RepoSummaryManager(Component):
+    """
+    Keep the summary of repositories in memory and refresh them in background
+    when they are getting old.
+    """
+
+    def __init__(self, app):
+        Component.__init__(self, app)
+        self._lock = threading.RLock()
+        self._cache = {}
+        self._pending = {}
+        self._pool = None
+        cherrypy.engine.subscribe('stop', self.close)
+
+    @property
+    def _max_age(self):
+        """Number of seconds a summary is used without checking the disk."""
+        return self.app.cfg.get_config_int("RepoSummaryMaxAge", "5")
+
+    @property
+    def _threads(self):
+        return max(1, self.app.cfg.get_config_int("RepoSummaryThreads", "8"))
+
+    @property
+    def _timeout(self):
+        """Number of seconds to wait for a summary before giving up."""
+        return self.app.cfg.get_config_int("RepoSummaryTimeout", "5")
+
+    def close(self):
+        """
+        Stop the worker threads. Called when cherrypy engine stop.
+        """
+        with self._lock:
+            pool = self._pool
+            self._pool = None
+            self._pending.clear()
+        if pool:
+            pool.terminate()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPool(self._threads)
+            return self._pool
+
+    def _refresh(self, key, entry):
+        """
+        Executed by the worker threads to validate or recompute a summary.
+        """
+        user_root, repo = key
+        if entry is None or entry.is_modified():
+            entry = compute_summary(user_root, repo)
+        else:
+            entry.checked = time.time()
+        with self._lock:
+            self._cache[key] = entry
+            self._pending.pop(key, None)
+        return entry
+
+    def _submit(self, key, entry=None):
+        """
+        Schedule a refresh of the given summary unless one is already
+        running. Return the asynchronous result.
+        """
+        with self._lock:
+            if key not in self._pending:
+                self._pending[key] = self._get_pool().apply_async(
+                    self._refresh, (key, entry))
+            return self._pending[key]
+
+    def _load(self, user_root, repo_obj):
+        """
+        Return the summary stored in database by the repository scanner or
+        None if not available.
+        """
+        return loads(user_root, repo_obj.name, repo_obj.get_attr('summary'))
+
+    def get_summaries(self, user, block=False, repos=None):
+        """
+        Return a list of `RepoSummary` for the repositories of the given user.
+        If provided, `repos` is the list of `RepoObject` to be summarized.
+
+        Summaries available in memory are returned immediately, even if
+        getting old, in which case a refresh is scheduled in background. Other
+        summaries are read from database if the repository was not modified
+        since stored, or computed in parallel. If it takes more than the
+        configured timeout, the outdated summary stored in database or a
+        pending summary is returned instead, unless `block` is True.
+        """
+        user_root = user.user_root
+        now = time.time()
+        max_age = self._max_age
+        summaries = []
+        waiting = []
+        if repos is None:
+            repos = user.repo_list
+        for repo_obj in repos:
+            key = (user_root, repo_obj.name)
+            entry = self._cache.get(key)
+            if entry is None:
+                stored = self._load(user_root, repo_obj)
+                if stored and not stored.is_modified():
+                    with self._lock:
+                        self._cache[key] = stored
+                    summaries.append(stored)
+                    continue
+                waiting.append((len(summaries), key, self._submit(key), stored))
+            elif now - entry.checked > max_age:
+                self._submit(key, entry)
+            summaries.append(entry)
+
+        # Wait for new summaries.
+        deadline = now + self._timeout
+        for idx, key, result, stored in waiting:
+            if block:
+                summaries[idx] = result.get()
+                continue
+            try:
+                summaries[idx] = result.get(max(0, deadline - time.time()))
+            except TimeoutError:
+                logger.warning("timeout computing summary of %s", key[1])
+                summaries[idx] = stored or _placeholder(*key, pending=True)
+        return summaries
+
+    def invalidate(self, user_root, repo):
+        """
+        Remove the summary from memory. Should be called when a repository is
+        modified by rdiffweb.
+        """
+        with self._lock:
+            self._cache.pop((user_root, repo), None)
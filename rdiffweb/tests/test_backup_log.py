@@ -0,0 +1,100 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module to test `backup_log` module.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import time
+import unittest
+
+from rdiffweb.rdw_helpers import rdwTime
+from rdiffweb.test import AppTestCase
+
+
+class BackupLogManagerTest(AppTestCase):
+
+    USERNAME = 'admin'
+
+    PASSWORD = 'admin123'
+
+    reset_testcases = True
+
+    def setUp(self):
+        AppTestCase.setUp(self)
+        self.backup_log = self.app.backup_log
+        self.user = self.app.userdb.get_user(self.USERNAME)
+        self.repo_obj = self.user.get_repo(self.REPO)
+
+    def test_supports(self):
+        self.assertTrue(self.backup_log.supports(self.user))
+
+    def test_get_sessions(self):
+        sessions = self.backup_log.get_sessions(self.user)
+        self.assertEqual(22, len(sessions))
+        self.assertEqual(b'testcases', sessions[-1]['repo_path'])
+        self.assertEqual('testcases', sessions[-1]['repo_name'])
+        self.assertEqual(rdwTime(1454448640), sessions[-1]['date'])
+        # Sessions are recorded in database.
+        self.assertEqual(rdwTime(1454448640).getSeconds(), self.repo_obj.last_session_date)
+
+    def test_get_sessions_with_range(self):
+        sessions = self.backup_log.get_sessions(
+            self.user, start=rdwTime(1415221470), end=rdwTime(1415221507))
+        self.assertEqual(
+            [rdwTime(1415221470), rdwTime(1415221495), rdwTime(1415221507)],
+            [s['date'] for s in sessions])
+
+    def test_get_sessions_with_repos(self):
+        self.assertEqual(22, len(self.backup_log.get_sessions(self.user, repos=['testcases/'])))
+        self.assertEqual([], self.backup_log.get_sessions(self.user, repos=[]))
+
+    def test_get_sessions_with_errors(self):
+        """Check if error logs are summarized."""
+        filename = os.path.join(
+            self.app.testcases, self.REPO, 'rdiff-backup-data',
+            'error_log.2016-02-02T16:30:40-05:00.data')
+        with open(filename, 'w') as f:
+            for i in range(100):
+                f.write("ListError home/user/file%s [Errno 13] Permission denied\n" % i)
+            f.write("UpdateError home/user/data.db Updated mirror temp file does not match source\n")
+        session = self.backup_log.get_sessions(self.user)[-1]
+        self.assertEqual(101, session['error_count'])
+        self.assertEqual(['ListError', 'UpdateError'], session['error_classes'])
+        self.assertEqual(20, len(session['errors'].splitlines()))
+
+    def test_update_incremental(self):
+        """Check if only new sessions are recorded."""
+        self.backup_log.get_sessions(self.user)
+        # Remove the last session from database.
+        last = self.repo_obj.last_session_date
+        self.app.userdb._databases[0]._execute_query(
+            "DELETE FROM sessions WHERE Date = ?", (last,))
+        # Nothing change until the repository get modified.
+        self.assertEqual(21, len(self.backup_log.get_sessions(self.user)))
+        self.app.summaries.invalidate(self.app.testcases, self.REPO)
+        data_path = os.path.join(self.app.testcases, self.REPO, 'rdiff-backup-data')
+        os.utime(data_path, (time.time() + 10, time.time() + 10))
+        self.assertEqual(22, len(self.backup_log.get_sessions(self.user)))
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
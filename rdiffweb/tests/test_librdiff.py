@@ -19,11 +19,13 @@ from __future__ import unicode_literals
 
 from builtins import bytes
 
+from mock import patch
 import pkg_resources
 import unittest
 
 from rdiffweb.librdiff import RdiffPath, FileStatisticsEntry, RdiffRepo, \
-    DirEntry, IncrementEntry, SessionStatisticsEntry
+    DirEntry, IncrementEntry, SessionStatisticsEntry, ErrorLogEntry, \
+    SessionStatistics, load_session_statistics, HistoryEntry
 import os
 from rdiffweb.rdw_helpers import rdwTime
 import encodings
@@ -162,6 +164,28 @@ class DirEntryTest(unittest.TestCase):
         self.assertEqual(0, entry.file_size)
 
 
+class ErrorLogEntryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = MockRdiffRepo()
+        self.root_path = self.repo.root_path
+        self.entry = ErrorLogEntry(self.root_path, b'error_log.2014-11-05T16:05:07-05:00.data.gz')
+
+    def test_head(self):
+        head = self.entry.head(max_lines=2)
+        self.assertEqual(
+            "ListError home/user/private/file0 [Errno 13] Permission denied: 'home/user/private/file0'\n"
+            "ListError home/user/private/file1 [Errno 13] Permission denied: 'home/user/private/file1'",
+            head)
+
+    def test_summary(self):
+        summary = self.entry.summary(max_lines=5)
+        self.assertEqual(32, summary.lines)
+        self.assertEqual(5, len(summary.head))
+        self.assertTrue(summary.truncated)
+        self.assertEqual(['ListError', 'SpecialFileError', 'UpdateError'], summary.classes)
+
+
 class FileStatisticsEntryTest(unittest.TestCase):
     """
     Test the file statistics entry.
@@ -202,6 +226,72 @@ class RdiffRepoTest(unittest.TestCase):
         self.assertEqual(b'Char ;090 to quote', self.repo.unquote(b'Char ;059090 to quote'))
 
 
+class HistoryEntriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = MockRdiffRepo()
+        backup_dates = [
+            1414871387, 1414871426, 1414871448, 1414871475, 1414871489, 1414873822,
+            1414873850, 1414879639, 1414887165, 1414887491, 1414889478, 1414937803,
+            1414939853, 1414967021, 1415047607, 1415059497, 1415221262, 1415221470,
+            1415221495, 1415221507]
+        self.repo._backup_dates = [rdwTime(x) for x in backup_dates]
+
+    def _dates(self, **kwargs):
+        return [e.date.getSeconds() for e in self.repo.get_history_entries(**kwargs)]
+
+    def test_get_history_entries(self):
+        self.assertEqual(20, len(self._dates()))
+        self.assertEqual(1414871387, self._dates()[0])
+        self.assertEqual(1415221507, self._dates(reverse=True)[0])
+
+    def test_get_history_entries_with_limit(self):
+        self.assertEqual([1414871387, 1414871426], self._dates(numLatestEntries=2))
+        self.assertEqual([1415221507, 1415221495], self._dates(numLatestEntries=2, reverse=True))
+        self.assertEqual(20, len(self._dates(numLatestEntries=50)))
+
+    def test_get_history_entries_with_range(self):
+        # Bounds are inclusive.
+        self.assertEqual(
+            [1415047607, 1415059497, 1415221262],
+            self._dates(earliestDate=rdwTime(1415047607), latestDate=rdwTime(1415221262)))
+        self.assertEqual(
+            [1415059497, 1415221262],
+            self._dates(earliestDate=rdwTime(1415047608), latestDate=rdwTime(1415221263)))
+        self.assertEqual(
+            [1415221262, 1415059497],
+            self._dates(earliestDate=rdwTime(1415047607), latestDate=rdwTime(1415221262),
+                        numLatestEntries=2, reverse=True))
+        self.assertEqual([], self._dates(earliestDate=rdwTime(1415221508)))
+        self.assertEqual([], self._dates(latestDate=rdwTime(1414871386)))
+
+    def test_get_history_entries_with_timezone(self):
+        """Check if dates are compared in UTC."""
+        self.assertEqual(
+            [1414871387],
+            self._dates(earliestDate=rdwTime(1414871387 - 3600, -3600),
+                        latestDate=rdwTime(1414871387 - 3600, -3600)))
+
+    def test_get_history_entries_paging(self):
+        """Check if paging through 20000 sessions creates each entry once."""
+        count = 20000
+        self.repo._backup_dates = [rdwTime(1400000000 + i * 3600) for i in range(count)]
+        with patch('rdiffweb.librdiff.HistoryEntry', wraps=HistoryEntry) as history_entry:
+            # Load every pages of 100 entries, from newest to oldest.
+            pages = 0
+            before = None
+            while True:
+                entries = self.repo.get_history_entries(
+                    numLatestEntries=100, latestDate=before, reverse=True)
+                if not entries:
+                    break
+                pages += 1
+                before = rdwTime(entries[-1].date.getSeconds() - 1)
+        self.assertEqual(count // 100, pages)
+        # Only the entries of each page are created.
+        self.assertEqual(count, history_entry.call_count)
+
+
 class SessionStatisticsEntryTest(unittest.TestCase):
 
     def setUp(self):
@@ -232,6 +322,52 @@ class SessionStatisticsEntryTest(unittest.TestCase):
         self.assertEqual(3636731, entry.totaldestinationsizechange)
         self.assertEqual(0, entry.errors)
 
+    def test_getattr_invalid(self):
+        entry = SessionStatisticsEntry(self.root_path, b'session_statistics.2014-11-02T09:16:43-05:00.data')
+        self.assertRaises(AttributeError, getattr, entry, 'invalid')
+
+    def test_stats(self):
+        """Check if the file is read only once."""
+        entry = SessionStatisticsEntry(self.root_path, b'session_statistics.2014-11-02T09:16:43-05:00.data')
+        stats = entry.stats
+        self.assertIs(stats, entry.stats)
+        self.assertEqual(3666973, stats.sourcefilesize)
+        self.assertRaises(AttributeError, setattr, stats, 'sourcefilesize', 0)
+
+    def test_parse_with_missing_keys(self):
+        stats = SessionStatistics.parse("# comment\nStartTime 1414937803.00 (Sun Nov  2 09:16:43 2014)\nSourceFiles 14\nUnknown 3\n")
+        self.assertEqual(1414937803.00, stats.starttime)
+        self.assertEqual(14, stats.sourcefiles)
+        self.assertEqual(0, stats.sourcefilesize)
+        self.assertEqual(0, stats.errors)
+
+    def test_parse_invalid_value(self):
+        stats = SessionStatistics.parse("SourceFiles abc\nErrors 2\n")
+        self.assertEqual(0, stats.sourcefiles)
+        self.assertEqual(2, stats.errors)
+
+    def test_load_session_statistics(self):
+        names = [b'session_statistics.2014-11-02T09:16:43-05:00.data', b'session_statistics.2014-11-02T09:16:44-05:00.data']
+        entries = [SessionStatisticsEntry(self.root_path, n) for n in names * 5]
+        records = load_session_statistics(entries, threads=4)
+        self.assertEqual(10, len(records))
+        self.assertEqual(3666973, records[0].sourcefilesize)
+        # Missing file
+        self.assertIsNone(records[1])
+
+    def test_load_session_statistics_many(self):
+        """Check if each session statistics file is parsed once."""
+        name = b'session_statistics.2014-11-02T09:16:43-05:00.data'
+        count = 2000
+        entries = [SessionStatisticsEntry(self.root_path, name) for unused in range(count)]
+        with patch.object(SessionStatistics, 'parse', wraps=SessionStatistics.parse) as parse:
+            records = load_session_statistics(entries, threads=4)
+            # Parsed values are kept by the entries.
+            load_session_statistics(entries, threads=4)
+        self.assertEqual(count, len(records))
+        self.assertEqual(count, parse.call_count)
+        self.assertTrue(all(r.sourcefilesize == 3666973 for r in records))
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
@@ -74,6 +74,13 @@ class AdminUsersAsAdminTest(AbstractAdminTest):
 
     login = True
 
+    def test_render_stats(self):
+        self.getPage("/prefs/")
+        self.getPage("/admin/")
+        self.assertStatus(200)
+        self.assertInBody('id="render-stats"')
+        self.assertInBody('prefs.html')
+
     def test_add_edit_delete(self):
         #  Add user to be listed
         self._add_user("test2", "test2@test.com", "test2", "/var/backups/", False)
@@ -198,6 +205,25 @@ class AdminUsersAsAdminTest(AbstractAdminTest):
         self.getPage("/admin/users/?usersearch=coucou")
         self.assertNotInBody("test1")
 
+    def test_users_pagination(self):
+        """
+        Check if users are listed by page.
+        """
+        for i in range(60):
+            self.app.userdb.add_user('user%02d' % i)
+        self.getPage("/admin/users/")
+        self.assertInBody("user00")
+        self.assertNotInBody("user59")
+        self.assertInBody("1 / 2")
+        self.getPage("/admin/users/?page=2")
+        self.assertNotInBody("user00")
+        self.assertInBody("user59")
+        self.getPage("/admin/users/?page=2&usersearch=user5")
+        self.assertInBody("user59")
+        self.assertNotInBody("1 / 2")
+        self.getPage("/admin/users/?page=invalid")
+        self.assertStatus(400)
+
 
 class AdminUsersAsUserTest(AbstractAdminTest):
     """Integration test for page_admin"""
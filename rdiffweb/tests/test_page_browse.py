@@ -223,6 +223,19 @@ class BrowsePageTest(WebCase):
         self.assertStatus('200 OK')
         self.assertInBody('Files')
 
+    def test_streaming(self):
+        """
+        Check if the page is sent by chunks.
+        """
+        self.app.templates.chunk_size = 100
+        self._browse(self.REPO, "")
+        self.assertStatus(200)
+        self.assertHeader('Transfer-Encoding', 'chunked')
+        self.assertNoHeader('Content-Length')
+        self.assertInBody("Fichier @ &lt;root&gt;")
+        self.assertInBody("</html>")
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     logging.basicConfig(level=logging.DEBUG)
@@ -0,0 +1,70 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module to test the error log page.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import os
+import unittest
+
+from rdiffweb.test import WebCase
+
+
+class ErrorLogPageTest(WebCase):
+
+    login = True
+
+    reset_app = True
+
+    reset_testcases = True
+
+    def _errorlog(self, repo, date):
+        self.getPage("/errorlog/" + repo + "/?date=" + date)
+
+    def test_errorlog(self):
+        # Write an error log.
+        filename = os.path.join(
+            self.app.testcases, self.REPO, 'rdiff-backup-data',
+            'error_log.2016-02-02T16:30:40-05:00.data')
+        with open(filename, 'w') as f:
+            f.write("ListError home/user/private [Errno 13] Permission denied\n")
+        self._errorlog(self.REPO, '1454448640')
+        self.assertStatus(200)
+        self.assertHeader('Content-Type', 'text/plain;charset=utf-8')
+        self.assertBody("ListError home/user/private [Errno 13] Permission denied\n")
+
+    def test_errorlog_invalid_date(self):
+        self._errorlog(self.REPO, 'invalid')
+        self.assertStatus(400)
+
+    def test_errorlog_not_found(self):
+        self._errorlog(self.REPO, '1454448641')
+        self.assertStatus(404)
+
+    def test_errorlog_invalid_repo(self):
+        self._errorlog('invalid', '1454448640')
+        self.assertStatus(404)
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    logging.basicConfig(level=logging.DEBUG)
+    unittest.main()
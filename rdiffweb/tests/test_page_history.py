@@ -38,10 +38,12 @@ class HistoryPageTest(WebCase):
 
     reset_testcases = True
 
-    def _history(self, repo, limit=None):
+    def _history(self, repo, limit=None, before=None):
         url = "/history/" + repo + "/"
         if limit:
             url += "?limit=%s" % limit
+        if before:
+            url += ("&" if limit else "?") + "before=%s" % before
         return self.getPage(url)
 
     def test_history(self):
@@ -58,6 +60,25 @@ class HistoryPageTest(WebCase):
         self._history(self.REPO, 50)
         self.assertNotInBody("Show more")
 
+    def test_history_with_cursor(self):
+        # Next page start before the last entry displayed.
+        self._history(self.REPO, 2)
+        self.assertInBody("2016-02-02 16:30:40")
+        self.assertInBody("2016-01-20 10:42:21")
+        self.assertInBody("?limit=2&amp;before=1453304541")
+        self._history(self.REPO, 2, 1453304541)
+        self.assertNotInBody("2016-02-02 16:30:40")
+        self.assertNotInBody("2016-01-20 10:42:21")
+        self.assertInBody("Show more")
+        # Last page.
+        self._history(self.REPO, 50, 1453304541)
+        self.assertInBody("2014-11-02 09:50:53")
+        self.assertNotInBody("Show more")
+
+    def test_history_with_invalid_cursor(self):
+        self._history(self.REPO, 10, "invalid")
+        self.assertStatus(400)
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     logging.basicConfig(level=logging.DEBUG)
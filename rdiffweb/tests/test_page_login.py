@@ -118,6 +118,56 @@ class LoginPageTest(WebCase):
         self.assertStatus('200 OK')
         self.assertInBody('Invalid username or password.')
 
+class LoginUserCacheTest(WebCase):
+
+    login = True
+
+    reset_app = True
+
+    def setUp(self):
+        WebCase.setUp(self)
+        # Count the users read from database.
+        self.calls = []
+        userdb = self.app.userdb
+        get_user = userdb.get_user
+        userdb.get_user = lambda username: self.calls.append(username) or get_user(username)
+
+    def tearDown(self):
+        del self.app.userdb.get_user
+        WebCase.tearDown(self)
+
+    def test_user_cached_in_session(self):
+        """
+        Check if the user is kept in session after the first request.
+        """
+        self.getPage('/prefs/')
+        self.assertStatus('200 OK')
+        self.getPage('/prefs/')
+        self.assertStatus('200 OK')
+        self.assertEqual(['admin'], self.calls)
+
+    def test_user_modified(self):
+        """
+        Check if the user is read again from database when modified.
+        """
+        self.getPage('/prefs/')
+        self.app.userdb.get_user('admin').email = 'admin@test.com'
+        self.calls = []
+        self.getPage('/prefs/')
+        self.assertEqual(['admin'], self.calls)
+        self.getPage('/prefs/')
+        self.assertEqual(['admin'], self.calls)
+
+    def test_user_deleted(self):
+        """
+        Check if deleted user are logout.
+        """
+        self.getPage('/prefs/')
+        self.app.userdb.delete_user('admin')
+        self.getPage('/prefs/')
+        self.assertStatus('403 Forbidden')
+
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     logging.basicConfig(level=logging.DEBUG)
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2015 Patrik Dufresne Service Logiciel
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Created on Oct 18, 2026
+
+Check how static files are served.
+"""
+
+from __future__ import unicode_literals
+
+import gzip
+import io
+import logging
+import re
+import unittest
+
+from rdiffweb.test import WebCase
+
+
+class StaticPageTest(WebCase):
+
+    reset_app = True
+
+    def _get_header(self, name):
+        for key, value in self.headers:
+            if key.lower() == name.lower():
+                return value
+        return None
+
+    def test_static_without_login(self):
+        self.getPage('/static/main.css')
+        self.assertStatus('200 OK')
+        self.assertHeader('Content-Type', 'text/css')
+        # No session created for static files.
+        self.assertIsNone(self._get_header('Set-Cookie'))
+
+    def test_static_gzip(self):
+        self.getPage('/static/main.css')
+        plain = self.body
+        self.getPage('/static/main.css', headers=[('Accept-Encoding', 'gzip')])
+        self.assertStatus('200 OK')
+        self.assertHeader('Content-Encoding', 'gzip')
+        self.assertHeader('Vary', 'Accept-Encoding')
+        data = gzip.GzipFile(fileobj=io.BytesIO(self.body)).read()
+        self.assertEqual(plain, data)
+
+    def test_static_etag(self):
+        self.getPage('/static/main.css')
+        self.assertStatus('200 OK')
+        self.assertHeader('Cache-Control', 'no-cache')
+        etag = self._get_header('ETag')
+        self.assertTrue(etag)
+        self.getPage('/static/main.css', headers=[('If-None-Match', etag)])
+        self.assertStatus('304 Not Modified')
+        self.getPage('/static/main.css', headers=[('If-None-Match', '"invalid"')])
+        self.assertStatus('200 OK')
+
+    def test_static_fingerprint(self):
+        self.getPage('/')
+        m = re.search(r'/static/main\.css\?v=([0-9a-f]+)', self.body.decode('utf8'))
+        self.assertTrue(m)
+        self.getPage('/static/main.css?v=' + m.group(1))
+        self.assertStatus('200 OK')
+        self.assertHeader('Cache-Control', 'public, max-age=31536000')
+
+    def test_static_not_found(self):
+        self.getPage('/static/invalid.css')
+        self.assertStatus('404 Not Found')
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    logging.basicConfig(level=logging.DEBUG)
+    unittest.main()
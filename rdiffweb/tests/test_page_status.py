@@ -0,0 +1,83 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module to test the status page.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import unittest
+
+from rdiffweb.test import WebCase
+
+
+class StatusPageTest(WebCase):
+
+    login = True
+
+    reset_app = True
+
+    reset_testcases = True
+
+    def _header(self, name):
+        return next((v for k, v in self.headers if k.lower() == name.lower()), None)
+
+    def test_status(self):
+        self.getPage("/status/")
+        self.assertStatus(200)
+        self.assertInBody("Show errors only")
+
+    def test_entry(self):
+        self.getPage("/status/entry/?date=1454448640")
+        self.assertStatus(200)
+        self.assertInBody("testcases")
+
+    def test_feed(self):
+        self.getPage("/status/feed")
+        self.assertStatus(200)
+        self.assertHeader("Content-Type", "text/xml;charset=utf-8")
+
+    def test_feed_with_etag(self):
+        """Check if conditional GET is supported."""
+        self.getPage("/status/feed")
+        self.assertStatus(200)
+        etag = self._header("ETag")
+        self.assertTrue(etag)
+        self.assertTrue(self._header("Last-Modified"))
+        # Same page request with ETag.
+        self.getPage("/status/feed", headers=[("If-None-Match", etag)])
+        self.assertStatus(304)
+        # Other page with the same ETag.
+        self.getPage("/status/feed?failures=T", headers=[("If-None-Match", etag)])
+        self.assertStatus(200)
+
+    def test_entry_with_last_modified(self):
+        """Check if conditional GET is supported."""
+        self.getPage("/status/entry/?date=1454448640")
+        self.assertStatus(200)
+        lastmod = self._header("Last-Modified")
+        self.assertEqual("Tue, 02 Feb 2016 21:30:40 GMT", lastmod)
+        self.getPage("/status/entry/?date=1454448640", headers=[("If-Modified-Since", lastmod)])
+        self.assertStatus(304)
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    logging.basicConfig(level=logging.DEBUG)
+    unittest.main()
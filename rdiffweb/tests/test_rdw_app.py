@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Created on Oct 18, 2026
+
+Check how configuration changes are applied to a running application.
+"""
+
+from __future__ import unicode_literals
+
+import shutil
+import tempfile
+import unittest
+
+from cherrypy.lib.sessions import FileSession
+from future.utils import native_str
+
+from rdiffweb.test import AppTestCase
+
+
+class RdiffwebAppConfigChangedTest(AppTestCase):
+
+    enabled_plugins = ['SQLite', 'RepoScanner']
+
+    reset_app = False
+
+    def test_deamon_frequency(self):
+        monitor = dict((p.__class__.__name__, m) for p, m in self.app._deamons)['RepoScannerPlugin']
+        self.assertEqual(300, monitor.frequency)
+        self.app.cfg.set_config('RepoScannerFrequency', '10')
+        self.app._config_changed(set(['reposcannerfrequency']))
+        self.assertEqual(600, monitor.frequency)
+
+    def test_session_storage(self):
+        session_dir = tempfile.mkdtemp(prefix='rdiffweb_tests_')
+        try:
+            config = self.app.config[native_str('/')]
+            self.assertNotIn('tools.sessions.storage_class', config)
+            self.app.cfg.set_config('SessionStorage', 'disk')
+            self.app.cfg.set_config('SessionDir', session_dir)
+            self.app._config_changed(set(['sessionstorage', 'sessiondir']))
+            self.assertEqual(FileSession, config['tools.sessions.storage_class'])
+            self.assertEqual(session_dir, config['tools.sessions.storage_path'])
+            # Back to memory.
+            self.app.cfg.set_config('SessionStorage', 'ram')
+            self.app._config_changed(set(['sessionstorage']))
+            self.assertNotIn('tools.sessions.storage_class', config)
+        finally:
+            shutil.rmtree(session_dir)
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -18,7 +18,10 @@
 
 from __future__ import unicode_literals
 
+from mock import patch
 import os
+import threading
+import time
 import unittest
 
 from rdiffweb.rdw_config import Configuration, SettingsError
@@ -47,6 +50,11 @@ NoValue=#This is a setting with no value
         f.close()
         self.config = Configuration(self.config_file_path)
 
+    def write_config_text(self, content):
+        with open(self.config_file_path, "w") as f:
+            f.write(content)
+        os.utime(self.config_file_path, (1, 1))
+
     def write_bad_file(self, bad_setting_num):
         self.write_good_file()
         f = open(self.config_file_path, "w")
@@ -118,6 +126,96 @@ NoValue=#This is a setting with no value
         # Check value.
         self.assertEqual('new_value', self.config2.get_config('newkey'))
 
+    def test_get_config_without_reading_file(self):
+        self.write_good_file()
+        self.assertEqual("Value", self.config.get_config("CommentInValue"))
+        # File modification is ignored until reloaded.
+        with open(self.config_file_path, "w") as f:
+            f.write("CommentInValue=NewValue\n")
+        os.utime(self.config_file_path, (0, 0))
+        self.assertEqual("Value", self.config.get_config("CommentInValue"))
+        self.assertTrue(self.config.reload_if_modified())
+        self.assertEqual("NewValue", self.config.get_config("CommentInValue"))
+        self.assertFalse(self.config.reload_if_modified())
+
+    def test_reload_if_modified_invalid(self):
+        self.write_good_file()
+        self.assertEqual("Value", self.config.get_config("CommentInValue"))
+        # Invalid file is ignored.
+        with open(self.config_file_path, "w") as f:
+            f.write(self.bad_config_texts[0])
+        os.utime(self.config_file_path, (0, 0))
+        with patch('rdiffweb.rdw_config.logger') as logger:
+            self.assertFalse(self.config.reload_if_modified())
+            self.assertFalse(self.config.reload_if_modified())
+        self.assertEqual(1, logger.error.call_count)
+        self.assertEqual("Value", self.config.get_config("CommentInValue"))
+        # Fixed file is read.
+        self.write_config_text("CommentInValue=NewValue\n")
+        self.assertTrue(self.config.reload_if_modified())
+        self.assertEqual("NewValue", self.config.get_config("CommentInValue"))
+
+    def test_subscribe(self):
+        self.write_good_file()
+        changes = []
+        self.config.subscribe(changes.append)
+        self.assertEqual("Value", self.config.get_config("CommentInValue"))
+        # Nothing modified.
+        self.assertTrue(self.config.reload_if_modified(force=True))
+        self.assertEqual([], changes)
+        # Modified values are notified.
+        with open(self.config_file_path, "w") as f:
+            f.write(self.good_config_text.replace('Value#', 'NewValue#') + "NewKey=1\n")
+        os.utime(self.config_file_path, (0, 0))
+        self.assertTrue(self.config.reload_if_modified())
+        self.assertEqual([set(['commentinvalue', 'newkey'])], changes)
+        # Not notified when unsubscribed.
+        self.config.unsubscribe(changes.append)
+        self.config.reload_if_modified(force=True)
+        self.assertEqual(1, len(changes))
+
+    def test_reload_if_modified_concurrent(self):
+        self.write_good_file()
+        self.config.get_config("CommentInValue")
+        running = []
+        overlaps = []
+
+        def listener(changed):
+            if running:
+                overlaps.append(changed)
+            running.append(changed)
+            time.sleep(0.1)
+            running.pop()
+        self.config.subscribe(listener)
+
+        def reload_config(value):
+            self.config._lastmtime = False
+            self.config.set_config('CommentInValue', value)
+            self.config.reload_if_modified(force=True)
+        threads = [threading.Thread(target=reload_config, args=(str(i),)) for i in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # Listeners are never called concurrently.
+        self.assertEqual([], overlaps)
+
+    def test_get_config_typed(self):
+        self.write_good_file()
+        self.config.set_config('Number', '12')
+        self.config.set_config('Enabled', 'yes')
+        self.config.set_config('Items', 'a, b,,c')
+        self.assertEqual(12, self.config.get_config_int('Number'))
+        self.assertEqual(5, self.config.get_config_int('Missing', '5'))
+        self.assertTrue(self.config.get_config_bool('Enabled'))
+        self.assertFalse(self.config.get_config_bool('Missing'))
+        self.assertEqual(['a', 'b', 'c'], self.config.get_config_list('Items'))
+        self.assertEqual(['a', 'b', '', 'c'], self.config.get_config_list('Items', keep_empty=True))
+        self.assertEqual(['x'], self.config.get_config_list('Missing', ['x']))
+        # Cached values are replaced with the configuration.
+        self.config.set_config('Number', '13')
+        self.assertEqual(13, self.config.get_config_int('Number'))
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Test password hashing and the credential cache.
+"""
+
+from __future__ import unicode_literals
+
+import time
+import unittest
+
+from rdiffweb.rdw_password import CredentialCache, check_password, hash_password, needs_rehash
+
+
+# SHA-1 of "password", as stored by older versions.
+LEGACY_HASH = '5baa61e4c9b93f3f0682250b6cf8331b7ee68fd8'
+
+
+class PasswordTest(unittest.TestCase):
+
+    def test_hash_password(self):
+        hashed = hash_password('password', iterations=1000)
+        self.assertTrue(hashed.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(check_password('password', hashed))
+        self.assertFalse(check_password('Password', hashed))
+        self.assertFalse(check_password('', hashed))
+
+    def test_hash_password_salted(self):
+        self.assertNotEqual(hash_password('password', 1000), hash_password('password', 1000))
+
+    def test_hash_password_unicode(self):
+        hashed = hash_password('Mot de passe é', iterations=1000)
+        self.assertTrue(check_password('Mot de passe é', hashed))
+        self.assertFalse(check_password('Mot de passe e', hashed))
+
+    def test_check_password_legacy(self):
+        self.assertTrue(check_password('password', LEGACY_HASH))
+        self.assertTrue(check_password('password', LEGACY_HASH.upper()))
+        self.assertFalse(check_password('invalid', LEGACY_HASH))
+
+    def test_check_password_invalid_hash(self):
+        self.assertFalse(check_password('password', ''))
+        self.assertFalse(check_password('password', None))
+        self.assertFalse(check_password('password', 'invalid'))
+        self.assertFalse(check_password('password', 'md5$1$salt$value'))
+
+    def test_needs_rehash(self):
+        self.assertTrue(needs_rehash(LEGACY_HASH))
+        self.assertTrue(needs_rehash(''))
+        self.assertTrue(needs_rehash(hash_password('password', 1000), 2000))
+        self.assertFalse(needs_rehash(hash_password('password', 1000), 1000))
+
+
+class CredentialCacheTest(unittest.TestCase):
+
+    def test_check(self):
+        cache = CredentialCache()
+        self.assertFalse(cache.check('bob', 'password', 'hash'))
+        cache.add('bob', 'password', 'hash')
+        self.assertTrue(cache.check('bob', 'password', 'hash'))
+        self.assertFalse(cache.check('bob', 'invalid', 'hash'))
+        self.assertFalse(cache.check('alice', 'password', 'hash'))
+        # Stored hash changed.
+        self.assertFalse(cache.check('bob', 'password', 'newhash'))
+
+    def test_check_expired(self):
+        cache = CredentialCache(ttl=1)
+        cache.add('bob', 'password', 'hash')
+        cache._entries[next(iter(cache._entries))] = time.time() - 1
+        self.assertFalse(cache.check('bob', 'password', 'hash'))
+        self.assertEqual(0, len(cache))
+
+    def test_size(self):
+        cache = CredentialCache(size=2)
+        cache.add('bob', 'password', 'hash')
+        cache.add('alice', 'password', 'hash')
+        # Mark bob as recently used.
+        self.assertTrue(cache.check('bob', 'password', 'hash'))
+        cache.add('john', 'password', 'hash')
+        self.assertEqual(2, len(cache))
+        self.assertTrue(cache.check('bob', 'password', 'hash'))
+        self.assertFalse(cache.check('alice', 'password', 'hash'))
+        self.assertTrue(cache.check('john', 'password', 'hash'))
+
+    def test_disabled(self):
+        cache = CredentialCache(ttl=0)
+        cache.add('bob', 'password', 'hash')
+        self.assertFalse(cache.check('bob', 'password', 'hash'))
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
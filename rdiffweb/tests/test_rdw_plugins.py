@@ -50,6 +50,21 @@ class PluginManagerTest(unittest.TestCase):
         self.assertEqual(True, plugin_info.enabled)
         self.assertEqual('GPLv3', plugin_info.copyright)
 
+    def test_get_template_filters(self):
+        """
+        Check if template filters are selected by template name.
+        """
+        config = Configuration()
+        for name in ['SQLite', 'DeleteRepo', 'SetEncoding', 'Graphs']:
+            config.set_config('%sEnabled' % name, 'true')
+        plugins = PluginManager(config)
+        names = sorted(p.__class__.__name__ for p in plugins.get_template_filters('settings.html'))
+        self.assertEqual(['DeleteRepoPlugin', 'GraphsPlugins', 'SetEncodingPlugin'], names)
+        names = [p.__class__.__name__ for p in plugins.get_template_filters('browse.html')]
+        self.assertEqual(['GraphsPlugins'], names)
+        # Same list is returned.
+        self.assertIs(plugins.get_template_filters('browse.html'), plugins.get_template_filters('browse.html'))
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Test the connection pool.
+"""
+
+from __future__ import unicode_literals
+
+from builtins import object
+import time
+import unittest
+
+from rdiffweb.rdw_pool import ConnectionPool, PoolTimeoutError
+
+
+class Broken(Exception):
+    pass
+
+
+class Conn(object):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+
+    def test_reuse(self):
+        pool = ConnectionPool(Conn, size=2)
+        with pool.connection() as conn:
+            self.assertEqual(1, pool.checkedout)
+        self.assertEqual(0, pool.checkedout)
+        with pool.connection() as conn2:
+            self.assertIs(conn, conn2)
+        pool.close()
+        self.assertTrue(conn.closed)
+
+    def test_timeout(self):
+        pool = ConnectionPool(lambda: object(), size=1, timeout=0.1)
+        with pool.connection():
+            start = time.time()
+            with self.assertRaises(PoolTimeoutError):
+                with pool.connection():
+                    pass
+            self.assertGreaterEqual(time.time() - start, 0.1)
+        with pool.connection():
+            pass
+
+    def test_broken_connection(self):
+        pool = ConnectionPool(Conn, size=1, errors=(Broken,))
+        with self.assertRaises(Broken):
+            with pool.connection() as conn:
+                raise Broken()
+        self.assertTrue(conn.closed)
+        with pool.connection() as conn2:
+            self.assertIsNot(conn, conn2)
+
+    def test_other_error(self):
+        pool = ConnectionPool(Conn, size=1, errors=(Broken,))
+        with self.assertRaises(ValueError):
+            with pool.connection() as conn:
+                raise ValueError()
+        self.assertFalse(conn.closed)
+        with pool.connection() as conn2:
+            self.assertIs(conn, conn2)
+
+    def test_max_idle(self):
+        closed = []
+        pool = ConnectionPool(Conn, size=1, close=closed.append, max_idle=0.05)
+        with pool.connection() as conn:
+            pass
+        time.sleep(0.1)
+        with pool.connection() as conn2:
+            self.assertIsNot(conn, conn2)
+        self.assertEqual([conn], closed)
+        self.assertEqual(0, pool.checkedout)
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -19,11 +19,14 @@
 from __future__ import unicode_literals
 
 from future.builtins import str
+import os
+import shutil
+import tempfile
 import unittest
 
 from rdiffweb.rdw_helpers import rdwTime
 from rdiffweb.rdw_templating import do_format_filesize, url_for_browse, \
-    url_for_history, url_for_restore, attrib
+    url_for_history, url_for_restore, url_for_static, attrib, TemplateManager
 
 
 class TemplateManagerTest(unittest.TestCase):
@@ -111,6 +114,56 @@ class TemplateManagerTest(unittest.TestCase):
         with self.assertRaises(AssertionError):
             url_for_restore('testcases', path='', date=rdwTime(1414967021))
 
+    def test_url_for_static_without_app(self):
+        # Outside a request, the fingerprint is not available.
+        self.assertEqual('/static/main.css', url_for_static('main.css'))
+
+
+class TemplateManagerRenderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='rdiffweb_tests_')
+        self.templatesdir = os.path.join(self.tmpdir, 'templates')
+        self.cachedir = os.path.join(self.tmpdir, 'cache')
+        os.mkdir(self.templatesdir)
+        os.mkdir(self.cachedir)
+        with open(os.path.join(self.templatesdir, 'test_render.html'), 'w') as f:
+            f.write("{{ _('Hello') }} {{ name }}")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _templates(self, **kwargs):
+        templates = TemplateManager(**kwargs)
+        templates.add_templatesdir(self.templatesdir)
+        return templates
+
+    def test_render_stats(self):
+        templates = self._templates()
+        self.assertEqual('Hello world', templates.compile_template('test_render.html', name='world'))
+        templates.compile_template('test_render.html', name='world')
+        stats = templates.get_render_stats()
+        self.assertEqual(2, stats['test_render.html']['count'])
+        self.assertTrue(stats['test_render.html']['max'] >= stats['test_render.html']['average'])
+
+    def test_stream_template(self):
+        templates = self._templates()
+        templates.chunk_size = 4
+        chunks = list(templates.stream_template('test_render.html', name='world'))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual('Hello world', ''.join(chunks))
+        self.assertEqual(1, templates.get_render_stats()['test_render.html']['count'])
+
+    def test_bytecode_cache(self):
+        templates = self._templates(cache_dir=self.cachedir, auto_reload=False)
+        self.assertFalse(templates.jinja_env.auto_reload)
+        templates.compile_template('test_render.html', name='world')
+        # Compiled template saved in cache directory.
+        self.assertTrue(os.listdir(self.cachedir))
+        # Compiled template loaded from cache.
+        templates = self._templates(cache_dir=self.cachedir, auto_reload=False)
+        self.assertEqual('Hello world', templates.compile_template('test_render.html', name='world'))
+
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
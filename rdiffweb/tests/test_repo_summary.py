@@ -0,0 +1,164 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+# rdiffweb, A web interface to rdiff-backup repositories
+# Copyright (C) 2014 rdiffweb contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+Module to test `repo_summary` module.
+"""
+
+from __future__ import unicode_literals
+
+import os
+import threading
+import time
+import unittest
+
+from rdiffweb import repo_summary
+from rdiffweb.rdw_helpers import rdwTime
+from rdiffweb.test import AppTestCase
+
+
+class RepoSummaryManagerTest(AppTestCase):
+
+    USERNAME = 'admin'
+
+    PASSWORD = 'admin123'
+
+    reset_testcases = True
+
+    def setUp(self):
+        AppTestCase.setUp(self)
+        self.summaries = self.app.summaries
+        self.user = self.app.userdb.get_user(self.USERNAME)
+        self.user_root = self.app.testcases
+
+    def tearDown(self):
+        self.summaries.close()
+        AppTestCase.tearDown(self)
+
+    def test_get_summaries(self):
+        summaries = self.summaries.get_summaries(self.user)
+        self.assertEqual(1, len(summaries))
+        self.assertEqual(b'testcases', summaries[0].path)
+        self.assertEqual('testcases', summaries[0].name)
+        self.assertEqual(rdwTime(1454448640), summaries[0].last_backup_date)
+        self.assertFalse(summaries[0].in_progress)
+        self.assertFalse(summaries[0].failed)
+        self.assertFalse(summaries[0].pending)
+
+    def test_get_summaries_with_invalid_repo(self):
+        self.user.repos = ['invalid/', 'testcases/']
+        summaries = dict((s.name, s) for s in self.summaries.get_summaries(self.user))
+        self.assertEqual(2, len(summaries))
+        self.assertTrue(summaries['invalid'].failed)
+        self.assertFalse(summaries['testcases'].failed)
+
+    def test_get_summaries_cached(self):
+        first = self.summaries.get_summaries(self.user)[0]
+        second = self.summaries.get_summaries(self.user)[0]
+        self.assertIs(first, second)
+
+    def test_get_summaries_modified(self):
+        """Check if the summary is computed again when the repo is modified."""
+        self.app.cfg.set_config('RepoSummaryMaxAge', '0')
+        first = self.summaries.get_summaries(self.user)[0]
+        # Make the summary old and touch the repository.
+        first.checked = 0
+        os.utime(first.data_path, (time.time() + 10, time.time() + 10))
+        # The old summary is returned while refreshing in background.
+        self.assertIs(first, self.summaries.get_summaries(self.user)[0])
+        self.summaries._pending[(self.user_root, 'testcases/')].wait()
+        second = self.summaries.get_summaries(self.user)[0]
+        self.assertIsNot(first, second)
+        self.assertEqual(first.last_backup_date, second.last_backup_date)
+
+    def test_get_summaries_timeout(self):
+        """Check if a pending summary is returned when too slow."""
+        self.app.cfg.set_config('RepoSummaryTimeout', '0')
+        event = threading.Event()
+        original = repo_summary.compute_summary
+
+        def slow_compute(*args):
+            event.wait()
+            return original(*args)
+        repo_summary.compute_summary = slow_compute
+        try:
+            summaries = self.summaries.get_summaries(self.user)
+        finally:
+            repo_summary.compute_summary = original
+            event.set()
+        self.assertTrue(summaries[0].pending)
+        self.assertEqual(b'testcases', summaries[0].path)
+        # Computation complete in background.
+        self.summaries._pending[(self.user_root, 'testcases/')].wait()
+        summaries = self.summaries.get_summaries(self.user)
+        self.assertFalse(summaries[0].pending)
+
+    def test_get_summaries_block(self):
+        """Check if summaries are computed when blocking."""
+        self.app.cfg.set_config('RepoSummaryTimeout', '0')
+        summaries = self.summaries.get_summaries(self.user, block=True)
+        self.assertFalse(summaries[0].pending)
+        self.assertEqual(rdwTime(1454448640), summaries[0].last_backup_date)
+
+    def test_get_summaries_stored(self):
+        """Check if summary stored in database is used."""
+        summary = repo_summary.compute_summary(self.user_root, 'testcases/', extended=True)
+        summary.name = 'stored'
+        self.user.get_repo('testcases/').set_attr('summary', repo_summary.dumps(summary))
+        summaries = self.summaries.get_summaries(self.user)
+        self.assertEqual('stored', summaries[0].name)
+        self.assertEqual(rdwTime(1454448640), summaries[0].last_backup_date)
+        # Kept in memory.
+        self.assertIs(summaries[0], self.summaries.get_summaries(self.user)[0])
+
+    def test_get_summaries_stored_modified(self):
+        """Check if summary stored in database is ignored when outdated."""
+        summary = repo_summary.compute_summary(self.user_root, 'testcases/', extended=True)
+        summary.name = 'stored'
+        self.user.get_repo('testcases/').set_attr('summary', repo_summary.dumps(summary))
+        os.utime(summary.data_path, (time.time() + 10, time.time() + 10))
+        summaries = self.summaries.get_summaries(self.user, block=True)
+        self.assertEqual('testcases', summaries[0].name)
+
+    def test_compute_summary_extended(self):
+        summary = repo_summary.compute_summary(self.user_root, 'testcases/', extended=True)
+        self.assertEqual(22, summary.backup_count)
+        self.assertEqual(0, summary.error_count)
+        self.assertEqual(summary.last_session['sourcefilesize'], summary.source_size)
+        self.assertIsNotNone(summary.scanned)
+
+    def test_dumps_loads(self):
+        summary = repo_summary.compute_summary(self.user_root, 'testcases/', extended=True)
+        data = repo_summary.dumps(summary)
+        loaded = repo_summary.loads(self.user_root, 'testcases/', data)
+        self.assertEqual(summary.path, loaded.path)
+        self.assertEqual(summary.name, loaded.name)
+        self.assertEqual(summary.data_path, loaded.data_path)
+        self.assertEqual(summary.last_backup_date, loaded.last_backup_date)
+        self.assertEqual(summary.last_session, loaded.last_session)
+        self.assertFalse(loaded.is_modified())
+
+    def test_loads_invalid(self):
+        self.assertIsNone(repo_summary.loads(self.user_root, 'testcases/', ''))
+        self.assertIsNone(repo_summary.loads(self.user_root, 'testcases/', 'invalid'))
+        # Summary stored by previous version.
+        self.assertIsNone(repo_summary.loads(self.user_root, 'testcases/', '{"name": "testcases", "last_backup_date": null}'))
+
+
+if __name__ == "__main__":
+    # import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
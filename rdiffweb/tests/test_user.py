@@ -34,6 +34,7 @@ import unittest
 from rdiffweb.core import InvalidUserError, RdiffError
 from rdiffweb.rdw_plugin import IUserChangeListener
 from rdiffweb.test import AppTestCase
+from rdiffweb.user import UserManager
 
 
 def _ldap_user(name, password='password'):
@@ -137,6 +138,129 @@ class UserManagerSQLiteTest(AppTestCase):
         self.assertEqual(3, obj.get_repo('/backups/bernie/laptop/').maxage)
         self.assertEqual('test2', obj.get_repo('/backups/bernie/laptop/').get_attr('newattribute'))
 
+    def test_get_user_cached(self):
+        """
+        Check if user attributes are read from database once.
+        """
+        user = self.app.userdb.add_user('bernie')
+        user.repos = ['computer', 'laptop']
+        db = self.app.userdb.find_user_database('bernie')
+        obj = self.app.userdb.get_user('bernie')
+        count = db.query_count
+        obj.user_root
+        obj.email
+        obj.is_admin
+        obj.repos
+        obj.repo_list
+        obj.get_repo('laptop')
+        self.assertEqual(count + 1, db.query_count)
+
+    def test_load_user(self):
+        """
+        Check if user kept in session are loaded using a single query.
+        """
+        user = self.app.userdb.add_user('bernie')
+        user.repos = ['computer', 'laptop']
+        user.get_repo('laptop').set_attr('keepdays', '30')
+        db = self.app.userdb.find_user_database('bernie')
+        state = self.app.userdb.dump_user(self.app.userdb.get_user('bernie'))
+        count = db.query_count
+        obj = self.app.userdb.load_user('bernie', state)
+        self.assertEqual(['computer', 'laptop'], obj.repos)
+        self.assertEqual('30', obj.get_repo('laptop').get_attr('keepdays'))
+        self.assertEqual(-1, int(obj.get_repo('computer').get_attr('keepdays', '-1')))
+        self.assertEqual(count + 1, db.query_count)
+        # Modification of a repository invalidates the state.
+        obj.get_repo('computer').set_attr('keepdays', '10')
+        self.assertIsNone(self.app.userdb.load_user('bernie', state))
+        state = self.app.userdb.dump_user(self.app.userdb.get_user('bernie'))
+        # Summaries are not kept in session.
+        obj.get_repo('computer').set_attr('summary', '{}')
+        self.assertIsNotNone(self.app.userdb.load_user('bernie', state))
+        state = self.app.userdb.dump_user(self.app.userdb.get_user('bernie'))
+        self.assertNotIn('summary', state[2]['repo_attrs']['computer'])
+        obj = self.app.userdb.load_user('bernie', state)
+        self.assertEqual('{}', obj.get_repo('computer').get_attr('summary'))
+        # Modification invalidates the state.
+        obj.email = 'bernie@test.com'
+        self.assertIsNone(self.app.userdb.load_user('bernie', state))
+        obj.set_attrs(user_root='/backups/', notify=False)
+        state = self.app.userdb.dump_user(self.app.userdb.get_user('bernie'))
+        self.assertEqual('bernie@test.com', self.app.userdb.load_user('bernie', state).email)
+        self.app.userdb.set_password('bernie', 'password')
+        self.assertIsNone(self.app.userdb.load_user('bernie', state))
+        self.assertIsNone(self.app.userdb.load_user('bernie', None))
+        # Cache is discarded when updating attributes.
+        obj.email = 'bernie@gmail.com'
+        self.assertEqual('bernie@gmail.com', obj.email)
+        obj.repos = ['computer']
+        self.assertEqual(['computer'], obj.repos)
+
+    def test_load_user_modified_by_other_manager(self):
+        """
+        Check if user kept in session is reloaded when modified by another
+        process sharing the same database.
+        """
+        userdb = self.app.userdb
+        other = UserManager(self.app)
+        userdb.add_user('bernie').repos = ['computer']
+        state = userdb.dump_user(userdb.get_user('bernie'))
+        other.get_user('bernie').email = 'bernie@test.com'
+        self.assertIsNone(userdb.load_user('bernie', state))
+        state = userdb.dump_user(userdb.get_user('bernie'))
+        self.assertEqual('bernie@test.com', userdb.load_user('bernie', state).email)
+        other.get_user('bernie').get_repo('computer').set_attr('keepdays', '10')
+        self.assertIsNone(userdb.load_user('bernie', state))
+        state = userdb.dump_user(userdb.get_user('bernie'))
+        other.get_user('bernie').repos = ['computer', 'laptop']
+        self.assertIsNone(userdb.load_user('bernie', state))
+        state = userdb.dump_user(userdb.get_user('bernie'))
+        other.delete_user('bernie')
+        self.assertIsNone(userdb.load_user('bernie', state))
+        other.add_user('bernie')
+        self.assertIsNone(userdb.load_user('bernie', state))
+
+    def test_list_with_repos(self):
+        """
+        Check if users are listed with their repositories in a single query.
+        """
+        for name in ['delta', 'alpha', 'charlie', 'bravo']:
+            user = self.app.userdb.add_user(name)
+            user.repos = ['repo1', 'repo2']
+            user.repo_list[1].set_attr('keepdays', '30')
+        self.app.userdb.get_user('charlie').is_admin = True
+        db = self.app.userdb.find_user_database('alpha')
+        count = db.query_count
+        users = list(self.app.userdb.list())
+        for user in users:
+            user.email
+            user.is_admin
+            [(r.maxage, r.get_attr('keepdays')) for r in user.repo_list]
+        self.assertEqual(count + 1, db.query_count)
+        self.assertEqual(['alpha', 'bravo', 'charlie', 'delta'], [u.username for u in users])
+        self.assertEqual('30', users[1].repo_list[1].get_attr('keepdays'))
+        # Filter and paginate.
+        users = self.app.userdb.list(offset=1, limit=2)
+        self.assertEqual(['bravo', 'charlie'], [u.username for u in users])
+        users = self.app.userdb.list(admins=True)
+        self.assertEqual(['charlie'], [u.username for u in users])
+        self.assertEqual(4, self.app.userdb.count())
+        self.assertEqual(1, self.app.userdb.count(search='lph'))
+
+    def test_repo_attr_cached(self):
+        """
+        Check if repository attributes are updated.
+        """
+        user = self.app.userdb.add_user('bernie')
+        user.repos = ['computer']
+        repo = user.repo_list[0]
+        self.assertEqual(0, repo.maxage)
+        repo.maxage = 3
+        repo.set_attr('keepdays', '30')
+        self.assertEqual(3, repo.maxage)
+        self.assertEqual('30', repo.get_attr('keepdays'))
+        self.assertEqual(3, user.repo_list[0].maxage)
+
     def test_get_attr_with_default(self):
         """
         Get repository attribute with default value.
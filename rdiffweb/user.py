@@ -22,6 +22,8 @@ from builtins import str, bytes
 from future.utils import python_2_unicode_compatible
 from future.utils.surrogateescape import encodefilename
 import logging
+import threading
+import time
 
 from rdiffweb.core import Component, InvalidUserError, RdiffError
 from rdiffweb.i18n import ugettext as _
@@ -32,18 +34,25 @@ from rdiffweb.page_main import normpath
 # Define the logger
 logger = logging.getLogger(__name__)
 
+# Repository attributes too large to be kept in session with the user. They
+# are read from database when required.
+SESSION_EXCLUDED_ATTRS = frozenset(['summary'])
+
 
 @python_2_unicode_compatible
 class UserObject(object):
     """Represent an instance of user."""
 
-    def __init__(self, userdb, db, username):
+    def __init__(self, userdb, db, username, record=None):
         assert userdb
         assert db
         assert username
         self._userdb = userdb
         self._db = db
         self._username = username
+        # User record loaded from database. UserObject are created for each
+        # request, so the record is kept for the lifetime of the request.
+        self._record = record
 
     def __eq__(self, other):
         return (isinstance(other, UserObject) and
@@ -57,6 +66,36 @@ class UserObject(object):
     def username(self):
         return self._username
 
+    def _get_record(self):
+        """
+        Return the user attributes. Everything is read from database once,
+        using a single query when supported by the database.
+        """
+        if self._record is None:
+            if hasattr(self._db, 'get_user'):
+                self._record = self._db.get_user(self._username)
+            else:
+                self._record = {
+                    'email': self._db.get_email(self._username),
+                    'user_root': self._db.get_user_root(self._username),
+                    'is_admin': self._db.is_admin(self._username),
+                    'repos': self._db.get_repos(self._username),
+                }
+        return self._record
+
+    def _get_attr(self, key):
+        return self._get_record()[key]
+
+    def _repo_obj(self, repo):
+        attrs = self._get_record().get('repo_attrs')
+        return RepoObject(self._db, self._username, repo,
+                          None if attrs is None else attrs.get(repo),
+                          userdb=self._userdb)
+
+    def refresh(self):
+        """Discard the cached attributes to read them again from database."""
+        self._record = None
+
     def get_repo(self, name):
         """
         Return the repository identified as `name`.
@@ -66,9 +105,9 @@ class UserObject(object):
         if isinstance(name, str):
             name = encodefilename(name)
         name = normpath(name)
-        for r in self._db.get_repos(self._username):
+        for r in self.repos:
             if name == normpath(encodefilename(r)):
-                return RepoObject(self._db, self._username, r)
+                return self._repo_obj(r)
         raise KeyError(name)
 
     def set_attr(self, key, value, notify=True):
@@ -81,28 +120,45 @@ class UserObject(object):
             if key in ['is_admin', 'email', 'user_root', 'repos']:
                 setter = getattr(self._db, 'set_%s' % key)
                 setter(self._username, value)
+        self.refresh()
         # Call notification listener
         if kwargs.get('notify', True):
             del kwargs['notify']
             self._userdb._notify('attr_changed', self._username, kwargs)
+        else:
+            self._userdb._changed(self._username)
+
+    def get_sessions(self, start=None, end=None, repos=None):
+        """
+        Return the backup sessions recorded for the user repositories. See
+        `IDatabase.get_sessions()`.
+        """
+        return self._db.get_sessions(self._username, repos, start, end)
 
     # Declare properties
-    is_admin = property(fget=lambda x: x._db.is_admin(x._username), fset=lambda x, y: x.set_attr('is_admin', y))
-    email = property(fget=lambda x: x._db.get_email(x._username), fset=lambda x, y: x.set_attr('email', y))
-    user_root = property(fget=lambda x: x._db.get_user_root(x._username), fset=lambda x, y: x.set_attr('user_root', y))
-    repos = property(fget=lambda x: x._db.get_repos(x._username), fset=lambda x, y: x.set_attr('repos', y))
-    repo_list = property(fget=lambda x: [RepoObject(x._db, x._username, r)
-                                         for r in x._db.get_repos(x._username)])
+    is_admin = property(fget=lambda x: x._get_attr('is_admin'), fset=lambda x, y: x.set_attr('is_admin', y))
+    email = property(fget=lambda x: x._get_attr('email'), fset=lambda x, y: x.set_attr('email', y))
+    user_root = property(fget=lambda x: x._get_attr('user_root'), fset=lambda x, y: x.set_attr('user_root', y))
+    repos = property(fget=lambda x: list(x._get_attr('repos')), fset=lambda x, y: x.set_attr('repos', y))
+    repo_list = property(fget=lambda x: [x._repo_obj(r) for r in x._get_attr('repos')])
 
 
 @python_2_unicode_compatible
 class RepoObject(object):
     """Represent a repository."""
 
-    def __init__(self, db, username, repo):
+    def __init__(self, db, username, repo, attrs=None, userdb=None):
         self._db = db
         self._username = username
         self._repo = repo
+        # Every attributes of the repository when loaded with the user record.
+        self._attrs = attrs
+        # Notified of modifications to invalidate the user kept in sessions.
+        self._userdb = userdb
+
+    def _changed(self):
+        if self._userdb is not None:
+            self._userdb._changed(self._username)
 
     def __eq__(self, other):
         return (isinstance(other, RepoObject) and
@@ -125,16 +181,46 @@ class RepoObject(object):
         for key, value in kwargs.items():
             assert isinstance(key, str) and key.isalpha() and key.islower()
             self._db.set_repo_attr(self._username, self._repo, key, value)
+            if self._attrs is not None:
+                self._attrs[key] = self._db.get_repo_attr(self._username, self._repo, key)
+        if not SESSION_EXCLUDED_ATTRS.issuperset(kwargs):
+            self._changed()
 
     def get_attr(self, key, default=None):
         assert isinstance(key, str)
+        if self._attrs is not None and (key in self._attrs or key not in SESSION_EXCLUDED_ATTRS):
+            return self._attrs.get(key) or default
         return self._db.get_repo_attr(self._username, self._repo, key, default)
 
+    def _get_maxage(self):
+        if self._attrs is not None and 'maxage' in self._attrs:
+            return int(self._attrs['maxage'])
+        return self._db.get_repo_maxage(self._username, self._repo)
+
+    def _set_maxage(self, value):
+        self._db.set_repo_maxage(self._username, self._repo, value)
+        if self._attrs is not None:
+            self._attrs.pop('maxage', None)
+        self._changed()
+
+    def add_sessions(self, sessions):
+        """Record new backup sessions for this repository."""
+        self._db.add_sessions(self._username, self._repo, sessions)
+
+    def delete_sessions(self, before):
+        """Delete the sessions older than the given date (in seconds)."""
+        self._db.delete_sessions(self._username, self._repo, before)
+
+    @property
+    def last_session_date(self):
+        """Date (in seconds) of the most recent session recorded."""
+        return self._db.get_last_session_date(self._username, self._repo)
+
     @property
     def name(self):
         return self._repo
 
-    maxage = property(fget=lambda x: x._db.get_repo_maxage(x._username, x._repo), fset=lambda x, y: x._db.set_repo_maxage(x._username, x._repo, y))
+    maxage = property(fget=_get_maxage, fset=_set_maxage)
 
 
 class UserManager(Component):
@@ -145,6 +231,12 @@ class UserManager(Component):
 
     def __init__(self, app):
         Component.__init__(self, app)
+        # Version of each user, incremented when the user is modified. Used
+        # to invalidate the users stored in sessions. The startup time is
+        # part of the version since sessions may outlive the process.
+        self._epoch = time.time()
+        self._versions = {}
+        self._versions_lock = threading.Lock()
 
     @property
     def _allow_add_user(self):
@@ -256,6 +348,52 @@ class UserManager(Component):
             raise InvalidUserError(username)
         return UserObject(self, db, username)
 
+    def get_version(self, username, db=None):
+        """
+        Return the version of the given user. The version changes each time
+        the user is modified. When supported, the version stored in database
+        `db` is included to notice the modifications made by other processes.
+        """
+        version = (self._epoch, self._versions.get(username, 0))
+        if db is not None and db.supports('get_user_version'):
+            version += (db.get_user_version(username),)
+        return version
+
+    def _changed(self, username):
+        with self._versions_lock:
+            self._versions[username] = self._versions.get(username, 0) + 1
+
+    def dump_user(self, userobj):
+        """
+        Return the attributes of the given user to be kept in the session.
+        See `load_user()`.
+        """
+        # Read the version first to not keep a modification made meanwhile.
+        version = self.get_version(userobj.username, userobj._db)
+        record = dict(userobj._get_record())
+        if 'repo_attrs' in record:
+            record['repo_attrs'] = dict(
+                (repo, dict((k, v) for k, v in attrs.items() if k not in SESSION_EXCLUDED_ATTRS))
+                for repo, attrs in record['repo_attrs'].items())
+        return (version, self._databases.index(userobj._db), record)
+
+    def load_user(self, username, state):
+        """
+        Return a user object from the value returned by `dump_user()`. Only
+        the version of the user is read from the database. Return None if the
+        user was modified since.
+        """
+        try:
+            version, index, record = state
+        except (TypeError, ValueError):
+            return None
+        if index >= len(self._databases):
+            return None
+        db = self._databases[index]
+        if version != self.get_version(username, db):
+            return None
+        return UserObject(self, db, username, dict(record))
+
     def _get_supporting_store(self, operation):
         """
         Returns the IPasswordStore that implements the specified operation.
@@ -278,12 +416,64 @@ class UserManager(Component):
                 return db
         return None
 
-    def list(self):
-        """Search users database. Return a generator of user object."""
-        # TODO Add criteria as required.
+    def list(self, search=None, admins=None, offset=0, limit=None):
+        """
+        Search users database. Return a generator of user object ordered by
+        username within each database.
+
+        `search` is used to filter users by username or email. If `admins` is
+        True, only the administrators are returned. `offset` and `limit` are
+        used to return a single page of users.
+
+        When supported, users are read from database with their attributes
+        and repositories using a single query.
+        """
+        for db in self._databases:
+            if limit is not None and limit <= 0:
+                return
+            if hasattr(db, 'get_users'):
+                records = db.get_users(search, admins, offset, limit)
+                if not records and offset:
+                    offset = max(0, offset - db.count_users(search, admins))
+                else:
+                    offset = 0
+                users = [UserObject(self, db, username, record)
+                         for username, record in records]
+            else:
+                users = list(self._filter(db, search, admins))
+                skip = min(offset, len(users))
+                offset -= skip
+                users = users[skip:]
+                if limit is not None:
+                    users = users[:limit]
+            if limit is not None:
+                limit -= len(users)
+            for user in users:
+                yield user
+
+    def count(self, search=None, admins=None):
+        """
+        Return the number of users matching the given criteria. See `list()`.
+        """
+        count = 0
         for db in self._databases:
-            for username in db.list():
-                yield UserObject(self, db, username)
+            if hasattr(db, 'count_users'):
+                count += db.count_users(search, admins)
+            else:
+                count += len(list(self._filter(db, search, admins)))
+        return count
+
+    def _filter(self, db, search, admins):
+        """
+        Generator of user object of a database not supporting `get_users()`.
+        """
+        for username in sorted(db.list()):
+            user = UserObject(self, db, username)
+            if admins and not user.is_admin:
+                continue
+            if search and not (search in username or search in (user.email or '')):
+                continue
+            yield user
 
     def login(self, user, password):
         """
@@ -362,6 +552,8 @@ class UserManager(Component):
                 return self._get_supporting_database(operation) is not None
 
     def _notify(self, mod, *args):
+        if mod != 'logined':
+            self._changed(args[0])
         mod = '_'.join(['user', mod])
         for listener in self._change_listeners:
             # Support divergent account change listener implementations too.
@@ -251,11 +251,16 @@ setup(
     packages=['rdiffweb'],
     include_package_data=True,
     entry_points={
-        "console_scripts": ["rdiffweb = rdiffweb.main:start"],
+        "console_scripts": [
+            "rdiffweb = rdiffweb.main:start",
+            "rdiffweb-migrate-db = rdiffweb.plugins.db_sql.migrate:main",
+        ],
         "rdiffweb.plugins": [
             "EmailNotification = rdiffweb.plugins.notification",
             "SQLite = rdiffweb.plugins.db_sqlite",
+            "SQL = rdiffweb.plugins.db_sql",
             "Ldap = rdiffweb.plugins.ldap_auth",
+            "LdapSync = rdiffweb.plugins.ldap_sync",
             "UserPrefsGeneral = rdiffweb.plugins.prefs_general",
             "UserPrefsSSHKeys = rdiffweb.plugins.prefs_sshkeys",
             "UpdateRepos = rdiffweb.plugins.update_repos",
@@ -263,6 +268,7 @@ setup(
             "DeleteRepo = rdiffweb.plugins.delete_repo",
             "RemoveOlder = rdiffweb.plugins.remove_older",
             "SetEncoding = rdiffweb.plugins.set_encoding",
+            "RepoScanner = rdiffweb.plugins.repo_scanner",
         ]
     },
     # new commands added and build command modified